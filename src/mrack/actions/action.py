@@ -33,12 +33,15 @@ class Action:
         self._db_driver = db_driver or global_context.DB
         self._transformers = {}
 
-    async def _get_transformer(self, provider_name):
-        """Get a transformer by name, initialize a new one if not yet done."""
+    async def _get_transformer(self, provider_name, teardown=False):
+        """Get a transformer by name, initialize a new one if not yet done.
+
+        In teardown mode the provider is initialized only for deletion of hosts.
+        """
         transformer = self._transformers.get(provider_name)
         if not transformer:
             transformer = transformers.get(provider_name)
-            await transformer.init(self._config, self._metadata)
+            await transformer.init(self._config, self._metadata, teardown=teardown)
             if not transformer:
                 raise MetadataError(f"Invalid provider: {provider_name}")
             self._transformers[provider_name] = transformer
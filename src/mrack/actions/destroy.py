@@ -51,8 +51,12 @@ class Destroy(Action):
         return success
 
     async def init_providers(self, hosts):
-        """Initialize providers for hosts to delete."""
+        """Initialize providers for hosts to delete.
+
+        Providers are initialized in teardown mode, i.e. only what is needed
+        for deletion of hosts is loaded.
+        """
         providers = [host.provider.name for host in hosts]
         providers = set(providers)
-        aws = [self._get_transformer(provider) for provider in providers]
+        aws = [self._get_transformer(provider, teardown=True) for provider in providers]
         await asyncio.gather(*aws)
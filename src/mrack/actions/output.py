@@ -21,6 +21,8 @@ from mrack.errors import MetadataError
 from mrack.outputs.ansible_inventory import AnsibleInventoryOutput
 from mrack.outputs.pytest_mh import PytestMhOutput
 from mrack.outputs.pytest_multihost import PytestMultihostOutput
+from mrack.outputs.utils import HostnameResolver, should_resolve_host
+from mrack.utils import get_host_from_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -75,9 +77,23 @@ class Output(Action):
 
         logger.info("Requested outputs: " + ", ".join(outputs))
 
+        # resolve all hosts at once, outputs then share the results
+        resolver = HostnameResolver()
+        await resolver.resolve_all(
+            [
+                host.ip_addr
+                for host in self._db_driver.hosts.values()
+                if should_resolve_host(
+                    host,
+                    get_host_from_metadata(self._metadata, host.name)[0],
+                    self._config,
+                )
+            ]
+        )
+
         for output in outputs:
             (cls, path) = outputs_map[output]
-            o = cls(self._config, self._db_driver, self._metadata, path)
+            o = cls(self._config, self._db_driver, self._metadata, path, resolver)
             o.create_output()
 
         logger.info("Output generation done")
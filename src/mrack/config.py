@@ -151,6 +151,20 @@ class MrackConfig:
         """Return value of require-owner."""
         return value_to_bool(self.get("require-owner", default))
 
+    def shared_db(self, default=False):
+        """Return whether database file is shared by parallel mrack runs."""
+        return value_to_bool(self.get("shared-db", default))
+
+    @property
+    def cache_dir(self):
+        """Return directory where provider object caches are stored."""
+        return self.get("cache-dir", default="~/.mrack/cache")
+
+    @property
+    def lock_dir(self):
+        """Return directory with lock files shared by concurrent mrack runs."""
+        return self.get("lock-dir", default="~/.mrack/locks")
+
     @property
     def delta_sleep(self):
         """Return value of `delta-sleep` value from config to randomize sleep window."""
@@ -18,8 +18,11 @@ from typing import Dict
 
 from mrack.config import MrackConfig, ProvisioningConfig
 from mrack.dbdrivers.file import FileDBDriver
+from mrack.dbdrivers.sqlite import SQLiteDBDriver, is_sqlite_file
 from mrack.errors import ConfigError
-from mrack.utils import NoSuchFileHandler, load_yaml
+from mrack.utils import NoSuchFileHandler, get_metadata_index, load_yaml
+
+SQLITE_DB_SUFFIXES = (".sqlite", ".sqlite3", ".db")
 
 
 class GlobalContext:
@@ -34,7 +37,7 @@ class GlobalContext:
 
     @property
     def DB(self):  # pylint: disable=invalid-name
-        """Get FileDBDriver object."""
+        """Get FileDBDriver or SQLiteDBDriver object."""
         return self.database
 
     @property
@@ -66,8 +69,19 @@ class GlobalContext:
         self._init_prov_config(p_config_path)
 
     def _init_db(self, path):
-        """Initialize file database."""
-        self.database = FileDBDriver(path)
+        """Initialize database, SQLite one if the file is SQLite database.
+
+        Format of existing file is detected by its content, new database is
+        SQLite one if path has SQLite file suffix.
+        """
+        if os.path.exists(os.path.expanduser(path)):
+            use_sqlite = is_sqlite_file(path)
+        else:
+            use_sqlite = path.endswith(SQLITE_DB_SUFFIXES)
+        if use_sqlite:
+            self.database = SQLiteDBDriver(path)
+        else:
+            self.database = FileDBDriver(path, shared=self.mrack_conf.shared_db())
 
     @NoSuchFileHandler(error="Provisioning config file not found: {path}")
     def _init_prov_config(self, path):
@@ -84,6 +98,8 @@ class GlobalContext:
             raise ConfigError(f"Job metadata file not found: {meta_path}")
 
         self.metadata = load_yaml(meta_path)
+        # build the hosts index once, lookups of all hosts reuse it
+        get_metadata_index(self.metadata)
 
     def _init_mrack_config(self, mrack_config_path):
         """Load and initialize mrack configuration."""
@@ -14,6 +14,8 @@
 
 """File database driver module."""
 
+import fcntl
+from contextlib import contextmanager
 from os import path
 
 from mrack.host import host_from_json
@@ -26,19 +28,29 @@ class FileDBDriver:
     """File database driver.
 
     Serialize and load information into JSON file.
+
+    In shared mode the file can be used by several mrack processes at once.
+    Every save then holds an exclusive lock of `<file>.lock`, reads the file
+    again and merges in only hosts which were added, updated or deleted by
+    this process, so that changes made by other processes are not lost.
     """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, shared=False):
         """Initialize DB driver."""
         self._path = file_path
         self._hosts = {}
         self._raw_data = None
+        self._changed = set()  # names of hosts added or updated since last save
+        self._deleted = set()  # names of hosts deleted since last save
         self.save_on_change = True
+        self.shared = shared
         self.load()
 
     def load(self):
         """Load configuration from file."""
         self._hosts = {}
+        self._changed = set()
+        self._deleted = set()
         if not path.exists(self._path):
             self._raw_data = {HOSTS_KEY: {}}
             return self._hosts
@@ -53,11 +65,62 @@ class FileDBDriver:
 
         return self._hosts
 
+    @contextmanager
+    def _lock(self):
+        """Hold exclusive advisory lock of the database file."""
+        with open(path.expanduser(f"{self._path}.lock"), "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
     def save(self):
         """Save configuration to file."""
+        if self.shared:
+            with self._lock():
+                self._merge_save()
+            return
+
         hosts = [host.to_json() for host in self._hosts.values()]
         self._raw_data[HOSTS_KEY] = hosts
         save_to_json(self._path, self._raw_data)
+        self._changed = set()
+        self._deleted = set()
+
+    def _merge_save(self):
+        """Merge own host changes into current file content and save it.
+
+        Hosts not changed by this process are refreshed from the file.
+        """
+        raw_data = {HOSTS_KEY: []}
+        if path.exists(self._path):
+            raw_data = load_json(self._path)
+
+        merged = {
+            raw_host["name"]: raw_host for raw_host in raw_data.get(HOSTS_KEY, [])
+        }
+        for name in self._deleted:
+            merged.pop(name, None)
+        for name in self._changed:
+            if name in self._hosts:
+                merged[name] = self._hosts[name].to_json()
+
+        raw_data[HOSTS_KEY] = list(merged.values())
+        save_to_json(self._path, raw_data)
+        self._raw_data = raw_data
+
+        hosts = {}
+        for name, raw_host in merged.items():
+            if name in self._changed:
+                hosts[name] = self._hosts[name]
+            else:
+                hosts[name] = host_from_json(raw_host)
+        # update in place, callers might hold reference to the dictionary
+        self._hosts.clear()
+        self._hosts.update(hosts)
+        self._changed = set()
+        self._deleted = set()
 
     @property
     def hosts(self):
@@ -71,6 +134,8 @@ class FileDBDriver:
         """
         for host in hosts:
             self.hosts[host.name] = host
+            self._changed.add(host.name)
+            self._deleted.discard(host.name)
 
         if self.save_on_change:
             self.save()
@@ -86,3 +151,5 @@ class FileDBDriver:
         """Delete host object."""
         if host.name in self.hosts:
             del self.hosts[host.name]
+            self._changed.discard(host.name)
+            self._deleted.add(host.name)
@@ -0,0 +1,127 @@
+# Copyright 2026 Red Hat Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""SQLite database driver module."""
+
+import json
+import sqlite3
+from contextlib import closing
+from os import path
+
+from mrack.host import host_from_json
+from mrack.utils import json_convertor
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS hosts (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+SQLITE_HEADER = b"SQLite format 3\0"
+
+
+def is_sqlite_file(file_path):
+    """Check if existing file is SQLite database by its header."""
+    with open(path.expanduser(file_path), "rb") as db_file:
+        return db_file.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+class SQLiteDBDriver:
+    """SQLite database driver.
+
+    Store every host as one record in SQLite database file. Only added,
+    updated or deleted hosts are written and every write is done in one
+    transaction so an interrupted run cannot leave the database corrupted.
+    Hosts written by other processes are kept.
+    """
+
+    def __init__(self, file_path):
+        """Initialize DB driver."""
+        self._path = path.expanduser(file_path)
+        self._hosts = {}
+        self._deleted = set()  # names of hosts deleted since last save
+        self.save_on_change = True
+        self.load()
+
+    def _connect(self):
+        """Open database connection, create the hosts table if missing."""
+        conn = sqlite3.connect(self._path)
+        conn.execute(SCHEMA)
+        return conn
+
+    def load(self):
+        """Load hosts from database."""
+        self._hosts = {}
+        self._deleted = set()
+        if not path.exists(self._path):
+            return self._hosts
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT data FROM hosts ORDER BY rowid").fetchall()
+
+        for (data,) in rows:
+            host = host_from_json(json.loads(data))
+            self._hosts[host.name] = host
+
+        return self._hosts
+
+    def _write(self, hosts, deleted_names=()):
+        """Write given hosts and remove deleted ones in one transaction."""
+        records = [
+            (host.name, json.dumps(host.to_json(), default=json_convertor))
+            for host in hosts
+        ]
+        with closing(self._connect()) as conn:
+            with conn:  # commit on success, rollback on error
+                conn.executemany(
+                    "DELETE FROM hosts WHERE name = ?",
+                    [(name,) for name in deleted_names],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO hosts (name, data) VALUES (?, ?)",
+                    records,
+                )
+
+    def save(self):
+        """Save all managed hosts and remove hosts deleted since last save."""
+        self._write(self._hosts.values(), deleted_names=self._deleted)
+        self._deleted = set()
+
+    @property
+    def hosts(self):
+        """Get all host objects loaded or to be saved."""
+        return self._hosts
+
+    def add_hosts(self, hosts):
+        """Add host objects.
+
+        Save only them to database if `save_on_change` is set to True.
+        """
+        hosts = list(hosts)
+        for host in hosts:
+            self.hosts[host.name] = host
+
+        if self.save_on_change:
+            self._write(hosts)
+
+    def update_hosts(self, hosts):
+        """Update managed host objects.
+
+        Only adds.
+        """
+        self.add_hosts(hosts)
+
+    def delete_host(self, host):
+        """Delete host object."""
+        if host.name in self.hosts:
+            del self.hosts[host.name]
+            if self.save_on_change:
+                self._write([], deleted_names=[host.name])
+            else:
+                self._deleted.add(host.name)
@@ -14,8 +14,10 @@
 
 """Host object."""
 
+import json
+
 from mrack.providers import providers
-from mrack.utils import object2json
+from mrack.utils import json_convertor, object2json
 
 STATUS_PENDING = "pending"
 STATUS_PROVISIONING = "provisioning"
@@ -34,9 +36,17 @@ STATUSES = [
     STATUS_DELETING,
 ]
 
+# reused encoder, json.dumps would create new one for every host
+RAWDATA_ENCODER = json.JSONEncoder(default=json_convertor)
+
 
 def host_from_json(host_data):
-    """Reverse method to Host.__json__() after json.loads()."""
+    """Reverse method to Host.__json__() after json.loads().
+
+    Raw data stored as JSON string (`rawdata_json` key) are deserialized
+    only when accessed, raw data of hosts saved by older versions of mrack
+    (`rawdata` key) are read as they are.
+    """
     provider_name = host_data["provider"]
     provider = providers.get(provider_name)
     host = Host(
@@ -47,11 +57,12 @@ def host_from_json(host_data):
         host_data["group"],
         host_data["ip_addrs"],
         host_data["status"],
-        host_data["rawdata"],
+        host_data.get("rawdata"),
         host_data["username"],
         host_data["password"],
         host_data["error"],
         host_data.get("meta_extra"),
+        rawdata_json=host_data.get("rawdata_json"),
     )
     return host
 
@@ -60,8 +71,30 @@ class Host:
     """Provisioned host.
 
     Normalized values from providers to offer consistent interface.
+
+    Only status and error of host can be changed after its creation. JSON
+    representation of host is cached and the cache is dropped when any
+    of them changes.
     """
 
+    __slots__ = (
+        "_provider",
+        "_provider_name",
+        "_host_id",
+        "_name",
+        "_operating_system",
+        "_group",
+        "_ip_addrs",
+        "_status",
+        "_username",
+        "_password",
+        "_rawdata",
+        "_rawdata_json",
+        "_error",
+        "_meta_extra",
+        "_json",
+    )
+
     def __init__(
         self,
         provider,
@@ -76,9 +109,15 @@ class Host:
         password=None,
         error_obj=None,
         meta_extra=None,
+        rawdata_json=None,
     ):
-        """Initialize host object."""
+        """Initialize host object.
+
+        Raw data can be passed already serialized as `rawdata_json` string,
+        they are deserialized on first access then.
+        """
         self._provider = provider
+        self._provider_name = provider.name if provider else None
         self._host_id = host_id
         self._name = name
         self._operating_system = operating_system
@@ -88,8 +127,10 @@ class Host:
         self._username = username
         self._password = password
         self._rawdata = rawdata
+        self._rawdata_json = rawdata_json
         self._error = error_obj
         self._meta_extra = meta_extra
+        self._json = None
 
     def __str__(self):
         """Return string representation of host."""
@@ -110,9 +151,19 @@ class Host:
         return out
 
     def to_json(self):
-        """Transform object into representation which is acceptable by `json.dump`."""
-        return {
-            "provider": self._provider.name,
+        """Transform object into representation which is acceptable by `json.dump`.
+
+        Raw data are stored as JSON string so that loading of host does not need
+        to deserialize them, `rawdata` key is kept empty for older versions of
+        mrack. Returned dictionary is cached, do not modify it.
+        """
+        if self._json is not None:
+            return self._json
+
+        if self._rawdata_json is None:
+            self._rawdata_json = RAWDATA_ENCODER.encode(self._rawdata)
+        self._json = {
+            "provider": self._provider_name,
             "host_id": self._host_id,
             "name": self._name,
             "operating_system": self._operating_system,
@@ -121,10 +172,12 @@ class Host:
             "status": self._status,
             "username": self._username,
             "password": self._password,
-            "rawdata": self._rawdata,
+            "rawdata": None,
+            "rawdata_json": self._rawdata_json,
             "error": self._error,
             "meta_extra": self._meta_extra,
         }
+        return self._json
 
     @property
     def provider(self):
@@ -166,6 +219,19 @@ class Host:
         """Get host status."""
         return self._status
 
+    @status.setter
+    def status(self, value):
+        """Set host status."""
+        self._status = value
+        self._json = None
+
+    @property
+    def rawdata(self):
+        """Get raw host data from provider, deserialize them on first access."""
+        if self._rawdata is None and self._rawdata_json is not None:
+            self._rawdata = json.loads(self._rawdata_json)
+        return self._rawdata
+
     @property
     def error(self):
         """Get host error object."""
@@ -175,6 +241,7 @@ class Host:
     def error(self, value):
         """Set host error object."""
         self._error = value
+        self._json = None
 
     @property
     def username(self):
@@ -194,5 +261,5 @@ class Host:
     async def delete(self):
         """Issue host deletion via associated provider."""
         await self.provider.delete_host(self.host_id, self.name)
-        self._status = STATUS_DELETED
+        self.status = STATUS_DELETED
         return True
@@ -19,7 +19,7 @@ import typing
 from copy import deepcopy
 
 from mrack.errors import ConfigError
-from mrack.outputs.utils import get_external_id
+from mrack.outputs.utils import HostnameResolver, get_external_id
 from mrack.utils import (
     get_fqdn,
     get_host_from_metadata,
@@ -115,12 +115,20 @@ class AnsibleInventoryOutput:
     files and information in DB.
     """
 
-    def __init__(self, config, db, metadata, path=None):  # pylint: disable=invalid-name
+    def __init__(
+        self,
+        config,
+        db,  # pylint: disable=invalid-name
+        metadata,
+        path=None,
+        resolver=None,
+    ):
         """Init the output module."""
         self._config = config
         self._db = db
         self._metadata = metadata
         self._path = path or DEFAULT_INVENTORY_PATH
+        self._resolver = resolver or HostnameResolver()
 
     def create_ansible_host(self, name):
         """Create host entry for Ansible inventory."""
@@ -129,7 +137,7 @@ class AnsibleInventoryOutput:
         db_host = self._db.hosts[name]
 
         ip_addr = db_host.ip_addr
-        ansible_host = get_external_id(db_host, meta_host, self._config)
+        ansible_host = get_external_id(db_host, meta_host, self._config, self._resolver)
 
         python = (
             self._config["python"].get(meta_host["os"])
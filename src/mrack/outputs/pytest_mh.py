@@ -16,7 +16,7 @@
 
 import logging
 
-from mrack.outputs.utils import get_external_id, merge_dict
+from mrack.outputs.utils import HostnameResolver, get_external_id, merge_dict
 from mrack.utils import get_fqdn, get_os_type, get_password, get_username, save_yaml
 
 DEFAULT_MHCFG_PATH = "pytest-mh.yaml"
@@ -34,12 +34,13 @@ class PytestMhOutput:
     metadata definition.
     """
 
-    def __init__(self, config, db, metadata, path=None):
+    def __init__(self, config, db, metadata, path=None, resolver=None):
         """Init the output module."""
         self._config = config
         self._db = db
         self._metadata = metadata
         self._path = path or DEFAULT_MHCFG_PATH
+        self._resolver = resolver or HostnameResolver()
 
     def create_mh_config(self):
         """
@@ -69,7 +70,9 @@ class PytestMhOutput:
                     "role": host["role"],
                     "conn": {
                         "type": "ssh",
-                        "host": get_external_id(provisioned_host, host, self._config),
+                        "host": get_external_id(
+                            provisioned_host, host, self._config, self._resolver
+                        ),
                     },
                 }
 
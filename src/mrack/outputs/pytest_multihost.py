@@ -18,7 +18,7 @@ import logging
 import os
 from copy import deepcopy
 
-from mrack.outputs.utils import get_external_id
+from mrack.outputs.utils import HostnameResolver, get_external_id
 from mrack.utils import get_password, get_username, is_windows_host, save_yaml
 
 DEFAULT_MHCFG_PATH = "pytest-multihost.yaml"
@@ -36,12 +36,20 @@ class PytestMultihostOutput:
     metadata definition.
     """
 
-    def __init__(self, config, db, metadata, path=None):  # pylint: disable=invalid-name
+    def __init__(
+        self,
+        config,
+        db,  # pylint: disable=invalid-name
+        metadata,
+        path=None,
+        resolver=None,
+    ):
         """Init the output module."""
         self._config = config
         self._db = db
         self._metadata = metadata
         self._path = path or DEFAULT_MHCFG_PATH
+        self._resolver = resolver or HostnameResolver()
 
     def create_multihost_config(self):  # pylint: disable=too-many-branches
         """
@@ -97,7 +105,7 @@ class PytestMultihostOutput:
                 # If it is not available it uses hostname, but we assume here that
                 # hostname is internal and thus not resolvable. IP should be resolvable.
                 host["external_hostname"] = get_external_id(
-                    provisioned_host, host, self._config
+                    provisioned_host, host, self._config, self._resolver
                 )
 
                 if is_windows_host(host):
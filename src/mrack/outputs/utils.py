@@ -14,12 +14,19 @@
 
 """Utility functions for output modules."""
 
+import asyncio
 import copy
+import logging
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from socket import error as socket_error
 
 from mrack.utils import find_value_in_config_hierarchy
 
+logger = logging.getLogger(__name__)
+
+RESOLVE_WORKERS = 32  # max number of reverse DNS lookups running at the same time
+
 
 def resolve_hostname(ip_addr):
     """Resolve IP address to hostname."""
@@ -29,7 +36,56 @@ def resolve_hostname(ip_addr):
         return None
 
 
-def get_external_id(host, meta_host, config):
+class HostnameResolver:
+    """
+    Reverse DNS resolver remembering results of all lookups.
+
+    Failed lookups are remembered as well so that each IP address costs
+    at most one resolver timeout.
+    """
+
+    def __init__(self, workers=RESOLVE_WORKERS):
+        """Init the resolver."""
+        self.workers = workers
+        self._resolved = {}  # IP address -> hostname or None
+
+    def resolve(self, ip_addr):
+        """Resolve IP address to hostname, use remembered result if possible."""
+        if ip_addr not in self._resolved:
+            self._resolved[ip_addr] = resolve_hostname(ip_addr)
+        return self._resolved[ip_addr]
+
+    async def resolve_all(self, ip_addrs):
+        """Resolve all not yet resolved IP addresses concurrently."""
+        missing = [
+            ip_addr
+            for ip_addr in dict.fromkeys(ip_addrs)
+            if ip_addr and ip_addr not in self._resolved
+        ]
+        if not missing:
+            return
+
+        logger.debug(f"Resolving hostnames of {len(missing)} IP address(es)")
+        loop = asyncio.get_running_loop()
+        workers = min(self.workers, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            hostnames = await asyncio.gather(
+                *[
+                    loop.run_in_executor(executor, resolve_hostname, ip_addr)
+                    for ip_addr in missing
+                ]
+            )
+        self._resolved.update(zip(missing, hostnames))
+
+
+def should_resolve_host(host, meta_host, config):
+    """Check if host IP should be resolved to DNS name (key: resolve_host)."""
+    return find_value_in_config_hierarchy(
+        config, host.provider.name, host, meta_host, "resolve_host", None, None, True
+    )
+
+
+def get_external_id(host, meta_host, config, resolver=None):
     """
     Get host's external ID.
 
@@ -37,14 +93,13 @@ def get_external_id(host, meta_host, config):
     host configuration (key: resolve_host, default True).
 
     IP is used as fallback if the desired is not available.
-    """
-    resolve_ip = find_value_in_config_hierarchy(
-        config, host.provider.name, host, meta_host, "resolve_host", None, None, True
-    )
 
+    If `resolver` (HostnameResolver) is given, its remembered results are used.
+    """
     external_id = host.ip_addr
-    if resolve_ip:
-        external_id = resolve_hostname(host.ip_addr) or host.ip_addr
+    if should_resolve_host(host, meta_host, config):
+        resolve = resolver.resolve if resolver else resolve_hostname
+        external_id = resolve(host.ip_addr) or host.ip_addr
     return external_id
 
 
@@ -22,12 +22,27 @@ from datetime import datetime
 from random import shuffle
 
 import boto3
-from botocore.exceptions import ClientError, NoCredentialsError, NoRegionError
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    NoCredentialsError,
+    NoRegionError,
+)
 from dateutil import parser
 
-from mrack.errors import NotAuthenticatedError, ProvisioningError, ValidationError
+from mrack.errors import (
+    NotAuthenticatedError,
+    ProviderError,
+    ProvisioningError,
+    ValidationError,
+)
 from mrack.host import STATUS_ACTIVE, STATUS_DELETED, STATUS_ERROR, STATUS_PROVISIONING
 from mrack.providers.provider import STRATEGY_ABORT, Provider
+from mrack.providers.utils.ec2 import (
+    AsyncEC2Client,
+    EC2InstancePoller,
+    EC2LaunchBatcher,
+)
 from mrack.utils import object2json
 
 logger = logging.getLogger(__name__)
@@ -74,8 +89,14 @@ class AWSProvider(Provider):
         instance_tags,
         strategy=STRATEGY_ABORT,
         max_retry=1,
+        api_workers=None,
+        api_timeout=None,
     ):
-        """Initialize provider with data from AWS."""
+        """Initialize provider with data from AWS.
+
+        Blocking boto3 calls are run in a pool of up to `api_workers` threads
+        and each of them is limited by `api_timeout` seconds.
+        """
         # AWS_CONFIG_FILE=`readlink -f ./aws.key`
         log_msg_start = self.dsp_name
         logger.info(f"{log_msg_start} Initializing provider")
@@ -85,6 +106,11 @@ class AWSProvider(Provider):
         try:
             self.ec2 = boto3.resource("ec2")
             self.client = boto3.client("ec2")
+            self.aec2 = AsyncEC2Client(
+                self.client, workers=api_workers, call_timeout=api_timeout
+            )
+            self.poller = EC2InstancePoller(self.aec2)
+            self.launcher = EC2LaunchBatcher(self.aec2)
         except (NoRegionError, NoCredentialsError) as c_err:
             logger.debug(
                 f"{log_msg_start} Failed loading credentials file with: {str(c_err)}"
@@ -253,8 +279,8 @@ class AWSProvider(Provider):
     async def get_subnet_available_ips(self, subnet_id, log_msg_start):
         """Get number of IPs available in a subnet."""
         try:
-            subnet = self.ec2.Subnet(subnet_id)
-        except ClientError:
+            subnet = await self.aec2.describe_subnet(subnet_id)
+        except (ClientError, IndexError):
             logger.warning(
                 f"{log_msg_start} Error retrieving info from subnet: {subnet_id}"
             )
@@ -262,10 +288,10 @@ class AWSProvider(Provider):
 
         logger.debug(f"{log_msg_start} Subnet {subnet_id}")
         logger.debug(
-            f"{log_msg_start}   available: {subnet.available_ip_address_count}"
+            f"{log_msg_start}   available: {subnet['AvailableIpAddressCount']}"
         )
 
-        return subnet.available_ip_address_count
+        return subnet["AvailableIpAddressCount"]
 
     async def can_provision(self, hosts):  # pylint: disable=too-many-branches
         """Check that all host can be provisioned.
@@ -346,10 +372,13 @@ class AWSProvider(Provider):
             "23": 510,
         }
         res = 0
-        for net, _availability in self.subnets_capacity.items():
-            subnet = self.ec2.Subnet(net)
-            size = net_sizes[subnet.cidr_block.split("/")[-1]]
-            self.subnets_capacity[net] = subnet.available_ip_address_count
+        subnets = await asyncio.gather(
+            *[self.aec2.describe_subnet(net) for net in self.subnets_capacity]
+        )
+        for subnet in subnets:
+            net = subnet["SubnetId"]
+            size = net_sizes[subnet["CidrBlock"].split("/")[-1]]
+            self.subnets_capacity[net] = subnet["AvailableIpAddressCount"]
             usage = (size - self.subnets_capacity[net]) / size * 100
             res = usage if usage > res else res
 
@@ -360,6 +389,9 @@ class AWSProvider(Provider):
 
         req - dict of server requirements
 
+        Servers with the same launch parameters (image, flavor, subnet, security
+        groups, ...) requested at the same time are launched by one request.
+
         The req object can contain following additional attributes:
         * 'image': ami or name of image
         * 'flavor': flavor to use
@@ -378,14 +410,15 @@ class AWSProvider(Provider):
 
         name = req.get("name")
         # creating unique name for instance (visible in aws ec2 WebUI)
-        taglist = [{"Key": "Name", "Value": name}]
-        taglist.append(
+        name_tags = [{"Key": "Name", "Value": name}]
+        name_tags.append(
             {
                 "Key": "Hostname",
                 "Value": f"{name.split('.')[0]}-{secrets.token_hex()[:6]}",
             }
         )
 
+        taglist = []
         for key, value in self.instance_tags.items():
             taglist.append({"Key": key, "Value": value})
 
@@ -393,7 +426,10 @@ class AWSProvider(Provider):
             for key, value in specs.get("metadata").items():
                 taglist.append({"Key": key, "Value": value})
 
-        logger.debug(f"{log_msg_start} Tagging instance with: {object2json(taglist)}")
+        logger.debug(
+            f"{log_msg_start} Tagging instance with: "
+            f"{object2json(name_tags + taglist)}"
+        )
 
         ebs = {"DeleteOnTermination": del_vol}
         if disksize is not None:
@@ -404,8 +440,6 @@ class AWSProvider(Provider):
 
         request = {
             "ImageId": self.get_image(specs).image_id,
-            "MinCount": 1,
-            "MaxCount": 1,
             "InstanceType": specs.get("flavor"),
             "KeyName": self.ssh_key,
             "SecurityGroupIds": specs.get("security_group_ids", []),
@@ -415,8 +449,11 @@ class AWSProvider(Provider):
                     "Ebs": ebs,
                 },
             ],
-            "TagSpecifications": [{"ResourceType": "instance", "Tags": taglist}],
         }
+        if taglist:
+            request["TagSpecifications"] = [
+                {"ResourceType": "instance", "Tags": taglist}
+            ]
 
         subnet_ids = specs.get("subnet_ids")
         if subnet_ids:
@@ -426,7 +463,7 @@ class AWSProvider(Provider):
                     self.subnets_capacity[subnet_id] -= 1
                     request["SubnetId"] = subnet_id
                     break
-            if not request["SubnetId"]:
+            if not request.get("SubnetId"):
                 raise ProvisioningError(
                     f"There are no subnets with IPs available"
                     f"for use from {subnet_ids}",
@@ -444,7 +481,7 @@ class AWSProvider(Provider):
             request["UserData"] = specs["user_data"]
 
         try:
-            aws_res = self.ec2.create_instances(**request)
+            instance = await self.launcher.launch(request, name_tags)
         except ClientError as creation_error:
             err_msg = (
                 f"{log_msg_start} Requested image "
@@ -455,13 +492,13 @@ class AWSProvider(Provider):
             raise ProvisioningError(
                 f"{err_msg} Request failed with: {err_resp}", req
             ) from creation_error
-
-        ids = [srv.id for srv in aws_res]
-        if len(ids) != 1:  # ids must be len of 1 as we provision one vm at the time
-            raise ProvisioningError("Unexpected number of instances provisioned.", req)
+        except (ProviderError, BotoCoreError) as creation_error:
+            raise ProvisioningError(
+                f"{log_msg_start} Failed to create server: {creation_error}", req
+            ) from creation_error
 
         # returns id of provisioned instance and required host name
-        return (ids[0], req)
+        return (instance["InstanceId"], req)
 
     def get_ip_addresses(self, prov_result):
         """Get IP address from a provisioning result."""
@@ -478,7 +515,8 @@ class AWSProvider(Provider):
         result = {}
 
         result["id"] = prov_result.get("InstanceId")
-        for tag in prov_result.get("Tags"):
+        result["name"] = prov_result.get("mrack_req").get("name")
+        for tag in prov_result.get("Tags", []):
             if tag["Key"] == "Name":
                 result["name"] = tag["Value"]  # should be one key "name"
 
@@ -490,21 +528,33 @@ class AWSProvider(Provider):
         return result
 
     async def wait_till_provisioned(self, resource):
-        """Wait for AWS provisioning result."""
+        """Wait for AWS provisioning result.
+
+        All hosts share one poller so that states of all instances are checked
+        by a single describe_instances request per polling interval.
+        """
         aws_id, req = resource
-        instance = self.ec2.Instance(aws_id)
-        instance.wait_until_running()
-        response = self.client.describe_instances(InstanceIds=[aws_id])
-        result = {}
+        log_msg_start = f"{self.dsp_name} [{req['name']}]"
         try:  # returns dict with aws instance information
-            result = response["Reservations"][0]["Instances"][0]
-            result.update({"mrack_req": req})
-        except (KeyError, IndexError) as data_err:
+            result = await self.poller.wait(aws_id, timeout=self.timeout * 60)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{log_msg_start} ID {aws_id}: host was not provisioned "
+                f"within a timeout of {self.timeout} mins"
+            )
+            result = self.poller.last_seen(aws_id)
+        except ProviderError as poll_err:
+            raise ProvisioningError(
+                f"{log_msg_start} ID {aws_id}: {poll_err}", req
+            ) from poll_err
+
+        if not result:
             raise ProvisioningError(
-                "Unexpected data format in response "
-                f"of provisioned instance '{req['name']}'"
-            ) from data_err
+                f"Failed to get information about instance '{req['name']}'", req
+            )
 
+        result = deepcopy(result)
+        result.update({"mrack_req": req})
         return result, req
 
     async def delete_host(self, host_id, host_name):
@@ -518,7 +568,7 @@ class AWSProvider(Provider):
 
         logger.info(f"{log_msg_start} Terminating host with ID {host_id}")
         try:
-            self.ec2.instances.filter(InstanceIds=[host_id]).terminate()
+            await self.aec2.terminate_instances([host_id])
         except ClientError as error:
             logger.error(f"{log_msg_start} Issue while terminating host {host_id}:")
             logger.error(error.response["Error"]["Message"])
@@ -15,13 +15,11 @@
 """Beaker Provider interface."""
 
 import asyncio
+import json
 import logging
 import os
 import socket
-import xml.etree.ElementTree as eTree
-from copy import deepcopy
 from datetime import datetime, timedelta
-from xml.dom.minidom import Document as xml_doc
 from xmlrpc.client import Fault
 
 from bkr.client import BeakerJob, BeakerRecipe, BeakerRecipeSet
@@ -39,12 +37,23 @@ from mrack.host import (
     STATUS_PROVISIONING,
 )
 from mrack.providers.provider import STRATEGY_ABORT, Provider
-from mrack.utils import add_dict_to_node
+from mrack.providers.utils.beaker import (
+    DEFAULT_HUB_POOL_SIZE,
+    BeakerHubPool,
+    BeakerJobWatcher,
+    add_host_requires,
+    parse_recipes,
+)
 
 logger = logging.getLogger(__name__)
 
 PROVISIONER_KEY = "beaker"
 
+# requirement options used for whole job or recipe set instead of recipe,
+# only requirements with same values of them can share one job
+JOB_OPTIONS = ("whiteboard", "cc", "retention_tag", "product", "job_group", "job_owner")
+RECIPE_SET_OPTIONS = ("priority",)
+
 
 def parse_bkr_exc_str(exc_str):
     """Parse exception string and return response dictionary for mrack error."""
@@ -106,15 +115,27 @@ class BeakerProvider(Provider):
         reserve_duration,
         strategy=STRATEGY_ABORT,
         max_retry=1,
+        hub_pool_size=DEFAULT_HUB_POOL_SIZE,
+        multi_recipe_job=False,
     ):
-        """Initialize provider with data from Beaker configuration."""
+        """Initialize provider with data from Beaker configuration.
+
+        With `multi_recipe_job` enabled hosts provisioned together are
+        submitted as one job with recipe set per host.
+        """
         logger.info(f"{self.dsp_name} Initializing provider")
         self.strategy = strategy
         self.max_retry = max_retry
         self.distros = distros
         self.timeout = timeout
         self.reserve_duration = reserve_duration
-        self.hub = None
+        self.hub_pool = BeakerHubPool(self._create_hub, hub_pool_size)
+        self.job_watcher = None
+        self.multi_recipe_job = multi_recipe_job
+        self._job_batch = []  # (req, future) waiting for multi recipe job upload
+        self._job_batch_expected = set()  # names of hosts yet to join the batch
+        self.recipe_indexes = {}  # host name -> index of its recipe in job
+        self.recipe_sets = {}  # host name -> id of its recipe set in job
 
     async def validate_hosts(self, reqs):
         """Validate that host requirements are well specified."""
@@ -142,37 +163,16 @@ class BeakerProvider(Provider):
 
     def _translate_constraint(self, host_requires, host_recipe):
         """Transform host requires dict to xml."""
-        for operand, operand_value in host_requires.items():
-            if operand.startswith("_"):
-                host_recipe.setAttribute(
-                    operand[1:],
-                    operand_value,
-                )
-                continue
-            if operand not in ["and", "or"]:
-                req_node = xml_doc().createElement(operand)
-                req_node = add_dict_to_node(req_node, operand_value)
-                host_recipe.appendChild(req_node)
-                continue
-            # known operands are ["and", "or"]
-            req_node = xml_doc().createElement(operand)
-            for dct in operand_value:
-                if dct.get("or") or dct.get("and"):
-                    self._translate_constraint(dct, req_node)
-                else:
-                    req_node = add_dict_to_node(req_node, dct)
-            host_recipe.appendChild(req_node)
-
-    def _req_to_bkr_job(self, req):  # pylint: disable=too-many-locals
-        """Transform requirement to beaker job xml."""
-        specs = deepcopy(req)  # work with own copy, do not modify the input
+        add_host_requires(host_requires, host_recipe)
 
+    def _req_to_bkr_recipe(self, specs):  # pylint: disable=too-many-locals
+        """Transform requirement to beaker recipe."""
         # Create recipe with the specifications
         recipe = BeakerRecipe(**specs)
         recipe.addBaseRequires(**specs)
 
         # Specify the architecture
-        arch_node = xml_doc().createElement("distro_arch")
+        arch_node = recipe.doc.createElement("distro_arch")
         arch_node.setAttribute("op", "=")
         arch_node.setAttribute("value", specs["arch"])
         recipe.addDistroRequires(arch_node)
@@ -186,7 +186,7 @@ class BeakerProvider(Provider):
         distro_tags = specs.get("distro_tags")
         if distro_tags:
             for tag in distro_tags:
-                tag_node = xml_doc().createElement("distro_tag")
+                tag_node = recipe.doc.createElement("distro_tag")
                 tag_node.setAttribute("op", "=")
                 tag_node.setAttribute("value", tag)
                 recipe.addDistroRequires(tag_node)
@@ -197,7 +197,7 @@ class BeakerProvider(Provider):
         # Add watchdog element if configured
         watchdog_config = specs.get("watchdog")
         if watchdog_config and isinstance(watchdog_config, dict):
-            watchdog_node = xml_doc().createElement("watchdog")
+            watchdog_node = recipe.doc.createElement("watchdog")
             for key, value in watchdog_config.items():
                 watchdog_node.setAttribute(key, str(value))
             recipe.node.appendChild(watchdog_node)
@@ -210,25 +210,43 @@ class BeakerProvider(Provider):
                 fetch_url=task.get("fetch_url"),
             )
 
-        # Create RecipeSet and add our Recipe to it.
-        recipe_set = BeakerRecipeSet(**specs)
-        recipe_set.addRecipe(recipe)
+        return recipe
+
+    def _req_to_bkr_job(self, req):
+        """Transform requirement to beaker job xml."""
+        return self._reqs_to_bkr_job([req])
 
-        # Create job instance and inject created RecipeSet to it
-        job = BeakerJob(**specs)
-        job.addRecipeSet(recipe_set)
+    def _reqs_to_bkr_job(self, reqs):
+        """Transform requirements to one beaker job with recipe set per host.
+
+        Job options are taken from the first requirement, requirements are
+        expected to be grouped by `_job_group_key`.
+        """
+        # Create job instance and inject RecipeSet for every host to it,
+        # requirements are only read so no copy of them is needed
+        job = BeakerJob(**reqs[0])
+        for req in reqs:
+            recipe_set = BeakerRecipeSet(**req)
+            # addRecipe and addRecipeSet deep copy given node, nodes created
+            # here are not used anywhere else so they can be appended directly
+            recipe_set.node.appendChild(self._req_to_bkr_recipe(req).node)
+            job.node.appendChild(recipe_set.node)
 
         return job
 
-    def login_beaker(self):
+    async def login_beaker(self):
         """Login to the beaker hub."""
+        await self.hub_pool.login()
+
+    def _create_hub(self):
+        """Create new hub proxy with logged in session."""
         login_start = datetime.now()
         default_config = os.path.expanduser(
             os.environ.get("BEAKER_CONF", "/etc/beaker/client.conf")  # TODO use provc
         )  # get the beaker config for initialization of hub
         self.conf.load_from_file(default_config)
         try:
-            self.hub = HubProxy(logger=logger, conf=self.conf)
+            hub = HubProxy(logger=logger, conf=self.conf)
         except MissingCredentialsError as kinit_err:
             raise NotAuthenticatedError(
                 f"{self.dsp_name} needs Kerberos ticket to authenticate to BeakerHub. "
@@ -242,6 +260,7 @@ class BeakerProvider(Provider):
         login_end = datetime.now()
         login_duration = login_end - login_start
         logger.info(f"{self.dsp_name} Init duration {login_duration}")
+        return hub
 
     async def create_server(self, req):
         """Issue creation of a server.
@@ -261,11 +280,13 @@ class BeakerProvider(Provider):
         """
         logger.info(f"{self.dsp_name} [{req.get('name')}] Creating server")
 
+        if self.multi_recipe_job:
+            return await self._create_in_batch(req)
+
         job = self._req_to_bkr_job(req)  # Generate the job
-        if not self.hub:
-            self.login_beaker()
         try:
-            job_id = self.hub.jobs.upload(job.toxml())  # schedule beaker job
+            # schedule beaker job
+            job_id = await self.hub_pool.call("jobs.upload", job.toxml())
         except Fault as bkr_fault:
             # use the name as id for the logging purposes
             req["host_id"] = req.get("name")
@@ -276,6 +297,90 @@ class BeakerProvider(Provider):
 
         return (job_id, req)
 
+    @staticmethod
+    def _job_group_key(req):
+        """Get key of requirements which can be submitted in one job."""
+        options = {opt: req.get(opt) for opt in JOB_OPTIONS + RECIPE_SET_OPTIONS}
+        return json.dumps(options, sort_keys=True, default=str)
+
+    def expect_servers(self, reqs):
+        """Collect requirements of servers created together into one job."""
+        if self.multi_recipe_job:
+            self._job_batch_expected.update(req.get("name") for req in reqs)
+
+    async def _create_in_batch(self, req):
+        """Add requirement to job submitted together with expected requests.
+
+        The job is submitted once all expected requirements joined the batch,
+        requirement which was not expected (e.g. retried host) gets own job.
+        """
+        name = req.get("name")
+        future = asyncio.get_running_loop().create_future()
+        if name not in self._job_batch_expected:
+            await self._submit_batch([(req, future)])
+        else:
+            self._job_batch_expected.discard(name)
+            self._job_batch.append((req, future))
+            if not self._job_batch_expected:
+                batch, self._job_batch = self._job_batch, []
+                await self._submit_batch(batch)
+
+        job_id, index, recipe_set_id = await future
+        self.recipe_indexes[name] = index
+        self.recipe_sets[name] = recipe_set_id
+        return (job_id, req)
+
+    async def _submit_batch(self, batch):
+        """Submit collected requirements as jobs grouped by job options."""
+        groups = {}
+        for req, future in batch:
+            groups.setdefault(self._job_group_key(req), []).append((req, future))
+
+        await asyncio.gather(*[self._submit_group(group) for group in groups.values()])
+
+    async def _submit_group(self, group):
+        """Submit one multi recipe job and pass its id to waiting requests."""
+        reqs = [req for req, _future in group]
+        logger.info(f"{self.dsp_name} Submitting job with {len(reqs)} recipe(s)")
+        try:
+            job = self._reqs_to_bkr_job(reqs)
+            job_id = await self.hub_pool.call("jobs.upload", job.toxml())
+        except Fault as bkr_fault:
+            for req, future in group:
+                # use the name as id for the logging purposes
+                req["host_id"] = req.get("name")
+                future.set_exception(
+                    ProvisioningError(parse_bkr_exc_str(bkr_fault), req)
+                )
+            return
+        except Exception as submit_err:  # pylint: disable=broad-except
+            for _req, future in group:
+                future.set_exception(submit_err)
+            return
+
+        # hosts sharing the job are deleted by cancelling their recipe sets,
+        # get their ids right away so that every host can be deleted alone
+        try:
+            job_xml = await self.hub_pool.call("taskactions.to_xml", job_id)
+            recipes = parse_recipes(job_xml.encode("utf8"))
+            if len(recipes) != len(group):
+                raise ValueError(f"{len(recipes)} recipe(s) found in {job_id}")
+        except Exception as read_err:  # pylint: disable=broad-except
+            logger.error(f"{self.dsp_name} Failed to read job {job_id}: {read_err}")
+            await self.hub_pool.call(
+                "taskactions.stop", job_id, "cancel", "Job has been stopped by mrack."
+            )
+            for req, future in group:
+                req["host_id"] = req.get("name")
+                future.set_exception(
+                    ProvisioningError(f"Failed to read job {job_id}", req)
+                )
+            return
+
+        # recipe sets keep order of requirements so do the recipes in job xml
+        for index, ((_req, future), recipe) in enumerate(zip(group, recipes)):
+            future.set_result((job_id, index, recipe["rsid"]))
+
     def prov_result_to_host_data(self, prov_result, req):
         """Transform provisioning result to needed host data."""
         try:
@@ -303,34 +408,20 @@ class BeakerProvider(Provider):
 
         return result
 
-    def _get_recipe_info(self, beaker_id, log_msg_start):
-        """Get info about the recipe for beaker job id."""
-        if not self.hub:
-            self.login_beaker()
-        bkr_job_xml = self.hub.taskactions.to_xml(beaker_id).encode("utf8")
-        logs_dict = {}
-        resources = []
-        for recipe in eTree.fromstring(bkr_job_xml).iter("recipe"):
-            for logs in recipe.iter("logs"):
-                for log in logs.iter("log"):
-                    logs_dict[log.get("name")] = log.get("href")
-            resources.append(
-                {
-                    "system": recipe.get("system"),
-                    "status": recipe.get("status"),
-                    "result": recipe.get("result"),
-                    "rid": recipe.get("id"),
-                    "id": recipe.get("job_id"),
-                    "logs": logs_dict,
-                }
+    def _get_recipes(self, beaker_id):
+        """Get info about recipes of beaker job, to be run in hub pool executor."""
+        bkr_job_xml = self.hub_pool.call_blocking("taskactions.to_xml", beaker_id)
+        return parse_recipes(bkr_job_xml.encode("utf8"))
+
+    def _get_job_watcher(self):
+        """Get shared watcher of beaker jobs, create it if not yet done."""
+        if not self.job_watcher:
+            self.job_watcher = BeakerJobWatcher(
+                self._get_recipes,
+                interval=self.poll_sleep,
+                executor=self.hub_pool.executor,
             )
-
-        logger.debug(
-            f"{log_msg_start} has status:{resources[0]['status']}, "
-            f"result:{resources[0]['result']}, waiting another {self.poll_sleep:.1f}s"
-        )
-
-        return resources[0]
+        return self.job_watcher
 
     async def wait_till_provisioned(self, resource):
         """Wait for Beaker provisioning result."""
@@ -339,73 +430,69 @@ class BeakerProvider(Provider):
         bkr_res = {}
         prev_status = ""
         job_url = ""
-        if not self.hub:
-            self.login_beaker()
-        hub_url = self.hub._hub_url  # pylint: disable=protected-access
+        if not self.hub_pool.hub_url:
+            await self.login_beaker()
+        hub_url = self.hub_pool.hub_url
+        watcher = self._get_job_watcher()
+        recipe_index = self.recipe_indexes.get(req.get("name"))
 
         # let us use timeout variable which is in minutes to define
         # maximum time to wait for beaker recipe to provide VM
         timeout_time = datetime.now() + timedelta(minutes=self.timeout)
 
-        while datetime.now() < timeout_time:
-            prev_bkr_res = bkr_res
+        while True:
+            remaining = (timeout_time - datetime.now()).total_seconds()
             try:
-                bkr_res = self._get_recipe_info(beaker_id, log_msg_start=log_msg_start)
-            except TimeoutError as timeout:
-                logger.warning(
-                    f"{log_msg_start} Can not connect to {hub_url}: {timeout}"
+                # wait till the recipe status changes
+                bkr_res = await watcher.wait(
+                    beaker_id, prev_status, max(remaining, 0), index=recipe_index or 0
                 )
-                logger.debug(
-                    f"{log_msg_start} Using previous result "
-                    f"and retrying in {self.poll_sleep:.1f}s"
+            except asyncio.TimeoutError:
+                # In this case we failed to provision host in time:
+                # we need to create failed host object for mrack
+                # to delete the resource by cancelling the beaker job.
+                logger.error(
+                    f"{log_msg_start} Job {job_url} failed to provide bkr_res in"
+                    f" the timeout of {self.timeout} minutes"
+                )
+                bkr_res.update(
+                    {
+                        "status": "MRACK_REACHED_TIMEOUT",
+                        "result": f"Job {job_url} reached timeout",
+                    }
                 )
-                bkr_res = prev_bkr_res
+                break
 
             status = bkr_res.get("status", "")
             job_url = f"{hub_url}/jobs/{bkr_res.get('id', None)}"
+            logger.info(
+                f"{log_msg_start} Job {job_url} "
+                f"has changed status ({prev_status} -> {status})"
+            )
+            prev_status = status
 
-            status_changed = prev_status != status
-            if status_changed:
-                logger.info(
-                    f"{log_msg_start} Job {job_url} "
-                    f"has changed status ({prev_status} -> {status})"
-                )
-                prev_status = status
-
-            # if we have problem contacting hub from beginning: status will not change
-            if self.status_map.get(status) == STATUS_PROVISIONING or not status_changed:
-                await asyncio.sleep(self.poll_sleep)
-            elif self.status_map.get(status) == STATUS_ACTIVE:
+            if self.status_map.get(status) == STATUS_PROVISIONING:
+                continue
+            if self.status_map.get(status) == STATUS_ACTIVE:
                 break
-            elif self.status_map.get(status) in [STATUS_ERROR, STATUS_DELETED]:
+            if self.status_map.get(status) in [STATUS_ERROR, STATUS_DELETED]:
                 logger.warning(
                     f"{log_msg_start} Job {job_url} has errored with status "
                     f"{status} and result {bkr_res['result']}"
                 )
-                bkr_res.update({"result": f"Job {job_url} failed to provision"})
-                break
             else:
                 logger.error(
                     f"{log_msg_start} Job {job_url} has switched to unexpected "
                     f"status {status} with result {bkr_res['result']}"
                 )
-                bkr_res.update({"result": f"Job {job_url} failed to provision"})
-                break
+            bkr_res.update({"result": f"Job {job_url} failed to provision"})
+            break
 
-        else:
-            # In this case we failed to provision host in time:
-            # we need to create failed host object for mrack
-            # to delete the resource by cancelling the beaker job.
-            logger.error(
-                f"{log_msg_start} Job {job_url} failed to provide bkr_res in"
-                f" the timeout of {self.timeout} minutes"
-            )
-            bkr_res.update(
-                {
-                    "status": "MRACK_REACHED_TIMEOUT",
-                    "result": f"Job {job_url} reached timeout",
-                }
-            )
+        recipe_set_id = self.recipe_sets.get(req.get("name"))
+        if recipe_set_id:
+            # host shares job with other hosts so it is deleted by cancelling
+            # its own recipe set (beaker can not cancel single recipe)
+            beaker_id = f"RS:{recipe_set_id}"
 
         bkr_res.update(
             {
@@ -421,26 +508,28 @@ class BeakerProvider(Provider):
         # and proper response from beaker hub has beed returned.
         # Other way (In case of hub error or invalid host definition)
         # the provider uses hostname from metadata of the VM which has failed
-        # to validate the requirements for the provider
+        # to validate the requirements for the provider.
+        # host_id starting with 'RS:' identifies recipe set of multi recipe job.
         log_msg_start = f"{self.dsp_name} [{host_name}]"
         if host_id.isdigit():
             host_id = "J:" + host_id
-        if not host_id.startswith("J:"):
+        if not host_id.startswith(("J:", "RS:")):
             logger.warning(
                 f"{log_msg_start} Job for host '{host_id}' does not exist yet"
             )
             return True
 
-        if not self.hub:
-            self.login_beaker()
+        if not self.hub_pool.hub_url:
+            await self.login_beaker()
 
-        logger.info(
-            f"{log_msg_start} Deleting host by cancelling Job "
-            f"{self.hub._hub_url}"  # pylint: disable=protected-access
-            f"/jobs/{host_id.split(':')[1]}"
-        )
-        return self.hub.taskactions.stop(
-            host_id, "cancel", "Job has been stopped by mrack."
+        task_type, task_id = host_id.split(":", 1)
+        if task_type == "J":
+            task_desc = f"Job {self.hub_pool.hub_url}/jobs/{task_id}"
+        else:
+            task_desc = f"Recipe set {host_id}"
+        logger.info(f"{log_msg_start} Deleting host by cancelling {task_desc}")
+        return await self.hub_pool.call(
+            "taskactions.stop", host_id, "cancel", "Job has been stopped by mrack."
         )
 
     def to_host(self, provisioning_result, req, username="root"):
@@ -17,8 +17,8 @@
 import asyncio
 import logging
 from copy import deepcopy
-from datetime import datetime, timedelta
-from random import random, sample
+from datetime import datetime
+from random import sample
 from urllib.parse import parse_qs, urlparse
 
 import aiofiles  # type: ignore
@@ -38,7 +38,8 @@ from mrack.errors import (
 )
 from mrack.host import STATUS_ACTIVE, STATUS_DELETED, STATUS_ERROR, STATUS_PROVISIONING
 from mrack.providers.provider import STRATEGY_ABORT, Provider
-from mrack.providers.utils.osapi import ExtraNovaClient, NeutronClient
+from mrack.providers.utils.cache import ObjectCache, cache_key
+from mrack.providers.utils.osapi import ExtraNovaClient, NeutronClient, NovaServerPoller
 from mrack.utils import get_shortname, is_windows_host, object2json
 
 logger = logging.getLogger(__name__)
@@ -54,6 +55,8 @@ SERVER_ERROR_SLEEP = 10  # seconds
 SERVER_RES_SLEEP = 10  # minutes
 NETWORK_NAME = 0
 NETWORK_SIZE = 1
+IMAGE_PAGE_LIMIT = 1000  # max number of images in one Glance response
+IMAGE_QUERY_CONCURRENCY = 10  # max number of image queries at the same time
 
 
 class OpenStackProvider(Provider):
@@ -84,7 +87,8 @@ class OpenStackProvider(Provider):
         self.poll_sleep_initial = 15  # seconds
         self.poll_sleep = 7  # seconds
         self.poll_init_adj = 0  # set based on # of hosts to provisions
-        self.poll_adj = 0  # set based on # of hosts to provisions
+        self.server_poller = None
+        self.cache = None
         self.status_map = {
             "ACTIVE": STATUS_ACTIVE,
             "BUILD": STATUS_PROVISIONING,
@@ -231,6 +235,8 @@ class OpenStackProvider(Provider):
         cloud_profile="",
         keypair="",
         pubkey="",
+        cache_ttl=None,
+        partial_provisioning=False,
     ):
         """Initialize provider with data from OpenStack.
 
@@ -240,29 +246,79 @@ class OpenStackProvider(Provider):
         * network availabilities (number of available IPs for networks)
         * images which were defined in `images` option
         * account limits (max and current usage of vCPUs, memory, ...)
+
+        Flavors, networks and images are taken from on-disk cache if `cache_ttl`
+        (seconds per object type) is set and the cached objects are still fresh.
+        Network availabilities and limits are always loaded from OpenStack.
+
+        With `partial_provisioning` enabled hosts which fit to account limits
+        are provisioned at once and the rest when limits allow it.
         """
         logger.info(f"{self.dsp_name} Initializing provider")
         self.strategy = strategy
         self.max_retry = max_retry
+        self.partial_provisioning = partial_provisioning
         self.cloud_profile = cloud_profile
         self.keypair = keypair
         self.pubkey = pubkey
 
+        await self._login()
+        await self._import_public_key()
+
+        self.network_pools = networks
+        object_start = datetime.now()
+
+        if cache_ttl:
+            self.cache = ObjectCache(self._cache_path(), cache_ttl)
+
+        _, _, self.limits, _, _ = await self._openstack_gather_responses(
+            [self._load_cached, ["flavors", self._load_flavors, self._set_flavors], {}],
+            [self._load_cached_images, [image_names], {}],
+            [self.nova.limits.show, [], {}],
+            [
+                self._load_cached,
+                ["networks", self._load_networks, self._set_networks],
+                {},
+            ],
+            [self._load_ip_availabilities, [], {}],
+        )
+
+        if self.cache:
+            self.cache.save()
+
+        object_duration = datetime.now() - object_start
+        logger.info(
+            f"{self.dsp_name} Environment objects load duration: {object_duration}"
+        )
+
+    async def init_teardown(self, cloud_profile=""):
+        """Initialize provider only for deletion of hosts.
+
+        Only authenticated Nova client is created. No public key is imported
+        and no flavors, images, networks or limits are loaded.
+        """
+        logger.info(f"{self.dsp_name} Initializing provider for teardown")
+        self.cloud_profile = cloud_profile
+        await self._login(teardown=True)
+
+    async def _login(self, teardown=False):
+        """Create session and log in API clients, only Nova one in teardown mode."""
         # Session expects that credentials will be set via env variables
         # or clouds.yaml file. For the latter, cloud profile should be specified
         # in provisioning-config openstack.profile key or in envvar OS_CLOUD.
         self.session = await self._create_session()
 
         self.nova = ExtraNovaClient(session=self.session)
-        self.glance = GlanceClient(session=self.session)
-        self.neutron = NeutronClient(session=self.session)
+        clients = [self.nova]
+        if not teardown:
+            self.glance = GlanceClient(session=self.session)
+            self.neutron = NeutronClient(session=self.session)
+            clients.extend([self.glance, self.neutron])
 
         login_start = datetime.now()
         try:
             await asyncio.gather(
-                self.nova.init_api(self.api_timeout),
-                self.glance.init_api(self.api_timeout),
-                self.neutron.init_api(self.api_timeout),
+                *[client.init_api(self.api_timeout) for client in clients]
             )
         except KeyError as e:
             err_msg = "Authentication to Openstack with provided credentials failed"
@@ -277,23 +333,46 @@ class OpenStackProvider(Provider):
         login_end = datetime.now()
         logger.info(f"{self.dsp_name} Login duration {login_end - login_start}")
 
-        await self._import_public_key()
-
-        self.network_pools = networks
-        object_start = datetime.now()
-
-        _, _, self.limits, _, _ = await self._openstack_gather_responses(
-            [self._load_flavors, [], {}],
-            [self._load_images, [image_names], {}],
-            [self.nova.limits.show, [], {}],
-            [self._load_networks, [], {}],
-            [self._load_ip_availabilities, [], {}],
+    def _cache_path(self):
+        """Get path of cache file specific for OpenStack instance, region, project."""
+        key = cache_key(
+            getattr(self.session, "os_auth_url", None),
+            getattr(self.session, "os_region_name", None),
+            getattr(self.session, "os_project_name", None)
+            or getattr(self.session, "os_project_id", None)
+            or getattr(self.session, "os_application_credential_id", None),
         )
+        return f"{global_context.CONFIG.cache_dir}/{PROVISIONER_KEY}-{key}.json"
+
+    async def _load_cached(self, obj_type, loader, setter):
+        """Load objects from cache if they are fresh, otherwise use loader."""
+        cached = self.cache.get(obj_type) if self.cache else None
+        if cached is not None:
+            setter(cached)
+            return cached
+
+        objects = await loader()
+        if self.cache:
+            self.cache.set(obj_type, objects)
+        return objects
+
+    async def _load_cached_images(self, image_names=None):
+        """Load images from cache, load only missing ones from OpenStack.
+
+        Complete image listing (no image names) is never cached. Every image
+        expires on its own so loading of missing images does not renew
+        the cached ones.
+        """
+        if not self.cache or not image_names:
+            return await self._load_images(image_names)
 
-        object_duration = datetime.now() - object_start
-        logger.info(
-            f"{self.dsp_name} Environment objects load duration: {object_duration}"
-        )
+        self._set_images(self.cache.get_entries("images").values())
+        missing = [name for name in image_names if name not in self.images]
+        if missing:
+            loaded = await self._load_images(missing)
+            self.cache.set_entries("images", {image["id"]: image for image in loaded})
+
+        return [self.images[name] for name in image_names if name in self.images]
 
     def _set_flavors(self, flavors):
         """Extend provider configuration with list of flavors."""
@@ -650,34 +729,53 @@ class OpenStackProvider(Provider):
 
         Load everything if image_names list is not specified.
 
-        Specifying list of images to load might improve performance if the
-        OpenStack instance contains a lot of images.
+        Specified images are queried by name in parallel which performs much
+        better than listing of all images if the OpenStack instance contains
+        a lot of them.
         """
-        params = {"limit": 1000}
+        if not image_names:
+            return await self._list_images()
+
+        semaphore = asyncio.Semaphore(IMAGE_QUERY_CONCURRENCY)
+
+        async def load_image(name):
+            async with semaphore:
+                return await self._list_images(name=name)
+
+        results = await asyncio.gather(
+            *[load_image(name) for name in dict.fromkeys(image_names)]
+        )
+        return [image for images in results for image in images]
 
-        if image_names:
-            image_filter = ",".join(image_names)
-            image_filter = "in:" + image_filter
-            params["name"] = image_filter
+    async def _list_images(self, **filters):
+        """List images matching filters, follow all result pages.
 
+        Glance paginates by marker (ID of the last image on previous page),
+        so pages are requested one after another. Images are added to provider
+        configuration as soon as their page arrives.
+        """
+        params = {"limit": IMAGE_PAGE_LIMIT, **filters}
         images = []
-        response = await self.glance.images.list(**params)
-        images.extend(response["images"])
-
-        while response.get("next"):
-            p_result = urlparse(response.get("next"))
-            query = p_result.query
-            next_params = parse_qs(query)
-            for key, val in next_params.items():
-                if isinstance(val, list) and val:
-                    next_params[key] = val[0]
-            response = await self.glance.images.list(**next_params)
-            images.extend(response["images"])
 
-        self._set_images(images)
+        while params:
+            response = await self.glance.images.list(**params)
+            self._set_images(response["images"])
+            images.extend(response["images"])
+            params = self._next_images_params(response.get("next"))
 
         return images
 
+    def _next_images_params(self, next_link):
+        """Get query parameters of next image page from Glance next link."""
+        if not next_link:
+            return None
+
+        next_params = parse_qs(urlparse(next_link).query)
+        for key, val in next_params.items():
+            if isinstance(val, list) and val:
+                next_params[key] = val[0]
+        return next_params
+
     async def _load_networks(self):
         """Extend provider configuration by loading all networks from OpenStack."""
         resp = await self.neutron.network.list()
@@ -760,20 +858,25 @@ class OpenStackProvider(Provider):
 
     def _set_poll_sleep_times(self, reqs):
         """
-        Compute polling sleep times based on number of hosts.
+        Compute initial polling sleep time based on number of hosts.
 
-        So that we don't create unnecessary load on server while still checking returns
-        (initial_sleep, sleep)
+        Initial poll is the biggest performance saver it should be around
+        time when more than half of host is in ACTIVE state. Following polls
+        are done by one request for all hosts so their frequency doesn't depend
+        on number of hosts.
         """
-        count = len(reqs)
-
-        # initial poll is the biggest performance saver it should be around
-        # time when more than half of host is in ACTIVE state
-        self.poll_init_adj = 0.65 * count
-
-        # poll time should ask often enough, to not create unnecessary delays
-        # while not that many to not load the server much
-        self.poll_adj = 0.22 * count
+        self.poll_init_adj = 0.65 * len(reqs)
+
+    def _get_server_poller(self):
+        """Get poller shared by all servers waiting to be provisioned."""
+        if not self.server_poller:
+            poll_sleep_initial = self.poll_sleep_initial + self.poll_init_adj
+            self.server_poller = NovaServerPoller(
+                self.nova,
+                interval=self.poll_sleep,
+                initial_delay=poll_sleep_initial,
+            )
+        return self.server_poller
 
     async def prepare_provisioning(self, reqs):
         """
@@ -873,6 +976,42 @@ class OpenStackProvider(Provider):
 
         return req_vcpus <= limit_vcpus and req_memory <= limit_memory
 
+    async def fitting_requirements(self, reqs):
+        """Get the largest subset of requirements fitting to account limits.
+
+        Smallest hosts are taken first so that as many hosts as possible
+        can be provisioned right now.
+        """
+        needs = [self.get_host_requirements(req) for req in reqs]
+        used_vcpus, used_memory, limit_vcpus, limit_memory = await self._load_limits()
+        free_vcpus = limit_vcpus - used_vcpus
+        free_memory = limit_memory - used_memory
+
+        def limit_share(index):
+            return max(
+                needs[index]["vcpus"] / max(limit_vcpus, 1),
+                needs[index]["ram"] / max(limit_memory, 1),
+            )
+
+        fitting = set()
+        for index in sorted(range(len(reqs)), key=limit_share):
+            if needs[index]["vcpus"] > free_vcpus or needs[index]["ram"] > free_memory:
+                continue
+            fitting.add(index)
+            free_vcpus -= needs[index]["vcpus"]
+            free_memory -= needs[index]["ram"]
+
+        logger.info(
+            f"{self.dsp_name} {len(fitting)} of {len(reqs)} host(s) fit to limits, "
+            f"used vcpus: {used_vcpus}, max: {limit_vcpus}, "
+            f"used ram: {used_memory}, max: {limit_memory}"
+        )
+        return [req for index, req in enumerate(reqs) if index in fitting]
+
+    async def resource_usage(self):
+        """Get used and maximal vCPUs and memory from account limits."""
+        return await self._load_limits()
+
     async def utilization(self):
         """Check utilization of provider."""
         used_vcpus, used_memory, limit_vcpus, limit_memory = await self._load_limits()
@@ -997,16 +1136,15 @@ class OpenStackProvider(Provider):
                 )
                 break
 
-    async def wait_till_provisioned(self, resource):  # pylint: disable=too-many-locals
+    async def wait_till_provisioned(self, resource):
         """
         Wait till server is provisioned.
 
         Provisioned means that server is in ACTIVE or ERROR state
 
-        State is checked by polling. Polling can be controller via `poll_sleep` and
-        `poll_sleep_initial` options. This is useful when provisioning a lot of
-        machines as it is better to increase initial poll to not ask to often as
-        provisioning resources takes some time.
+        State is checked by one shared poller for all servers so that there is
+        only one request per poll regardless of number of servers. Polling can be
+        controlled via `poll_sleep` and `poll_sleep_initial` options.
 
         Waits till timeout happens. Timeout can be either specified or default provider
         timeout is used.
@@ -1016,60 +1154,32 @@ class OpenStackProvider(Provider):
         resource, req = resource
         log_msg_start = f"{self.dsp_name} [{req.get('name')}]"
         uuid = resource.get("id")
-
-        poll_sleep_initial = self.poll_sleep_initial + self.poll_init_adj
-        poll_sleep_initial = (
-            poll_sleep_initial / 2 + poll_sleep_initial * random() * 1.5
-        )
-        poll_sleep = self.poll_sleep + self.poll_adj
+        poller = self._get_server_poller()
 
         start = datetime.now()
-        timeout_time = start + timedelta(minutes=self.timeout)
-
-        # do not check the state immediately, it will take some time
-        logger.debug(
-            f"{log_msg_start} ID {uuid}: sleeping for {poll_sleep_initial:.1f} seconds"
-        )
-        await asyncio.sleep(poll_sleep_initial)
-
-        resp = {}
         logger.debug(f"{log_msg_start} ID {uuid}: Waiting for host creation")
-        error_attempts = 0
-        while datetime.now() < timeout_time:
-            try:
-                resp = await self.nova.servers.get(uuid)
-            except NotFoundError as nf_err:
-                raise ServerNotFoundError(uuid) from nf_err
-            except ServerError as err:
-                logger.debug(f"{log_msg_start} {err}")
-                error_attempts += 1
-                if error_attempts > SERVER_ERROR_RETRY:
-                    raise ProvisioningError(uuid) from err
-
-            server = resp["server"]
-            if server["status"] in ["ACTIVE", "ERROR"]:
-                break
-
-            poll_sleep += 0.5  # increase delays to check the longer it takes
-            logger.debug(
-                f"{log_msg_start} ID {uuid}: sleeping for {poll_sleep:.1f} seconds"
-            )
-            await asyncio.sleep(poll_sleep)
-
-        done_time = datetime.now()
-        prov_duration = (done_time - start).total_seconds()
-
-        if datetime.now() >= timeout_time:
+        try:
+            server = await poller.wait(uuid, timeout=self.timeout * 60)
+        except asyncio.TimeoutError:
             logger.warning(
                 f"{log_msg_start} ID {uuid}: host was not provisioned "
                 f"within a timeout of {self.timeout} mins"
             )
+            server = poller.last_seen(uuid) or resource
+        except ServerNotFoundError:
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            raise ProvisioningError(
+                f"{log_msg_start} ID {uuid}: Failed to get server state: {err}", req
+            ) from err
         else:
+            prov_duration = (datetime.now() - start).total_seconds()
             logger.info(
                 f"{log_msg_start} ID {uuid}: host "
                 f"was provisioned in {prov_duration:.1f}s"
             )
 
+        server = deepcopy(server)
         server.update({"mrack_req": req})
 
         return server, req
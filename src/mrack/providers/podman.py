@@ -17,17 +17,36 @@
 import asyncio
 import logging
 import os
+import uuid
 from datetime import datetime, timedelta
 
 from mrack.errors import ProvisioningError, ServerNotFoundError
 from mrack.host import STATUS_ACTIVE, STATUS_DELETED, STATUS_ERROR, STATUS_OTHER
 from mrack.providers.provider import STRATEGY_ABORT, Provider
-from mrack.providers.utils.podman import Podman
+from mrack.providers.utils.podman import (
+    BACKEND_API,
+    BACKEND_CLI,
+    EVENT_DIED,
+    EVENT_HEALTHY,
+    EVENT_REMOVE,
+    EVENT_START,
+    READINESS_EVENTS,
+    READINESS_POLL,
+    Podman,
+    PodmanAPI,
+    PodmanEventWatcher,
+    default_api_socket,
+)
 from mrack.utils import object2json
 
 logger = logging.getLogger(__name__)
 
 PROVISIONER_KEY = "podman"
+RUN_LABEL = "mrack.run"  # label of containers created by one provider run
+SSHD_CHECK = "systemctl -q is-active sshd"
+HEALTH_INTERVAL = "2s"
+HEALTH_CMD_OPTION = "--health-cmd"
+EVENTS_GRACE_PERIOD = 60  # seconds to wait for podman event before polling
 
 
 class PodmanProvider(Provider):
@@ -40,6 +59,9 @@ class PodmanProvider(Provider):
         self.dsp_name = "Podman"
         self.max_retry = 1  # for retry strategy
         self.podman = Podman()
+        self.event_watcher = None
+        self._provisioning = False  # hosts are being provisioned
+        self.run_id = uuid.uuid4().hex
         self.status_map = {
             STATUS_ACTIVE: STATUS_ACTIVE,
             STATUS_DELETED: STATUS_DELETED,
@@ -56,8 +78,18 @@ class PodmanProvider(Provider):
         extra_commands,
         strategy=STRATEGY_ABORT,
         max_retry=1,
+        backend=BACKEND_CLI,
+        api_socket=None,
+        readiness=READINESS_POLL,
     ):
-        """Initialize Podman provider with data from config."""
+        """Initialize Podman provider with data from config.
+
+        With `backend` set to "api" podman service REST API listening on
+        `api_socket` is used instead of running podman command for each call.
+
+        With `readiness` set to "events" containers and their sshd are not
+        polled, provider waits for podman events (including health checks).
+        """
         logger.info(f"{self.dsp_name} Initializing provider")
         login_start = datetime.now()
         self.strategy = strategy
@@ -68,6 +100,31 @@ class PodmanProvider(Provider):
         self.ssh_key = ssh_key
         self.podman_options = container_options
         self.extra_commands = extra_commands
+        if backend == BACKEND_API:
+            api_socket = os.path.expanduser(api_socket or default_api_socket())
+            if os.path.exists(api_socket):
+                try:
+                    self.podman = PodmanAPI(api_socket)
+                    logger.info(f"{self.dsp_name} Using podman service at {api_socket}")
+                except ImportError:
+                    logger.warning(
+                        f"{self.dsp_name} Python aiohttp package is required to use "
+                        "podman service, falling back to podman command."
+                    )
+            else:
+                logger.warning(
+                    f"{self.dsp_name} Podman service socket {api_socket} does not "
+                    "exist, falling back to podman command. The service can be "
+                    "started by 'systemctl --user start podman.socket'"
+                )
+        if readiness == READINESS_EVENTS:
+            self.event_watcher = PodmanEventWatcher(
+                self.podman,
+                filters={
+                    "type": ["container"],
+                    "label": [f"{RUN_LABEL}={self.run_id}"],
+                },
+            )
         login_end = datetime.now()
         login_duration = login_end - login_start
         logger.info(f"{self.dsp_name} Init duration {login_duration}")
@@ -126,6 +183,35 @@ class PodmanProvider(Provider):
 
         return success
 
+    async def provision_hosts(self, reqs):
+        """Provision hosts, close podman service connections when done."""
+        self._provisioning = True
+        try:
+            return await super().provision_hosts(reqs)
+        finally:
+            self._provisioning = False
+            await self._close_podman()
+
+    async def delete_hosts(self, hosts):
+        """Delete hosts, close podman service connections when done.
+
+        Hosts deleted while provisioning (e.g. retried hosts) keep the
+        connections and event watcher for the other hosts, they are closed
+        at the end of provisioning.
+        """
+        try:
+            return await super().delete_hosts(hosts)
+        finally:
+            if not self._provisioning:
+                await self._close_podman()
+
+    async def _close_podman(self):
+        """Stop event watcher, close connections to podman service if used."""
+        if self.event_watcher:
+            await self.event_watcher.stop()
+        if isinstance(self.podman, PodmanAPI):
+            await self.podman.close()
+
     async def validate_hosts(self, reqs):
         """Validate that host requirements are well specified."""
         return bool(reqs)  # TODO
@@ -154,12 +240,18 @@ class PodmanProvider(Provider):
                 "Could not set up podman network for some host(s)", req
             )
 
+        extra_options = self.podman_options
+        if self.event_watcher:
+            # subscribe before the container starts so that no event is missed
+            self.event_watcher.start()
+            extra_options = self._event_options()
+
         try:
             container_id = await self.podman.run(
                 image,
                 hostname,
                 network,
-                extra_options=self.podman_options,
+                extra_options=extra_options,
                 remove_at_stop=True,
             )
         except ProvisioningError as p_error:
@@ -177,7 +269,12 @@ class PodmanProvider(Provider):
         timeout = 20
         timeout_time = start + timedelta(minutes=timeout)
 
-        while datetime.now() < timeout_time:
+        if self.event_watcher:
+            await self._wait_for_events(
+                cont_id, (EVENT_START, EVENT_DIED, EVENT_REMOVE), timeout_time
+            )
+
+        while True:
             try:
                 servers = await self.podman.inspect(cont_id)
                 server = servers[0]
@@ -187,6 +284,8 @@ class PodmanProvider(Provider):
 
             if server["State"]["Running"] or server["State"]["Error"]:
                 break
+            if datetime.now() >= timeout_time:
+                break
             await asyncio.sleep(1)
 
         done_time = datetime.now()
@@ -230,13 +329,58 @@ class PodmanProvider(Provider):
 
         return server, req
 
-    async def _wait_for_ssh(self, host, timeout, port):
+    def _event_options(self):
+        """Get container options to label it and to run sshd health check.
+
+        Health check set by user is kept, sshd is polled for such containers.
+        """
+        options = dict(self.podman_options)
+        labels = options.get("--label", [])
+        if not isinstance(labels, list):
+            labels = [labels]
+        options["--label"] = labels + [f"{RUN_LABEL}={self.run_id}"]
+        if not self._user_health_check():
+            options[HEALTH_CMD_OPTION] = SSHD_CHECK
+            options["--health-interval"] = HEALTH_INTERVAL
+        return options
+
+    def _user_health_check(self):
+        """Check if user set own health check in container options."""
+        return HEALTH_CMD_OPTION in self.podman_options
+
+    async def _wait_for_events(self, cont_id, statuses, timeout_time):
+        """Wait till container reaches one of statuses, return the status.
+
+        Events are waited for at most `EVENTS_GRACE_PERIOD` seconds so that
+        caller falls back to polling when they do not arrive (e.g. health
+        checks are not run by podman). Return None on timeout or when events
+        can not be read.
+        """
+        log_msg_start = f"{self.dsp_name} [{cont_id}]"
+        remaining = (timeout_time - datetime.now()).total_seconds()
+        remaining = min(remaining, EVENTS_GRACE_PERIOD)
+        try:
+            return await self.event_watcher.wait(cont_id, statuses, max(remaining, 0))
+        except asyncio.TimeoutError:
+            logger.debug(f"{log_msg_start} No event from {statuses} in time, polling")
+        except ProvisioningError as events_err:
+            logger.debug(f"{log_msg_start} Falling back to polling: {events_err}")
+        return None
+
+    async def _wait_for_ssh(self, host, timeout, port, semaphore=None):
         log_msg_start = f"{self.dsp_name} [{host}]"
         start_ssh = datetime.now()
+        if self.event_watcher and not self._user_health_check():
+            timeout_time = start_ssh + timedelta(minutes=timeout)
+            if await self._wait_for_events(
+                host._host_id, (EVENT_HEALTHY,), timeout_time
+            ):
+                logger.info(f"{log_msg_start} sshd reported healthy")
+                return True, host
+            # check the state once more if events were not received
+
         while True:
-            res = await self.podman.exec_command(
-                host._host_id, "systemctl -q is-active sshd"
-            )
+            res = await self.podman.exec_command(host._host_id, SSHD_CHECK)
             logger.info(f"{log_msg_start} ran is-active for ssh, result '{res}'")
             if not res:
                 await asyncio.sleep(10)
@@ -15,18 +15,21 @@
 """General Provider interface."""
 import asyncio
 import logging
+import os
 import random
-import socket
 from datetime import datetime, timedelta
 
 from mrack.context import global_context
 from mrack.errors import ProvisioningError
 from mrack.host import STATUS_ACTIVE, STATUS_OTHER, Host
+from mrack.providers.utils.admission import AdmissionLock
 from mrack.utils import (
+    backoff_delays,
     get_ssh_options,
     get_username_pass_and_ssh_key,
+    is_port_open,
     object2json,
-    ssh_to_host,
+    ssh_to_host_async,
 )
 
 logger = logging.getLogger(__name__)
@@ -34,9 +37,14 @@ logger = logging.getLogger(__name__)
 STRATEGY_ABORT = "abort"
 STRATEGY_RETRY = "retry"
 RET_CODE = 0  # index to access return code from _wait_for_ssh
-HOST_OBJ = 1  # index to access host object from _wait_for_ssh
 ERROR_OBJ = 0  # default index to access host error which caused ProvisioningError
 SPECS = 1  # default index to access host specs which caused ProvisioningError
+NO_RESOURCES_ERROR = "Not enough resources to provision"
+SSH_CHECK_CONCURRENCY = 20  # default max number of parallel ssh check attempts
+SSH_PORT_PROBE_TIMEOUT = 10  # seconds, timeout of a single port probe
+SSH_HANDSHAKE_TIMEOUT = 60  # seconds, timeout of a single ssh connection attempt
+RESOURCE_RECHECK_FIRST = 15  # seconds, first re-check of missing resources
+RESOURCE_USAGE_POLL = 15  # seconds, interval of polling resource usage changes
 
 
 class Provider:
@@ -49,6 +57,7 @@ class Provider:
         self.timeout = 60
         self.max_retry = 1
         self.strategy = STRATEGY_ABORT
+        self.partial_provisioning = False
         self.status_map = {"OTHER": STATUS_OTHER}
 
     @property
@@ -68,10 +77,33 @@ class Provider:
         """Check percentage utilization of given provider."""
         raise NotImplementedError()
 
+    async def fitting_requirements(self, reqs):
+        """Get subset of requirements which can be provisioned right now.
+
+        Used in partial provisioning mode. Providers which can not tell which
+        hosts fit to available resources return all or no requirements.
+        """
+        return reqs if await self.can_provision(reqs) else []
+
+    async def resource_usage(self):
+        """Get cheaply obtainable snapshot of provider resource usage.
+
+        It is polled while waiting for resources so that they are checked
+        again as soon as the usage changes. Return None if not supported.
+        """
+        return None
+
     async def create_server(self, req):
         """Request and create resource on selected provider."""
         raise NotImplementedError()
 
+    def expect_servers(self, reqs):
+        """Announce requirements of servers which are going to be created together.
+
+        Providers which can create the servers in one request collect them
+        here, others ignore it.
+        """
+
     async def wait_till_provisioned(self, resource):
         """Wait till resource is provisioned."""
         raise NotImplementedError()
@@ -80,18 +112,24 @@ class Provider:
         """Prepare provisioning."""
         raise NotImplementedError()
 
-    async def _wait_for_ssh(self, host, timeout, port):
+    async def _wait_for_ssh(self, host, timeout, port, semaphore=None):
         """
         Wait until a port starts accepting TCP connections and is able to connect.
 
+        Port probes and SSH handshakes run natively on the event loop so that
+        many hosts are checked in parallel. Every single attempt is guarded by
+        `semaphore` (if provided) to cap the number of concurrent checks.
+
         Args:
             host (Host): Host object to get its address on which the port should exist.
             timeout (float): In minutes. How long to wait before raising errors.
             port (int): Port number.
+            semaphore (asyncio.Semaphore): Limits number of concurrent attempts.
         Raises:
             TimeoutError: The port isn't accepting connection after specified `timeout`.
         """
         log_msg_start = f"{self.dsp_name} [{host.name}]"
+        semaphore = semaphore or asyncio.Semaphore(SSH_CHECK_CONCURRENCY)
         start_time = datetime.now()
         info_msg = (
             f"{log_msg_start} Waiting for the port {port} on host "
@@ -100,25 +138,27 @@ class Provider:
         logger.info(info_msg)
 
         while True:
-            try:
-                with socket.create_connection(
-                    (host.ip_addr, port), timeout=(timeout * 60)
-                ):
-                    logger.info(
-                        f"{log_msg_start} Port {port} on host "
-                        f" {host.ip_addr} is now open"
-                    )
-                    break
-            except OSError:
-                await asyncio.sleep(10)
-                logger.debug(info_msg)
-                if datetime.now() - start_time >= timedelta(seconds=(timeout * 60)):
-                    logger.error(
-                        f"{log_msg_start} Waited too long for the port "
-                        f"{port} on host {host.ip_addr} to start accepting connections"
-                    )
-                    # do not continue to try ssh connection after port is not open
-                    return False, host
+            async with semaphore:
+                port_open = await is_port_open(
+                    host.ip_addr, port, timeout=SSH_PORT_PROBE_TIMEOUT
+                )
+            if port_open:
+                logger.info(
+                    f"{log_msg_start} Port {port} on host "
+                    f" {host.ip_addr} is now open"
+                )
+                break
+
+            if datetime.now() - start_time >= timedelta(seconds=(timeout * 60)):
+                logger.error(
+                    f"{log_msg_start} Waited too long for the port "
+                    f"{port} on host {host.ip_addr} to start accepting connections"
+                )
+                # do not continue to try ssh connection after port is not open
+                return False, host
+
+            await asyncio.sleep(10)
+            logger.debug(info_msg)
 
         # Wait also for the ssh key to be accepted for a half timeout time
         start_ssh = datetime.now()
@@ -126,6 +166,9 @@ class Provider:
         username, password, ssh_key = get_username_pass_and_ssh_key(
             host, global_context
         )
+        ssh_options = get_ssh_options(
+            host, global_context.METADATA, global_context.PROV_CONFIG
+        )
 
         info_msg = (
             f"{log_msg_start} Waiting for the host {host.ip_addr} "
@@ -133,17 +176,16 @@ class Provider:
         )
 
         while True:
-            ssh_options = get_ssh_options(
-                host, global_context.METADATA, global_context.PROV_CONFIG
-            )
-            res = ssh_to_host(
-                host,
-                username=username,
-                password=password,
-                ssh_key=ssh_key,
-                command="echo mrack",
-                ssh_options=ssh_options,
-            )
+            async with semaphore:
+                res = await ssh_to_host_async(
+                    host,
+                    username=username,
+                    password=password,
+                    ssh_key=ssh_key,
+                    command="echo mrack",
+                    ssh_options=ssh_options,
+                    timeout=SSH_HANDSHAKE_TIMEOUT,
+                )
             duration = (datetime.now() - start_ssh).total_seconds()
 
             if res:
@@ -161,15 +203,17 @@ class Provider:
                 break
 
             # wait 10 seconds to retry the ssh connection
+            logger.debug(info_msg)
             await asyncio.sleep(10)
 
         return res, host
 
-    async def _check_ssh_auth(self, default_check, active_hosts):
-        """Check the ssh authentication functionality."""
-        success_hosts = []
-        error_hosts = []
+    def _ssh_check_config(self, default_check):
+        """Complete ssh check configuration, split it to default and based part.
 
+        Return tuple of default check options, os/group based check options
+        and semaphore limiting number of concurrent checks.
+        """
         if not isinstance(default_check, dict):
             default_check = {}
 
@@ -187,64 +231,213 @@ class Provider:
                 "timeout": 10,
             } | default_check
 
+        # limit the number of port probes and ssh handshakes running at once
+        semaphore = asyncio.Semaphore(
+            default_check.get("concurrency", SSH_CHECK_CONCURRENCY)
+        )
+
         # split dictionary into two default and based on host os/group
-        req_keys += ("enabled_providers", "disabled_providers")
+        req_keys += ("enabled_providers", "disabled_providers", "concurrency")
         based_check = {x: default_check[x] for x in default_check if x not in req_keys}
         default_check = {x: default_check[x] for x in default_check if x in req_keys}
 
-        wait_ssh = []
-        for host in active_hosts:
-            # go host by host and load the group and os based configuration for ssh
-            os_check = based_check.get("os", {}).get(host.operating_system, {})
-            group_check = based_check.get("group", {}).get(host.group, {})
-            opts = default_check | group_check | os_check  # sorted by priority
+        return default_check, based_check, semaphore
 
-            logger.debug(
-                f"{self.dsp_name} [{host.name}] "
-                f"ssh check config: {object2json(opts)}"
-            )
+    async def _check_host_ssh(self, host, check_config):
+        """Check the ssh authentication to one host.
 
-            if (
-                not opts.get("enabled")
-                and self.name not in opts.get("enabled_providers", [])
-            ) or (
-                opts.get("enabled") and self.name in opts.get("disabled_providers", [])
-            ):
-                success_hosts.append(host)
-                logger.debug(
-                    f"{self.dsp_name} Skipping ssh check for host '{host.name}'"
-                )
-                continue
+        Return True if the check passed or is disabled for the host.
+        """
+        default_check, based_check, semaphore = check_config
+        # load the group and os based configuration for ssh of the host
+        os_check = based_check.get("os", {}).get(host.operating_system, {})
+        group_check = based_check.get("group", {}).get(host.group, {})
+        opts = default_check | group_check | os_check  # sorted by priority
+
+        logger.debug(
+            f"{self.dsp_name} [{host.name}] ssh check config: {object2json(opts)}"
+        )
 
-            awaitable = self._wait_for_ssh(
-                host,
-                timeout=opts.get("timeout"),
-                port=opts.get("port"),
+        if (
+            not opts.get("enabled")
+            and self.name not in opts.get("enabled_providers", [])
+        ) or (opts.get("enabled") and self.name in opts.get("disabled_providers", [])):
+            logger.debug(f"{self.dsp_name} Skipping ssh check for host '{host.name}'")
+            return True
+
+        res = await self._wait_for_ssh(
+            host,
+            timeout=opts.get("timeout"),
+            port=opts.get("port"),
+            semaphore=semaphore,
+        )
+        # res[RET_CODE] - the result of operation returned from self._wait_for_ssh()
+        if not res[RET_CODE]:
+            host.error = (
+                "Could not establish ssh connection to host "
+                f"{host.host_id} with IP {host.ip_addr}"
             )
-            wait_ssh.append(awaitable)
-
-        ssh_results = await asyncio.gather(*wait_ssh)
-        # We distinguish the success hosts and new error hosts from active by using:
-        # res[RET_CODE] 0
-        #   - the result of operation returned from self._wait_for_ssh()
-        # res[HOST_OBJ] 1
-        #   - the host object returned from self._wait_for_ssh()
-        for res in ssh_results:
-            if res[RET_CODE]:
-                success_hosts.append(res[HOST_OBJ])
+        return bool(res[RET_CODE])
+
+    def _error_host_from_exception(self, prov_error, req=None, host_id=None):
+        """Create Host object of host which failed with ProvisioningError.
+
+        `req` and `host_id` are used when the error does not carry them,
+        e.g. when the server was already created.
+        """
+        # use ProvisioningError arguments to create missing Host object
+        specs = prov_error.args[SPECS] if len(prov_error.args) > SPECS else None
+        if not isinstance(specs, dict):
+            specs = req or {}
+        return Host(
+            provider=self,
+            host_id=specs.get("host_id") or host_id,
+            name=specs.get("name"),
+            operating_system=specs.get("os"),
+            group=specs.get("group"),
+            ip_addrs=[],
+            status=STATUS_OTHER,
+            rawdata=prov_error.args,
+            error_obj=prov_error.args[ERROR_OBJ],
+        )
+
+    def _no_resources_host(self, req):
+        """Create error host of requirement which did not get resources."""
+        return Host(
+            provider=self,
+            host_id=req.get("name"),
+            name=req.get("name"),
+            operating_system=req.get("os"),
+            group=req.get("group"),
+            ip_addrs=[],
+            status=STATUS_OTHER,
+            rawdata=req,
+            error_obj=NO_RESOURCES_ERROR,
+        )
+
+    def _admission_lock_path(self):
+        """Get path of lock file admitting concurrent runs to the provider."""
+        return os.path.join(global_context.CONFIG.lock_dir, f"{self.name}.lock")
+
+    async def _wait_for_resources(self, reqs, timeout, admission, deadline=None):
+        """Wait till provider has resources for requirements.
+
+        Resources are checked only while holding `admission` lock, which stays
+        held when resources are available. Return list of requirements which
+        can be provisioned: all of them, or in partial provisioning mode
+        those which fit now. Return empty list if there are no resources
+        within `timeout` minutes (or till `deadline`).
+
+        Resources are checked again after exponentially growing delays with
+        jitter, or sooner when provider reports change of resource usage.
+        """
+        log_msg_start = self.dsp_name
+        if not deadline:
+            deadline = datetime.now() + timedelta(minutes=timeout)
+        # first re-check comes soon, then up to the former fixed sleep time
+        delays = backoff_delays(
+            RESOURCE_RECHECK_FIRST, max(timeout * 10, RESOURCE_RECHECK_FIRST)
+        )
+        while True:
+            await admission.acquire()
+            if self.partial_provisioning:
+                admitted = await self.fitting_requirements(reqs)
             else:
-                res[HOST_OBJ].error = (
-                    "Could not establish ssh connection to host "
-                    f"{res[HOST_OBJ].host_id} with IP {res[HOST_OBJ].ip_addr}"
-                )
-                error_hosts.append(res[HOST_OBJ])
+                admitted = reqs if await self.can_provision(reqs) else []
+            if admitted:
+                return admitted
 
-        return success_hosts, error_hosts
+            # let other runs check the resources while this one waits
+            admission.release()
+            remaining = (deadline - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return []
+
+            delay = min(next(delays), remaining)
+            logger.info(
+                f"{log_msg_start} Not enough resources to provision, "
+                f"checking again in {delay:.0f} second(s) or on usage change"
+            )
+            await self._wait_for_usage_change(delay)
+
+    async def _wait_for_usage_change(self, delay):
+        """Wait `delay` seconds or till provider resource usage changes.
+
+        Errors from the provider while polling are only logged, resources
+        are checked again after the wait anyway.
+        """
+        try:
+            usage = await self.resource_usage()
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning(f"{self.dsp_name} Failed to get resource usage: {exc}")
+            usage = None
+        if usage is None:
+            await asyncio.sleep(delay)
+            return
+
+        wake_up = datetime.now() + timedelta(seconds=delay)
+        while True:
+            remaining = (wake_up - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(RESOURCE_USAGE_POLL, remaining))
+            try:
+                changed = await self.resource_usage() != usage
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning(f"{self.dsp_name} Failed to get resource usage: {exc}")
+                return
+            if changed:
+                logger.info(f"{self.dsp_name} Resource usage changed")
+                return
+
+    async def _provision_host(self, req, ssh_check_config, issued=None):
+        """Create server, wait for it and check ssh connection to it.
+
+        Every host goes through the steps on its own so fast hosts do not
+        wait for slower ones. `ssh_check_config` is None when ssh check is
+        disabled. `issued` future is resolved once creation of the server
+        was requested (or failed).
+
+        Return tuple of successfully provisioned host and error host, one of
+        them is None (both when provider returned no result for the host).
+        """
+        try:
+            response = await self.create_server(req)
+        except ProvisioningError as prov_error:
+            return None, self._error_host_from_exception(prov_error)
+        except Exception:
+            logger.error("An unexpected exception occurred while provisioning")
+            raise
+        finally:
+            if issued and not issued.done():
+                issued.set_result(None)
+
+        # response might be okay so let us wait for result
+        try:
+            srv, req = await self.wait_till_provisioned(response)
+        except ProvisioningError as prov_error:
+            # the server exists so error host gets its id to be deleted
+            server = response[0]
+            server_id = server.get("id") if isinstance(server, dict) else server
+            return None, self._error_host_from_exception(prov_error, req, server_id)
+        if not srv:
+            return None, None
+
+        host = self.to_host(srv, req)
+        if await self.parse_error_hosts([host]):
+            return None, host
+
+        # check ssh connectivity to host if not disabled per host or provider
+        if ssh_check_config and not await self._check_host_ssh(host, ssh_check_config):
+            return None, host
+
+        return host, None
 
     async def _provision_base(
         self,
         reqs,
         timeout=None,
+        retry=False,
     ):  # pylint: disable=too-many-locals, too-many-branches, too-many-statements
         """Provision hosts based on list of host requirements.
 
@@ -252,6 +445,7 @@ class Provider:
         Parameters:
             reqs - dictionary with requirements for provider
             timeout - base timeout (minutes) to wait for resources
+            retry - retry every failed host on its own (see `_retry_host`)
         """
         if not timeout:
             timeout = self.timeout
@@ -266,124 +460,98 @@ class Provider:
         await self.validate_hosts(reqs)
         logger.info(f"{log_msg_start} Host(s) definitions valid")
 
-        delta = abs(self.timeout - timeout)
-        slow_down = random.choice(range(delta, self.timeout + delta))
-
-        logger.debug(
-            f"{log_msg_start} Slowing down the execution for {slow_down} s "
-            "(This will help mrack to get better resource overview for concurrent runs)"
-        )
-
-        await asyncio.sleep(slow_down)
-        # This slows down the provisioning at the beginning using a variable time
-        # to sleep so we prevent mrack executions to provision at the same time.
         logger.info(
             f"{log_msg_start} Setting timeout to wait "
             f"for resources to {timeout} min(s)"
         )
 
+        ssh_check = global_context.PROV_CONFIG.get("post_provisioning_check", {}).get(
+            "ssh", True
+        )  # enable check by default
+        ssh_check_config = self._ssh_check_config(ssh_check) if ssh_check else None
+
         logger.info(f"{log_msg_start} Checking available resources")
-        res_check_start = datetime.now()
         error_hosts = []
+        tasks = []
+        pending = list(reqs)
+        deadline = datetime.now() + timedelta(minutes=timeout)
+        admission = AdmissionLock(self._admission_lock_path())
+        loop = asyncio.get_running_loop()
+        retry = retry and self.max_retry > 0
+        provision = self._provision_and_retry if retry else self._provision_host
+        started = None
+        try:
+            # in partial provisioning mode hosts are admitted in batches
+            # as resources free up, otherwise all at once
+            while pending:
+                admitted = await self._wait_for_resources(
+                    pending, timeout, admission, deadline
+                )
+                if not admitted:
+                    break
+
+                if not tasks:
+                    logger.info(f"{log_msg_start} Resource availability: OK")
+                    started = datetime.now()
+
+                logger.info(
+                    f"{log_msg_start} Issuing provisioning of {len(admitted)} host(s)"
+                )
+                self.expect_servers(admitted)
+                # every host is created, waited for and checked independently
+                issued = [loop.create_future() for _req in admitted]
+                tasks += [
+                    asyncio.create_task(provision(req, ssh_check_config, done))
+                    for req, done in zip(admitted, issued)
+                ]
+                await asyncio.gather(*issued)
+                # other runs can check resources once the servers are requested
+                admission.release()
+
+                admitted_ids = {id(req) for req in admitted}
+                pending = [req for req in pending if id(req) not in admitted_ids]
+                if pending:
+                    logger.info(
+                        f"{log_msg_start} {len(pending)} host(s) wait for resources"
+                    )
+                else:
+                    logger.info(f"{log_msg_start} Provisioning issued")
 
-        while not await self.can_provision(reqs):
-            if datetime.now() - res_check_start >= timedelta(minutes=timeout):
+            if pending:
                 # create error host object so retry strategy can continue
                 # instead of throwing exception to fail at once without retry
-                err_str = "Not enough resources to provision"
-                logger.error(f"{log_msg_start} {err_str}")
-                for req in reqs:
-                    error_hosts.append(
-                        Host(
-                            provider=self,
-                            host_id=req.get("name"),
-                            name=req.get("name"),
-                            operating_system=req.get("os"),
-                            group=req.get("group"),
-                            ip_addrs=[],
-                            status=STATUS_OTHER,
-                            rawdata=req,
-                            error_obj=err_str,
+                logger.error(f"{log_msg_start} {NO_RESOURCES_ERROR}")
+                for req in pending:
+                    error_host = self._no_resources_host(req)
+                    if retry:
+                        tasks.append(
+                            asyncio.create_task(
+                                self._retry_host(req, error_host, ssh_check_config)
+                            )
                         )
-                    )
-                return ([], error_hosts, reqs)
-
-            logger.info(
-                f"{log_msg_start} Not enough resources to provision, "
-                f"checking again in {timeout * 10} seconds(s)"
-            )
-            # Sleep time to wait to check if resources are available again.
-            await asyncio.sleep(timeout * 10)
-
-        logger.info(f"{log_msg_start} Resource availability: OK")
-        started = datetime.now()
-
-        logger.info(f"{log_msg_start} Issuing provisioning of {len(reqs)} host(s)")
-        create_servers = []
-        for req in reqs:
-            awaitable = self.create_server(req)
-            create_servers.append(awaitable)
-
-        # expect the exception in return data to be parsed later
-        create_resps = await asyncio.gather(*create_servers, return_exceptions=True)
-
-        logger.info(f"{log_msg_start} Provisioning issued")
-
-        logger.info(f"{log_msg_start} Waiting for all hosts to be active")
-
-        wait_servers = []
-        for response in create_resps:
-            if isinstance(response, ProvisioningError):
-                # use ProvisioningError arguments to create missing Host object
-                # which we append to error hosts list for later usage
-                error_hosts.append(
-                    Host(
-                        provider=self,
-                        host_id=response.args[SPECS].get("host_id"),
-                        name=response.args[SPECS].get("name"),
-                        operating_system=response.args[SPECS].get("os"),
-                        group=response.args[SPECS].get("group"),
-                        ip_addrs=[],
-                        status=STATUS_OTHER,
-                        rawdata=response.args,
-                        error_obj=response.args[ERROR_OBJ],
-                    )
-                )
-            elif isinstance(response, Exception):
-                logger.error("An unexpected exception occurred while provisioning")
-                raise response
-            else:
-                # response might be okay so let us wait for result
-                awaitable = self.wait_till_provisioned(response)
-                wait_servers.append(awaitable)
+                    else:
+                        error_hosts.append(error_host)
+                if not tasks:
+                    return ([], error_hosts, reqs)
+
+            results = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            admission.release()
 
-        server_results = await asyncio.gather(*wait_servers)
         provisioned = datetime.now()
-
+        started = started or provisioned
         logger.info(
             f"{log_msg_start} "
             "All hosts reached provisioning final state (ACTIVE or ERROR)"
         )
         logger.info(f"{log_msg_start} Provisioning duration: {provisioned - started}")
 
-        hosts = [self.to_host(srv, req) for srv, req in server_results if srv]
-
-        error_hosts += await self.parse_error_hosts(hosts)
-        active_hosts = [h for h in hosts if h not in error_hosts]
-        success_hosts = []
-
-        ssh_check = global_context.PROV_CONFIG.get("post_provisioning_check", {}).get(
-            "ssh", True
-        )  # enable check by default
-
-        # check ssh connectivity to hosts if not disabled per host or provider
-        if bool(ssh_check):
-            success_hosts, failed_hosts = await self._check_ssh_auth(
-                ssh_check, active_hosts
-            )
-            error_hosts += failed_hosts
-        else:  # we do not check the ssh connection to VMs
-            success_hosts = active_hosts
+        success_hosts = [success for success, _error in results if success]
+        error_hosts += [error for _success, error in results if error]
 
         return (success_hosts, error_hosts, self._get_missing_reqs(reqs, error_hosts))
 
@@ -428,103 +596,121 @@ class Provider:
         """Get max utilization value from context."""
         return global_context.CONFIG.max_utilization
 
-    async def strategy_retry(self, reqs):
-        """Provisioning strategy to try multiple times to provision a host."""
-        log_msg_start = self.dsp_name
-        missing_reqs = reqs
-        attempts = 0
-        success_hosts = []
-        error_hosts = []
+    def _res_check_timeout(self):
+        """Get randomized timeout (minutes) to wait for resources."""
+        # set the waiting timeout to vary from 45-75 minutes randomly
+        # so if there are multiple parallel runs of mrack they wait
+        # different amount time before poll and increase chance to get resources
+        # quicker than other concurrent runs of mrack requests
         delta_sleep = global_context.CONFIG.delta_sleep
-        max_utilization = self._get_max_utilization()
-
-        while missing_reqs:
-            # number of attempts should be greater than max_retry
-            # and not greater or equal than max_retry because
-            # other way first attempt to provision will be
-            # considered as first retry and provisioning will end
-            # after reaching count 1 without reprovisioning retry
-            if attempts > self.max_retry:
-                logger.error(
-                    f"{log_msg_start} Max retry attempts "
-                    f"({self.max_retry}) reached. Aborting"
-                )
-                break
+        delta = random.choice(range(-delta_sleep, delta_sleep))
+        return self.timeout + delta
 
-            attempts += 1
+    async def _provision_and_retry(self, req, ssh_check_config, issued=None):
+        """Provision host, retry it on its own when it fails (see `_retry_host`).
 
-            # set the waiting timeout to vary from 45-75 minutes randomly
-            # so if there are multiple parallel runs of mrack they wait
-            # different amount time before poll and increase chance to get resources
-            # quicker than other concurrent runs of mrack requests
-            delta = random.choice(range(-delta_sleep, delta_sleep))
-            res_check_timeout = self.timeout + delta
+        Return tuple of successfully provisioned host and error host as
+        `_provision_host` does.
+        """
+        success, error = await self._provision_host(req, ssh_check_config, issued)
+        if error is None:
+            return success, error
+        return await self._retry_host(req, error, ssh_check_config)
+
+    async def _reprovision_host(self, req, ssh_check_config):
+        """Provision host again once provider has resources for it."""
+        admission = AdmissionLock(self._admission_lock_path())
+        try:
+            if not await self._wait_for_resources(
+                [req], self._res_check_timeout(), admission
+            ):
+                logger.error(f"{self.dsp_name} [{req['name']}] {NO_RESOURCES_ERROR}")
+                return None, self._no_resources_host(req)
 
-            s_hosts, error_hosts, missing_reqs = await self._provision_base(
-                missing_reqs, timeout=res_check_timeout
+            self.expect_servers([req])
+            issued = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(
+                self._provision_host(req, ssh_check_config, issued)
             )
+            try:
+                await asyncio.wait([issued, task], return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+        finally:
+            # other runs can check resources once the server is requested
+            admission.release()
+
+        return await task
+
+    async def _retry_host(self, req, error_host, ssh_check_config):
+        """Provision failed host again till it succeeds or attempts run out.
+
+        The failed host is deleted and goes through create, wait and ssh check
+        again as soon as its own cooldown expires, independently on other
+        hosts. The cooldown grows exponentially with every attempt and doubles
+        when provider returned server error or is highly utilized.
+
+        Return tuple of successfully provisioned host and error host, one of
+        them is None.
+        """
+        log_msg_start = f"{self.dsp_name} [{req['name']}]"
+        max_utilization = self._get_max_utilization()
+        res_check_timeout = self._res_check_timeout()
+        # the first cooldown varies from res_check_timeout to its double
+        delays = backoff_delays(2 * res_check_timeout, 8 * res_check_timeout)
 
-            success_hosts.extend(s_hosts)
-
-            if s_hosts:
-                logger.info(f"{log_msg_start} {len(s_hosts)} host(s) provisioned.")
-                succ = f"{len(success_hosts)}/{len(reqs)} host(s) provisioned properly."
-                logger.info(f"{log_msg_start} Provisioning progress: {succ}")
-
-            # We need to cleanup the error hosts for the next retry run
-            # in case of last attempt which is `self.max_retry`
-            # we skip this part at it done in provision_hosts() method while
-            # awaiting the self.abort_and_delete(error hosts)
-
-            if error_hosts and attempts <= self.max_retry:
-                count = len(error_hosts)
-                err = f"{count} host(s) NOT provisioned properly, deleting."
-                logger.info(f"{log_msg_start} {err}")
-                server_error = False
-                for host in error_hosts:
-                    logger.error(f"{log_msg_start} Error: {str(host.error)}")
-                    # if host.error is a dictionary and code is 500 = SERVER ERROR
-                    if (
-                        isinstance(host.error, dict)
-                        and host.error.get("code", None) == 500
-                        and not server_error  # add condition here to not repeat message
-                    ):
-                        logger.info(
-                            f"{log_msg_start} Provider returned server error (500), "
-                            "increasing cooldown time before another retry"
-                        )
-                        server_error = True
+        for attempt in range(1, self.max_retry + 1):
+            logger.error(f"{log_msg_start} Error: {str(error_host.error)}")
+            await self.delete_hosts([error_host])
 
-                error_hosts_share = (
-                    len(error_hosts) / len(success_hosts + error_hosts) * 100
+            cooldown = next(delays)
+            # if host.error is a dictionary and code is 500 = SERVER ERROR
+            if (
+                isinstance(error_host.error, dict)
+                and error_host.error.get("code", None) == 500
+            ):
+                logger.info(
+                    f"{log_msg_start} Provider returned server error (500), "
+                    "increasing cooldown time before another retry"
+                )
+                cooldown *= 2
+            elif await self.utilization() >= max_utilization:
+                logger.info(
+                    f"{log_msg_start} Provider is highly utilized, "
+                    "increasing cooldown time before another retry"
                 )
-                high_utilization = await self.utilization() >= max_utilization
+                cooldown *= 2
+
+            logger.info(
+                f"{log_msg_start} Retrying to provision the host in {cooldown:.0f}s "
+                f"(attempt {attempt}/{self.max_retry})"
+            )
+            await asyncio.sleep(cooldown)
 
-                if high_utilization or (error_hosts_share > max_utilization):
-                    # delete all hosts when there is high utilization of provider
-                    # or error hosts share is exceeding the same utilization threshold
-                    error_hosts += success_hosts
-                    missing_reqs = self._get_missing_reqs(reqs, error_hosts)
-                    success_hosts = []
+            success, error = await self._reprovision_host(req, ssh_check_config)
+            if error is None:
+                return success, None
+            error_host = error
 
-                await self.delete_hosts(error_hosts)
+        logger.error(
+            f"{log_msg_start} Max retry attempts ({self.max_retry}) reached. Aborting"
+        )
+        return None, error_host
 
-                # increase the sleep time to extend the cooldown period
-                # when internal error happens
-                res_check_timeout += res_check_timeout * int(server_error)
+    async def strategy_retry(self, reqs):
+        """Provisioning strategy to try multiple times to provision a host.
 
-                cooldown = random.choice(
-                    range(res_check_timeout, 2 * res_check_timeout)
-                )
+        Every host which failed is retried on its own right after it failed
+        (see `_retry_host`) while the other hosts are kept.
+        """
+        log_msg_start = self.dsp_name
+        success_hosts, error_hosts, missing_reqs = await self._provision_base(
+            reqs, timeout=self._res_check_timeout(), retry=True
+        )
 
-                logger.info(
-                    f"{log_msg_start} Retrying to provision these hosts in {cooldown}s"
-                )
-                # In this case we haven't been able to provision all resources
-                # despite the previous waits, so we probably are in a race condition
-                # with concurrent runs, and thus we free all resources and try again
-                # in `cooldown` seconds to give chance other mrack requests.
-                await asyncio.sleep(cooldown)
+        succ = f"{len(success_hosts)}/{len(reqs)} host(s) provisioned properly."
+        logger.info(f"{log_msg_start} Provisioning progress: {succ}")
 
         return success_hosts, error_hosts, missing_reqs
 
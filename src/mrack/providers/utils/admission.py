@@ -0,0 +1,105 @@
+# Copyright 2026 Red Hat Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Admission of concurrent mrack runs to provider."""
+
+import asyncio
+import fcntl
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_POLL_INTERVAL = 1  # seconds
+ADMISSION_MAX_WAIT = 600  # seconds, lease after which waiting run goes ahead
+
+
+class AdmissionLock:
+    """Inter-process lock admitting one mrack run at a time to a provider.
+
+    The lock is held by a run while it checks resources and issues creation
+    of servers so concurrent runs on the same machine see resources used by
+    each other. Runs without contention are admitted at once.
+
+    The lock is an advisory lock of file at `path`, it is released by the
+    system when the holding process ends. A run waiting longer than
+    `max_wait` seconds for a stuck holder is admitted anyway.
+    """
+
+    def __init__(
+        self,
+        path,
+        poll_interval=ADMISSION_POLL_INTERVAL,
+        max_wait=ADMISSION_MAX_WAIT,
+    ):
+        """Init the lock, the lock file is opened when acquired."""
+        self.path = os.path.expanduser(path)
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self._file = None
+
+    @property
+    def locked(self):
+        """Return True if the lock is held by this instance."""
+        return self._file is not None
+
+    def _try_lock(self):
+        """Try to lock the file without blocking, return True on success."""
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    async def acquire(self):
+        """Wait till the lock is free and lock it.
+
+        Return False if the lock was not obtained within `max_wait` seconds.
+        """
+        if self.locked:
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a+", encoding="utf-8")
+        start = time.monotonic()
+        waiting = False
+        while not self._try_lock():
+            if not waiting:
+                logger.info(
+                    f"Waiting for other mrack run to issue provisioning ({self.path})"
+                )
+                waiting = True
+            if time.monotonic() - start >= self.max_wait:
+                logger.warning(
+                    f"Lock {self.path} not released in {self.max_wait}s, continuing"
+                )
+                self._file.close()
+                self._file = None
+                return False
+            await asyncio.sleep(self.poll_interval)
+
+        # store holder for debugging purposes
+        self._file.truncate(0)
+        self._file.write(f"{os.getpid()}\n")
+        self._file.flush()
+        return True
+
+    def release(self):
+        """Release the lock if it is held."""
+        if not self.locked:
+            return
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
@@ -0,0 +1,259 @@
+# Copyright 2026 Red Hat Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for building Beaker jobs, talking to Beaker hub and watching jobs."""
+
+import asyncio
+import io
+import json
+import logging
+import threading
+import xml.etree.ElementTree as eTree
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import lru_cache
+from xml.dom import minidom
+
+from mrack.utils import add_dict_to_element
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 45  # seconds
+DEFAULT_HUB_POOL_SIZE = 4
+HOST_REQUIRES_CACHE_SIZE = 256
+
+
+def translate_constraint(host_requires, element):
+    """Transform host requires dict to XML elements of given element."""
+    for operand, operand_value in host_requires.items():
+        if operand.startswith("_"):
+            element.set(operand[1:], str(operand_value))
+            continue
+        if operand not in ["and", "or"]:
+            add_dict_to_element(eTree.SubElement(element, operand), operand_value)
+            continue
+        # known operands are ["and", "or"]
+        req_element = eTree.SubElement(element, operand)
+        for dct in operand_value:
+            if dct.get("or") or dct.get("and"):
+                translate_constraint(dct, req_element)
+            else:
+                add_dict_to_element(req_element, dct)
+
+
+class XMLFragment(minidom.Text):
+    """DOM node holding already serialized XML elements.
+
+    It is written to the output as it is, without escaping.
+    """
+
+    def writexml(self, writer, indent="", addindent="", newl=""):
+        """Write the serialized elements."""
+        writer.write(f"{indent}{self.data}{newl}")
+
+
+@lru_cache(maxsize=HOST_REQUIRES_CACHE_SIZE)
+def _translated_host_requires(host_requires_json):
+    """Translate host requires once per distinct (JSON serialized) dict.
+
+    Return attributes of hostRequires element and its serialized content.
+    """
+    element = eTree.Element("hostRequires")
+    translate_constraint(json.loads(host_requires_json), element)
+    # serialize by minidom to keep the same format as rest of the job XML
+    node = minidom.parseString(eTree.tostring(element)).documentElement
+    content = "".join(child.toxml() for child in node.childNodes)
+    return tuple(node.attributes.items()), content
+
+
+def add_host_requires(host_requires, node):
+    """Add translated host requires dict to hostRequires DOM node.
+
+    Hosts of one topology usually share the same constraints so translation
+    is memoized and its serialized result is added to the node, instead of
+    building the same DOM tree for every host again.
+    """
+    attributes, content = _translated_host_requires(
+        json.dumps(host_requires, default=str)
+    )
+    for name, value in attributes:
+        node.setAttribute(name, value)
+    if content:
+        fragment = XMLFragment()
+        fragment.data = content
+        fragment.ownerDocument = node.ownerDocument
+        node.appendChild(fragment)
+    return node
+
+
+def parse_recipes(job_xml):
+    """Get list of recipe information from Beaker job XML.
+
+    Only recipe elements (with id of their recipe set) and logs inside them
+    are read, elements of finished recipes are dropped right away.
+    """
+    recipes = []
+    recipe = None
+    recipe_set_id = None
+    events = eTree.iterparse(io.BytesIO(job_xml), events=("start", "end"))
+    for event, elem in events:
+        if event == "start" and elem.tag == "recipeSet":
+            recipe_set_id = elem.get("id")
+        elif event == "start" and elem.tag == "recipe":
+            recipe = {
+                "system": elem.get("system"),
+                "status": elem.get("status"),
+                "result": elem.get("result"),
+                "rid": elem.get("id"),
+                "rsid": elem.get("recipe_set_id", recipe_set_id),
+                "id": elem.get("job_id"),
+                "logs": {},
+            }
+            recipes.append(recipe)
+        elif event == "start" and elem.tag == "log" and recipe is not None:
+            recipe["logs"][elem.get("name")] = elem.get("href")
+        elif event == "end" and elem.tag == "recipe":
+            recipe = None
+            elem.clear()
+
+    return recipes
+
+
+class BeakerHubPool:
+    """Pool of logged in Beaker hub proxies.
+
+    Hub XML-RPC calls (and Kerberos login) are blocking so they are run in
+    a thread pool executor. XML-RPC proxy is not thread safe so every worker
+    thread lazily creates and keeps its own proxy using `create_hub`.
+    """
+
+    def __init__(self, create_hub, size=DEFAULT_HUB_POOL_SIZE):
+        """Init the pool, no proxy is created till first call."""
+        self.create_hub = create_hub
+        self.executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="mrack-beaker-hub"
+        )
+        self.hub_url = None
+        self._local = threading.local()
+
+    def get_hub(self):
+        """Get hub proxy of current thread, to be run in pool executor."""
+        hub = getattr(self._local, "hub", None)
+        if hub is None:
+            hub = self.create_hub()
+            self._local.hub = hub
+            self.hub_url = hub._hub_url  # pylint: disable=protected-access
+        return hub
+
+    def call_blocking(self, method, *args):
+        """Call hub method given by dotted name, to be run in pool executor."""
+        func = self.get_hub()
+        for attr in method.split("."):
+            func = getattr(func, attr)
+        return func(*args)
+
+    async def login(self):
+        """Log in first hub proxy so that authentication errors show early."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.get_hub)
+
+    async def call(self, method, *args):
+        """Call hub method given by dotted name without blocking event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.call_blocking, method, *args
+        )
+
+
+class BeakerJobWatcher:
+    """Shared watcher of Beaker job recipe statuses.
+
+    Instead of one polling loop per host the watcher fetches recipes of all
+    watched jobs in one batch per tick. The batch runs in an executor so that
+    blocking XML-RPC calls do not block the event loop. Waiters are woken up
+    only when status of their recipe changes.
+
+    `fetch_recipes` is a blocking function returning list of recipes
+    (see `parse_recipes`) of a job.
+    """
+
+    def __init__(self, fetch_recipes, interval=DEFAULT_POLL_INTERVAL, executor=None):
+        """Init the instance."""
+        self.fetch_recipes = fetch_recipes
+        self.interval = interval
+        self.executor = executor
+        self._waiters = {}  # job id -> list of (recipe index, status, future)
+        self._task = None
+
+    async def wait(self, job_id, prev_status, timeout=None, index=0):
+        """Wait till status of job recipe is different than `prev_status`.
+
+        Return information about the recipe. Raises asyncio.TimeoutError if
+        the status doesn't change within `timeout` seconds.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append((index, prev_status, future))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # wait_for cancels the future on timeout
+            self._drop_done(job_id)
+
+    def _drop_done(self, job_id):
+        """Stop watching job recipes which nobody waits for anymore."""
+        job_waiters = [w for w in self._waiters.get(job_id, []) if not w[2].done()]
+        if job_waiters:
+            self._waiters[job_id] = job_waiters
+        else:
+            self._waiters.pop(job_id, None)
+
+    def _fetch_all(self, job_ids):
+        """Fetch recipes of all given jobs, to be run in executor."""
+        results = {}
+        for job_id in job_ids:
+            try:
+                results[job_id] = self.fetch_recipes(job_id)
+            except OSError as conn_err:  # including TimeoutError
+                logger.warning(f"Can not get status of Beaker job {job_id}: {conn_err}")
+            except Exception as fetch_err:  # pylint: disable=broad-except
+                results[job_id] = fetch_err
+        return results
+
+    async def _run(self):
+        """Poll recipes of watched jobs till somebody waits for them."""
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            job_ids = list(self._waiters)
+            results = await loop.run_in_executor(
+                self.executor, self._fetch_all, job_ids
+            )
+            logger.debug(f"Polled status of {len(job_ids)} Beaker job(s)")
+
+            for job_id, recipes in results.items():
+                for index, prev_status, future in self._waiters.get(job_id, []):
+                    if future.done():
+                        continue
+                    if isinstance(recipes, Exception):
+                        future.set_exception(recipes)
+                    elif index < len(recipes):
+                        if recipes[index]["status"] != prev_status:
+                            future.set_result(deepcopy(recipes[index]))
+                self._drop_done(job_id)
+
+            if self._waiters:
+                await asyncio.sleep(self.interval)
@@ -0,0 +1,136 @@
+# Copyright 2026 Red Hat Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent on-disk cache of provider objects."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+
+
+def cache_key(*parts):
+    """Create file name friendly key identifying cache from its parts."""
+    joined = "|".join(str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+
+class ObjectCache:
+    """Versioned JSON file cache with per object type time to live.
+
+    `ttls` is a dictionary where keys are object types (e.g. "flavors") and
+    values are numbers of seconds for which stored objects are considered
+    fresh. Object types without TTL (or with TTL 0) are never cached.
+    Objects are stored either as one list (`set`) or one by one with own
+    timestamps (`set_entries`) when only some of them are loaded at once.
+    """
+
+    def __init__(self, path, ttls):
+        """Init the cache and load its content from disk."""
+        self.path = os.path.expanduser(path)
+        self.ttls = ttls or {}
+        self._data = {}
+        self.load()
+
+    def load(self):
+        """Load cache content, ignore missing, broken or outdated cache file."""
+        self._data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as load_err:
+            logger.debug(f"Ignoring unreadable cache file {self.path}: {load_err}")
+            return
+
+        if data.get("version") != CACHE_VERSION:
+            logger.debug(f"Ignoring cache file {self.path} with different version")
+            return
+
+        self._data = data.get("objects", {})
+
+    def get(self, obj_type):
+        """Get cached objects of given type or None if missing or expired."""
+        ttl = self.ttls.get(obj_type)
+        entry = self._data.get(obj_type)
+        if not ttl or not entry:
+            return None
+
+        age = time.time() - entry["timestamp"]
+        if age > ttl:
+            logger.debug(f"Cached {obj_type} expired {age - ttl:.0f}s ago")
+            return None
+
+        logger.debug(f"Using cached {obj_type} from {self.path}")
+        return entry["data"]
+
+    def set(self, obj_type, objects):
+        """Store objects of given type, call `save` to persist them."""
+        if not self.ttls.get(obj_type):
+            return
+        self._data[obj_type] = {"timestamp": time.time(), "data": objects}
+
+    def get_entries(self, obj_type):
+        """Get fresh cached objects stored by `set_entries` as key -> object."""
+        ttl = self.ttls.get(obj_type)
+        entries = self._data.get(obj_type)
+        if not ttl or not entries:
+            return {}
+
+        now = time.time()
+        fresh = {
+            key: entry["data"]
+            for key, entry in entries["entries"].items()
+            if now - entry["timestamp"] <= ttl
+        }
+        logger.debug(f"Using {len(fresh)} cached {obj_type} from {self.path}")
+        return fresh
+
+    def set_entries(self, obj_type, objects):
+        """Store objects given as key -> object, each with its own timestamp.
+
+        Already stored objects keep their timestamps so they expire in time,
+        expired ones are dropped. Call `save` to persist them.
+        """
+        ttl = self.ttls.get(obj_type)
+        if not ttl:
+            return
+        now = time.time()
+        entries = self._data.setdefault(obj_type, {"entries": {}})["entries"]
+        for key in [k for k, e in entries.items() if now - e["timestamp"] > ttl]:
+            del entries[key]
+        for key, obj in objects.items():
+            entries[key] = {"timestamp": now, "data": obj}
+
+    def save(self):
+        """Atomically write cache content to disk."""
+        directory = os.path.dirname(self.path) or "."
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".mrack-cache-")
+            with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+                json.dump({"version": CACHE_VERSION, "objects": self._data}, cache_file)
+            os.replace(tmp_path, self.path)
+        except OSError as save_err:
+            logger.warning(f"Failed to save cache file {self.path}: {save_err}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
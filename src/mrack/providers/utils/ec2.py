@@ -0,0 +1,329 @@
+# Copyright 2026 Red Hat Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Async facade for blocking boto3 EC2 calls."""
+
+import asyncio
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import partial
+
+from botocore.exceptions import ClientError
+
+from mrack.errors import ProviderError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 16  # max number of boto3 calls running at the same time
+DEFAULT_CALL_TIMEOUT = 120  # seconds
+DEFAULT_POLL_INTERVAL = 15  # seconds
+DEFAULT_BATCH_DELAY = 0.5  # seconds to collect identical launch requests
+DESCRIBE_CHUNK_SIZE = 200  # max number of instance IDs in one describe request
+POLL_ERROR_RETRY = 5  # number of consecutive failed polls before giving up
+INSTANCE_ID_PATTERN = re.compile(r"\bi-[0-9a-f]+\b")
+# states in which waiting for instance to become running makes no more sense
+FINAL_STATES = ["running", "shutting-down", "terminated", "stopping", "stopped"]
+
+
+class AsyncEC2Client:
+    """Async wrapper running boto3 EC2 client calls in a bounded thread pool.
+
+    Only the low-level boto3 client is used as, unlike boto3 resources,
+    it is safe to be shared between threads.
+    """
+
+    def __init__(self, client, workers=None, call_timeout=None):
+        """Init the instance."""
+        self.client = client
+        self.workers = workers or DEFAULT_WORKERS
+        self.call_timeout = call_timeout or DEFAULT_CALL_TIMEOUT
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="mrack-ec2"
+        )
+
+    async def _call(self, func, *args, timeout=None, **kwargs):
+        """Run blocking `func` in the thread pool and wait for its result.
+
+        Raises ProviderError if the call does not finish within `timeout`
+        (or within default per-call timeout) seconds.
+        """
+        timeout = timeout or self.call_timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError as timeout_err:
+            name = getattr(func, "__name__", str(func))
+            raise ProviderError(
+                f"AWS call '{name}' did not finish within {timeout}s"
+            ) from timeout_err
+
+    async def run_instances(self, **request):
+        """Launch instances, return list of instance descriptions."""
+        response = await self._call(self.client.run_instances, **request)
+        return response["Instances"]
+
+    def _describe_instances(self, instance_ids):
+        """Get descriptions of given instances following all result pages."""
+        paginator = self.client.get_paginator("describe_instances")
+        instances = []
+        for start in range(0, len(instance_ids), DESCRIBE_CHUNK_SIZE):
+            chunk = instance_ids[start : start + DESCRIBE_CHUNK_SIZE]
+            for page in paginator.paginate(InstanceIds=chunk):
+                for reservation in page["Reservations"]:
+                    instances.extend(reservation["Instances"])
+        return instances
+
+    async def describe_instances(self, instance_ids):
+        """Get list of descriptions of given instances."""
+        return await self._call(self._describe_instances, instance_ids)
+
+    async def describe_subnet(self, subnet_id):
+        """Get description of a subnet."""
+        response = await self._call(self.client.describe_subnets, SubnetIds=[subnet_id])
+        return response["Subnets"][0]
+
+    async def create_tags(self, resource_ids, tags):
+        """Add the same tags to all given resources."""
+        return await self._call(
+            self.client.create_tags, Resources=resource_ids, Tags=tags
+        )
+
+    async def terminate_instances(self, instance_ids):
+        """Issue termination of given instances."""
+        return await self._call(
+            self.client.terminate_instances, InstanceIds=instance_ids
+        )
+
+
+class EC2InstancePoller:
+    """Shared waiter for instances to reach running (or other final) state.
+
+    Instead of running one waiter per instance the poller keeps a set of
+    pending instance IDs and asks for all of them in one (paginated)
+    describe_instances request per tick. Waiting coroutines are woken up
+    once their instance reaches one of FINAL_STATES.
+    """
+
+    def __init__(self, aec2, interval=DEFAULT_POLL_INTERVAL):
+        """Init the instance."""
+        self.aec2 = aec2
+        self.interval = interval
+        self._pending = {}  # instance id -> future
+        self._last_seen = {}  # instance id -> last instance description
+        self._not_found = {}  # instance id -> number of polls it was not found
+        self._task = None
+
+    def last_seen(self, instance_id):
+        """Get last known description of instance or None."""
+        return self._last_seen.get(instance_id)
+
+    async def wait(self, instance_id, timeout=None):
+        """Wait till instance reaches final state, return its description.
+
+        Raises asyncio.TimeoutError if it doesn't happen within `timeout` seconds.
+        """
+        future = self._pending.get(instance_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[instance_id] = future
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            if not future.done():
+                # nobody waits for the instance anymore, stop polling for it
+                future.cancel()
+                self._pending.pop(instance_id, None)
+
+    async def _describe_pending(self, instance_ids):
+        """Describe pending instances, skipping those AWS does not know (yet).
+
+        Freshly created instance might not be visible for a while, then the
+        whole describe request fails with InvalidInstanceID.NotFound error.
+        Such instances are left out of the tick and fail after they are not
+        found by POLL_ERROR_RETRY consecutive polls.
+        """
+        while instance_ids:
+            try:
+                instances = await self.aec2.describe_instances(instance_ids)
+            except ClientError as poll_err:
+                error = poll_err.response.get("Error", {})
+                missing = set(INSTANCE_ID_PATTERN.findall(error.get("Message", "")))
+                missing &= set(instance_ids)
+                if error.get("Code") != "InvalidInstanceID.NotFound" or not missing:
+                    raise
+                for instance_id in missing:
+                    self._mark_not_found(instance_id)
+                instance_ids = [iid for iid in instance_ids if iid not in missing]
+                continue
+
+            for instance_id in instance_ids:
+                self._not_found.pop(instance_id, None)
+            return instances
+        return []
+
+    def _mark_not_found(self, instance_id):
+        """Count instance not being found, fail its waiter if it lasts."""
+        count = self._not_found.get(instance_id, 0) + 1
+        self._not_found[instance_id] = count
+        logger.debug(f"Instance {instance_id} not found ({count}x)")
+        if count < POLL_ERROR_RETRY:
+            return
+
+        self._not_found.pop(instance_id)
+        future = self._pending.pop(instance_id, None)
+        if future and not future.done():
+            future.set_exception(ProviderError(f"Instance {instance_id} not found"))
+
+    async def _run(self):
+        """Poll states of all pending instances till there are some."""
+        error_attempts = 0
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            instance_ids = list(self._pending)
+            if not instance_ids:
+                break
+
+            try:
+                instances = await self._describe_pending(instance_ids)
+            except Exception as poll_err:  # pylint: disable=broad-except
+                logger.debug(f"Failed to poll instance states: {poll_err}")
+                error_attempts += 1
+                if error_attempts >= POLL_ERROR_RETRY:
+                    self._fail_pending(
+                        ProviderError(f"Failed to poll instance states: {poll_err}")
+                    )
+                    break
+                continue
+
+            error_attempts = 0
+            logger.debug(f"Polled states of {len(instance_ids)} instance(s)")
+            for instance in instances:
+                instance_id = instance["InstanceId"]
+                self._last_seen[instance_id] = instance
+                if instance["State"]["Name"] not in FINAL_STATES:
+                    continue
+
+                future = self._pending.pop(instance_id, None)
+                if future and not future.done():
+                    future.set_result(instance)
+
+    def _fail_pending(self, err):
+        """Wake up all waiting coroutines with an error."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(err)
+        self._pending = {}
+
+
+class EC2LaunchBatcher:
+    """Merge identical instance launch requests into one run_instances call.
+
+    Launch requests which are issued within `delay` seconds and differ only in
+    instance specific tags (e.g. Name) are launched by a single run_instances
+    call with MaxCount set to the number of requests. Instance specific tags
+    are added afterwards as EC2 applies the same tags to every instance
+    launched by one call.
+    """
+
+    def __init__(self, aec2, delay=DEFAULT_BATCH_DELAY):
+        """Init the instance."""
+        self.aec2 = aec2
+        self.delay = delay
+        self._batches = {}  # request key -> list of (instance tags, future)
+        self._tasks = set()  # running flushes, referenced till they finish
+
+    async def launch(self, request, instance_tags):
+        """Launch one instance, return its description.
+
+        `request` are run_instances parameters without MinCount and MaxCount,
+        `instance_tags` are tags specific for this instance.
+        """
+        key = json.dumps(request, sort_keys=True, default=str)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = []
+            self._batches[key] = batch
+            task = asyncio.create_task(self._flush(key, request))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        batch.append((instance_tags, future))
+        return await future
+
+    async def _flush(self, key, request):
+        """Launch all instances collected for the request.
+
+        Every future of the batch is resolved, whatever happens.
+        """
+        await asyncio.sleep(self.delay)
+        batch = self._batches.pop(key)
+        try:
+            await self._launch_batch(request, batch)
+        except Exception as launch_err:  # pylint: disable=broad-except
+            logger.debug(f"Failed to launch instance(s): {launch_err}")
+            for _tags, future in batch:
+                if not future.done():
+                    future.set_exception(launch_err)
+
+    async def _launch_batch(self, request, batch):
+        """Launch instances of the batch and resolve their futures."""
+        count = len(batch)
+        launch = deepcopy(request)
+        launch["MinCount"] = 1
+        launch["MaxCount"] = count
+        if count == 1:
+            # single instance can be tagged completely at launch time
+            tag_specs = launch.setdefault(
+                "TagSpecifications", [{"ResourceType": "instance", "Tags": []}]
+            )
+            tag_specs[0]["Tags"] = batch[0][0] + tag_specs[0]["Tags"]
+
+        logger.debug(f"Launching {count} instance(s) by one request")
+        instances = await self.aec2.run_instances(**launch)
+
+        if count > 1:
+            await asyncio.gather(
+                *[
+                    self._tag_instance(instance, tags)
+                    for (tags, _future), instance in zip(batch, instances)
+                ]
+            )
+
+        for (_tags, future), instance in zip(batch, instances):
+            future.set_result(instance)
+
+        for _tags, future in batch[len(instances) :]:
+            future.set_exception(
+                ProviderError(f"Only {len(instances)} of {count} instances launched")
+            )
+
+    async def _tag_instance(self, instance, tags):
+        """Add instance specific tags to a launched instance."""
+        try:
+            await self.aec2.create_tags([instance["InstanceId"]], tags)
+        except (ClientError, ProviderError) as tag_err:
+            logger.warning(
+                f"Failed to tag instance {instance['InstanceId']}: {tag_err}"
+            )
@@ -14,8 +14,33 @@
 
 """Additional client API wrappers for OpenStack."""
 
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
 from asyncopenstackclient import NovaClient
 from asyncopenstackclient.client import Client
+from simple_rest_client.exceptions import NotFoundError
+
+from mrack.errors import ServerNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# server states in which waiting for provisioning does not make sense anymore
+FINAL_SERVER_STATES = ["ACTIVE", "ERROR", "DELETED"]
+POLL_ERROR_RETRY = 5  # number of consecutive failed polls before giving up
+CHANGES_SINCE_MARGIN = timedelta(minutes=1)  # for clock skew and API delays
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def next_page_params(links):
+    """Get query parameters of the next page from OpenStack links list."""
+    for link in links or []:
+        if link.get("rel") == "next":
+            params = parse_qs(urlparse(link["href"]).query)
+            return {key: val[0] for key, val in params.items() if val}
+    return None
 
 
 class ExtraNovaClient(NovaClient):
@@ -80,3 +105,137 @@ class NeutronClient(Client):
         }
         self.api.network.add_action("list")
         self.api.ip.add_action("list")
+
+
+class NovaServerPoller:
+    """Shared waiter for servers to reach ACTIVE or ERROR state.
+
+    Instead of polling each server separately, all servers changed since the
+    poller was created are listed by one (paginated) detailed server list
+    request per tick. Waiting coroutines are woken up once their server
+    reaches one of FINAL_SERVER_STATES.
+
+    Pending servers missing in the listing are fetched one by one, which
+    also moves the listing start back to their creation time in case local
+    clock is ahead of Nova.
+    """
+
+    def __init__(self, nova, interval, initial_delay=0):
+        """Init the instance."""
+        self.nova = nova
+        self.interval = interval
+        self.initial_delay = initial_delay
+        # servers created after this time are included in the listing
+        self.since = datetime.now(timezone.utc) - CHANGES_SINCE_MARGIN
+        self._pending = {}  # server uuid -> future
+        self._last_seen = {}  # server uuid -> last server representation
+        self._task = None
+
+    def last_seen(self, uuid):
+        """Get last known representation of server or None."""
+        return self._last_seen.get(uuid)
+
+    async def wait(self, uuid, timeout=None):
+        """Wait till server reaches final state, return the server.
+
+        Raises asyncio.TimeoutError if it doesn't happen within `timeout` seconds.
+        """
+        future = self._pending.get(uuid)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[uuid] = future
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            if not future.done():
+                # nobody waits for the server anymore, stop polling for it
+                future.cancel()
+                self._pending.pop(uuid, None)
+
+    async def list_servers(self):
+        """List all servers changed since the poller was created."""
+        servers = []
+        base_params = {"changes-since": self.since.strftime(TIME_FORMAT)}
+        params = base_params
+        while params:
+            resp = await self.nova.servers.list(**params)
+            servers.extend(resp["servers"])
+            next_params = next_page_params(resp.get("servers_links"))
+            params = base_params | next_params if next_params else None
+        return servers
+
+    async def get_missing_server(self, uuid):
+        """Get pending server which was not found in the listing.
+
+        Fail the waiter with ServerNotFoundError if the server does not exist.
+        """
+        try:
+            resp = await self.nova.servers.get(uuid)
+        except NotFoundError as nf_err:
+            future = self._pending.pop(uuid, None)
+            if future and not future.done():
+                logger.debug(f"Server {uuid} not found: {nf_err}")
+                future.set_exception(ServerNotFoundError(uuid))
+            return None
+
+        server = resp["server"]
+        try:
+            created = datetime.strptime(server.get("created", ""), TIME_FORMAT)
+        except ValueError:
+            pass
+        else:
+            created = created.replace(tzinfo=timezone.utc) - CHANGES_SINCE_MARGIN
+            if created < self.since:
+                logger.debug(f"Server {uuid} created before listing start")
+                self.since = created
+        return server
+
+    async def _run(self):
+        """Poll states of all pending servers till there are some."""
+        # do not check the state immediately, it will take some time
+        await asyncio.sleep(self.initial_delay)
+        error_attempts = 0
+        while self._pending:
+            try:
+                servers = await self.list_servers()
+                listed = {server["id"] for server in servers}
+                missing = [uuid for uuid in self._pending if uuid not in listed]
+                fetched = await asyncio.gather(
+                    *[self.get_missing_server(uuid) for uuid in missing]
+                )
+                servers.extend(server for server in fetched if server)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.debug(f"Failed to poll server states: {err}")
+                error_attempts += 1
+                if error_attempts > POLL_ERROR_RETRY:
+                    self._fail_pending(err)
+                    break
+                await asyncio.sleep(self.interval)
+                continue
+
+            error_attempts = 0
+            logger.debug(f"Polled states of {len(self._pending)} server(s)")
+            for server in servers:
+                uuid = server["id"]
+                if uuid not in self._pending:
+                    continue
+                self._last_seen[uuid] = server
+                if server["status"] not in FINAL_SERVER_STATES:
+                    continue
+
+                future = self._pending.pop(uuid)
+                if not future.done():
+                    future.set_result(server)
+
+            await asyncio.sleep(self.interval)
+
+    def _fail_pending(self, err):
+        """Wake up all waiting coroutines with an error."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(err)
+        self._pending = {}
@@ -14,15 +14,49 @@
 
 """Module for working with podman."""
 
+import asyncio
 import json
 import logging
+import os
 import subprocess
+import time
 
 from mrack.errors import ProvisioningError
 from mrack.utils import exec_async_subprocess
 
 logger = logging.getLogger(__name__)
 
+BACKEND_CLI = "cli"
+BACKEND_API = "api"
+API_VERSION = "v4.0.0"
+API_CONNECTIONS = 20  # maximum of parallel requests to podman service
+READINESS_POLL = "poll"
+READINESS_EVENTS = "events"
+# podman events statuses
+EVENT_START = "start"
+EVENT_DIED = "died"
+EVENT_REMOVE = "remove"
+EVENT_HEALTHY = "healthy"
+
+
+def default_api_socket():
+    """Get path of podman service socket of current user."""
+    if os.getuid() == 0:
+        return "/run/podman/podman.sock"
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+    return os.path.join(runtime_dir, "podman", "podman.sock")
+
+
+def load_event(line):
+    """Load podman event from line of JSON, return None for empty or malformed."""
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        logger.debug(f"Skipping malformed podman event: {line!r}")
+        return None
+
 
 class Podman:
     """Async wrapper supporting most basic podman calls."""
@@ -166,6 +200,35 @@ class Podman:
         _stdout, _stderr, process = await self._run_podman(args, raise_on_err=False)
         return process.returncode == 0
 
+    async def events(self, filters=None, since=None):
+        """Stream podman events as loaded JSON objects.
+
+        `filters` is a dictionary mapping filter names (e.g. "container")
+        to lists of values, `since` is unix timestamp to replay events from.
+        """
+        args = ["events", "--format", "json"]
+        for name, values in (filters or {}).items():
+            for value in values:
+                args.extend(["--filter", f"{name}={value}"])
+        if since:
+            args.extend(["--since", str(since)])
+
+        process = await asyncio.create_subprocess_exec(
+            self.program,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            async for line in process.stdout:
+                event = load_event(line)
+                if event:
+                    yield event
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
     def interactive(self, container_id):
         """Create interactive session."""
         args = [self.program, "exec", "-ti", container_id, "bash"]
@@ -174,3 +237,299 @@ class Podman:
         except subprocess.CalledProcessError as callerr:
             if callerr.returncode != 130:
                 raise  # when it was not killed by ctrl + D (signal 2)
+
+
+class PodmanAPI(Podman):
+    """Podman wrapper talking to podman service REST API.
+
+    All calls share a pool of connections to the service unix socket instead
+    of spawning podman process for each of them. Container creation and
+    network creation accept podman command line options so they are still
+    done by podman process, as well as interactive session.
+    The service can be started by `systemctl --user start podman.socket`.
+    aiohttp is imported only here so that it is not needed for podman command,
+    ImportError is raised when it is missing.
+    """
+
+    def __init__(self, socket_path=None, program="podman"):
+        """Init the instance, connection is opened on first request."""
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        super().__init__(program)
+        self.aiohttp = aiohttp
+        self.socket_path = os.path.expanduser(socket_path or default_api_socket())
+        self._session = None
+        self._loop = None
+
+    def _get_session(self):
+        """Get HTTP session of current event loop, create it if needed."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = self.aiohttp.UnixConnector(
+                path=self.socket_path, limit=API_CONNECTIONS
+            )
+            self._session = self.aiohttp.ClientSession(
+                connector=connector, timeout=self.aiohttp.ClientTimeout(total=None)
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        """Close connections to podman service."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _url(self, path):
+        """Get URL of libpod API endpoint."""
+        return f"http://podman/{API_VERSION}/libpod{path}"
+
+    async def _request(self, method, path, params=None, data=None):
+        """Do API request, return response status and loaded JSON body."""
+        session = self._get_session()
+        try:
+            async with session.request(
+                method, self._url(path), params=params, json=data
+            ) as resp:
+                body = await resp.read()
+        except self.aiohttp.ClientError as api_err:
+            raise ProvisioningError(
+                f"{self.dsp_name} API request {method} {path} failed: {api_err}"
+            ) from api_err
+
+        try:
+            content = json.loads(body) if body else None
+        except ValueError:
+            content = body.decode(errors="replace")
+
+        if resp.status >= 400:
+            logger.debug(f"{self.dsp_name} {method} {path}: {resp.status} {content}")
+        return resp.status, content
+
+    async def inspect(self, container_id):
+        """Inspects a container returns data loaded from JSON structure."""
+        status, content = await self._request("GET", f"/containers/{container_id}/json")
+        return [content] if status == 200 else []
+
+    async def rm(self, container_id, force=False):  # pylint: disable=invalid-name
+        """Remove a container."""
+        params = {"force": "true"} if force else None
+        status, _content = await self._request(
+            "DELETE", f"/containers/{container_id}", params=params
+        )
+        return status < 300
+
+    async def stop(self, container_id, time=0):
+        """Stop a container."""
+        params = {"timeout": str(time)} if time else None
+        status, _content = await self._request(
+            "POST", f"/containers/{container_id}/stop", params=params
+        )
+        return status < 300
+
+    async def exec_command(self, container_id, command):
+        """Execute command in selected container."""
+        status, content = await self._request(
+            "POST",
+            f"/containers/{container_id}/exec",
+            data={
+                "Cmd": ["sh", "-c", command],
+                "AttachStdout": True,
+                "AttachStderr": True,
+            },
+        )
+        if status >= 300:
+            return False
+
+        exec_id = content["Id"]
+        # start without detaching returns after the command finishes
+        status, _content = await self._request(
+            "POST", f"/exec/{exec_id}/start", data={"Detach": False}
+        )
+        if status >= 300:
+            return False
+
+        status, content = await self._request("GET", f"/exec/{exec_id}/json")
+        return status == 200 and content.get("ExitCode") == 0
+
+    async def network_exists(self, network):
+        """Check the existence of podman network."""
+        status, _content = await self._request("GET", f"/networks/{network}/exists")
+        return status == 204
+
+    async def network_remove(self, network):
+        """Remove a podman network if it does exist."""
+        if not await self.network_exists(network):
+            logger.debug(f"{self.dsp_name} Network '{network}' does not exists")
+            return True
+
+        status, _content = await self._request("DELETE", f"/networks/{network}")
+        return status < 300
+
+    async def pull(self, image):
+        """Pull a container image."""
+        logger.info(
+            f"{self.dsp_name} Pulling image '{image}'. This may take a while..."
+        )
+        session = self._get_session()
+        path = "/images/pull"
+        success = False
+        try:
+            async with session.post(
+                self._url(path), params={"reference": image, "quiet": "true"}
+            ) as resp:
+                success = resp.status == 200
+                # progress is streamed as JSON objects, errors are reported in them
+                async for line in resp.content:
+                    if line.strip() and json.loads(line).get("error"):
+                        logger.debug(f"{self.dsp_name} {line.decode().strip()}")
+                        success = False
+        except self.aiohttp.ClientError as api_err:
+            logger.debug(f"{self.dsp_name} API request POST {path} failed: {api_err}")
+            success = False
+
+        if success:
+            logger.info(f"{self.dsp_name} Pull of image '{image}' succeeded")
+        else:
+            logger.error(f"{self.dsp_name} Pull of image '{image}' failed")
+
+        return success
+
+    async def image_exists(self, image):
+        """Check if a container image exists in local storage."""
+        status, _content = await self._request("GET", f"/images/{image}/exists")
+        return status == 204
+
+    async def events(self, filters=None, since=None):
+        """Stream podman events as loaded JSON objects.
+
+        `filters` is a dictionary mapping filter names (e.g. "container")
+        to lists of values, `since` is unix timestamp to replay events from.
+        """
+        params = {"stream": "true"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        if since:
+            params["since"] = str(since)
+
+        session = self._get_session()
+        try:
+            async with session.get(self._url("/events"), params=params) as resp:
+                async for line in resp.content:
+                    event = load_event(line)
+                    if event:
+                        yield event
+        except self.aiohttp.ClientError as api_err:
+            raise ProvisioningError(
+                f"{self.dsp_name} Reading of podman events failed: {api_err}"
+            ) from api_err
+
+
+def parse_event(event):
+    """Get container id and status from podman event.
+
+    Podman command and REST API use different event format, health check
+    results are reported with "healthy" status.
+    """
+    actor = event.get("Actor") or {}
+    container_id = event.get("ID") or event.get("id") or actor.get("ID")
+    status = event.get("Status") or event.get("status") or event.get("Action")
+    if status == "health_status":
+        attributes = actor.get("Attributes") or event.get("Attributes") or {}
+        status = event.get("HealthStatus") or attributes.get("health_status")
+    return container_id, status
+
+
+class PodmanEventWatcher:
+    """Shared watcher of podman container events.
+
+    One events stream (filtered by `filters`) is read for all containers
+    instead of polling every container. Statuses seen for each container are
+    remembered so waiting for an event which already happened returns at once.
+    """
+
+    def __init__(self, podman, filters=None):
+        """Init the instance, the stream is read after `start` is called."""
+        self.podman = podman
+        self.filters = filters
+        self._seen = {}  # container id -> set of seen statuses
+        self._waiters = []  # (container id, statuses, future)
+        self._task = None
+        self._error = None
+        self._stopped_at = None  # time of stop, events since then are replayed
+
+    def start(self):
+        """Start reading events, including those since now if missed.
+
+        Watcher which was stopped replays events since it was stopped.
+        """
+        if self._task is None or self._task.done():
+            since = self._stopped_at or int(time.time())
+            self._stopped_at = None
+            self._error = None
+            self._task = asyncio.create_task(self._run(since))
+
+    async def stop(self):
+        """Stop reading events, pending waiters fail with ProvisioningError.
+
+        The watcher is started again by the next `wait`.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopped_at = int(time.time())
+        self._fail_waiters(ProvisioningError("Podman events watcher stopped"))
+
+    def _fail_waiters(self, error):
+        """Fail all pending waiters with the error."""
+        for _container_id, _statuses, future in self._waiters:
+            if not future.done():
+                future.set_exception(error)
+
+    async def wait(self, container_id, statuses, timeout=None):
+        """Wait till container reaches one of `statuses`, return the status.
+
+        Raises asyncio.TimeoutError if it doesn't happen within `timeout`
+        seconds and ProvisioningError if events can not be read.
+        """
+        seen = self._seen.get(container_id, set()) & set(statuses)
+        if seen:
+            return seen.pop()
+        if self._error:
+            raise self._error
+        if self._stopped_at is not None:
+            self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (container_id, set(statuses), future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters.remove(waiter)
+
+    async def _run(self, since):
+        """Read events and wake up waiters of the containers."""
+        try:
+            async for event in self.podman.events(self.filters, since=since):
+                container_id, status = parse_event(event)
+                if not container_id or not status:
+                    continue
+                self._seen.setdefault(container_id, set()).add(status)
+                for waiter_id, statuses, future in self._waiters:
+                    if waiter_id == container_id and status in statuses:
+                        if not future.done():
+                            future.set_result(status)
+            error = ProvisioningError("Podman events stream ended")
+        except ProvisioningError as events_err:
+            error = events_err
+        except ValueError as events_err:
+            error = ProvisioningError(f"Podman events can not be read: {events_err}")
+
+        logger.warning(f"{self.podman.dsp_name} {error}")
+        self._error = error
+        self._fail_waiters(error)
@@ -41,6 +41,8 @@ class AWSTransformer(Transformer):
             instance_tags=self.config["instance_tags"],
             strategy=self.config.get("strategy", STRATEGY_ABORT),
             max_retry=self.config.get("max_retry", DEFAULT_ATTEMPTS),
+            api_workers=self.config.get("api_workers"),
+            api_timeout=self.config.get("api_timeout"),
         )
 
     def _get_security_groups(self):
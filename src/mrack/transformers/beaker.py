@@ -17,6 +17,7 @@ import os
 import re
 
 from mrack.providers.provider import STRATEGY_ABORT
+from mrack.providers.utils.beaker import DEFAULT_HUB_POOL_SIZE
 from mrack.transformers.transformer import Transformer
 
 CONFIG_KEY = "beaker"
@@ -42,6 +43,8 @@ class BeakerTransformer(Transformer):
             reserve_duration=self.config["reserve_duration"],
             strategy=self.config.get("strategy", STRATEGY_ABORT),
             max_retry=self.config.get("max_retry", DEFAULT_ATTEMPTS),
+            hub_pool_size=self.config.get("hub_pool_size", DEFAULT_HUB_POOL_SIZE),
+            multi_recipe_job=self.config.get("multi_recipe_job", False),
         )
 
     def _get_distro_and_variant(self, host):
@@ -42,21 +42,30 @@ class OpenStackTransformer(Transformer):
     async def init_provider(self):
         """Initialize associate provider and transformer display name."""
         self.dsp_name = "OpenStack"
-
-        os_cloud = os.environ.get("OS_CLOUD")
-        if not os_cloud:
-            os_cloud = self.config.get("profile", DEFAULT_CLOUD_PROFILE)
-
         await self._provider.init(
             image_names=self.config["images"].values(),
             networks=self.config["networks"],
             strategy=self.config.get("strategy", STRATEGY_ABORT),
             max_retry=self.config.get("max_retry", DEFAULT_ATTEMPTS),
-            cloud_profile=os_cloud,
+            cloud_profile=self._get_cloud_profile(),
             keypair=self.config["keypair"],
             pubkey=self.config["pubkey"],
+            cache_ttl=self.config.get("cache_ttl"),
+            partial_provisioning=self.config.get("partial_provisioning", False),
         )
 
+    async def init_provider_teardown(self):
+        """Initialize associated provider only for deletion of hosts."""
+        self.dsp_name = "OpenStack"
+        await self._provider.init_teardown(cloud_profile=self._get_cloud_profile())
+
+    def _get_cloud_profile(self):
+        """Get cloud profile from OS_CLOUD envvar or provisioning config."""
+        os_cloud = os.environ.get("OS_CLOUD")
+        if not os_cloud:
+            os_cloud = self.config.get("profile", DEFAULT_CLOUD_PROFILE)
+        return os_cloud
+
     def _get_network_type(self, host):
         """Get network type from host object definition.
 
@@ -15,6 +15,7 @@
 """Podman transformer module."""
 
 from mrack.providers.provider import STRATEGY_ABORT
+from mrack.providers.utils.podman import BACKEND_CLI, READINESS_POLL
 from mrack.transformers.transformer import DEFAULT_ATTEMPTS, Transformer
 from mrack.utils import get_host_from_metadata
 
@@ -45,6 +46,9 @@ class PodmanTransformer(Transformer):
             extra_commands=self.config.get("extra_commands", []),
             strategy=self.config.get("strategy", STRATEGY_ABORT),
             max_retry=self.config.get("max_retry", DEFAULT_ATTEMPTS),
+            backend=self.config.get("backend", BACKEND_CLI),
+            api_socket=self.config.get("api_socket"),
+            readiness=self.config.get("readiness", READINESS_POLL),
         )
 
     def create_host_requirement(self, host):
@@ -85,8 +85,11 @@ class Transformer:
     _required_config_attrs: typing.List[str] = []
     _config_key = ""
 
-    async def init(self, cfg, metadata):
-        """Initialize transformer."""
+    async def init(self, cfg, metadata, teardown=False):
+        """Initialize transformer.
+
+        In teardown mode the provider is initialized only for deletion of hosts.
+        """
         self.dsp_name = "Transformer"
         self._hosts = []
         self._config = cfg
@@ -95,12 +98,22 @@ class Transformer:
             self.validate_config()
 
         self._provider = providers.get(self._config_key)
-        await self.init_provider()
+        if teardown:
+            await self.init_provider_teardown()
+        else:
+            await self.init_provider()
 
     async def init_provider(self):
         """Initialize associated provider."""
         pass
 
+    async def init_provider_teardown(self):
+        """Initialize associated provider only for deletion of hosts.
+
+        Providers without a lightweight initialization are initialized fully.
+        """
+        await self.init_provider()
+
     @property
     def config(self):
         """Get transformer/provider configuration from provisioning configuration."""
@@ -22,10 +22,13 @@ import datetime
 import json
 import logging
 import os
+import random
 import subprocess
 import sys
+import tempfile
+import xml.etree.ElementTree as eTree
 from functools import wraps
-from xml.dom.minidom import Document as xml_doc
+from xml.dom.minidom import parseString
 
 import yaml
 
@@ -161,26 +164,34 @@ def validate_dict_attrs(dct, attr_list, dct_name):
 
 
 def add_dict_to_node(node, input_dict):
+    """Convert dict object to XML elements of minidom node.
+
+    Kept for compatibility, it is a wrapper of `add_dict_to_element`.
+    """
+    element = add_dict_to_element(eTree.Element(node.tagName), input_dict)
+    converted = parseString(eTree.tostring(element)).documentElement
+    for name, value in converted.attributes.items():
+        node.setAttribute(name, value)
+    for child in list(converted.childNodes):
+        node.appendChild(child)
+    return node
+
+
+def add_dict_to_element(element, input_dict):
     """Convert dict object to XML elements."""
-    # Recursively create xml from dict
     if isinstance(input_dict, dict):
         for key, value in input_dict.items():
             if isinstance(value, list):
-                child_node = node.appendChild(xml_doc().createElement(key))
+                child_element = eTree.SubElement(element, key)
                 for child_value in value:
                     for k, v in child_value.items():
-                        child_node.appendChild(
-                            add_dict_to_node(xml_doc().createElement(k), v)
-                        )
+                        add_dict_to_element(eTree.SubElement(child_element, k), v)
+            elif key.startswith("_"):
+                element.set(key[1:], str(value))
             else:
-                if key.startswith("_"):
-                    node.setAttribute(key[1:], str(value))
-                else:
-                    node.appendChild(
-                        add_dict_to_node(xml_doc().createElement(key), value)
-                    )
+                add_dict_to_element(eTree.SubElement(element, key), value)
 
-    return node
+    return element
 
 
 def json_convertor(obj):
@@ -218,12 +229,27 @@ def load_yaml(path):
 
 
 def save_to_json(path, data):
-    """Serialize object into JSON file."""
+    """Serialize object into JSON file.
+
+    Data are written into temporary file which then atomically replaces
+    the target file so it is never left half written.
+    """
+    path = os.path.expanduser(path)
+    tmp_path = None
     try:
-        with open(os.path.expanduser(path), "w", encoding="utf-8") as output:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", prefix=".mrack-"
+        )
+        with os.fdopen(fd, "w", encoding="utf-8") as output:
             json.dump(data, output, default=json_convertor, indent=2, sort_keys=True)
+        # keep permissions of the replaced file, temporary file is private
+        mode = os.stat(path).st_mode if os.path.exists(path) else 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
     except IOError as exc:
         logger.exception(exc)
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
         sys.exit(1)
 
 
@@ -262,6 +288,84 @@ def print_obj(obj):
     logger.info(object2json(obj))
 
 
+class MetadataIndex:
+    """Index of job metadata hosts by their names.
+
+    Index is rebuilt when metadata change: domains or hosts are added or
+    removed, or looked up host is renamed. Names which are not in metadata
+    are remembered so looking them up again does not walk the metadata.
+    """
+
+    def __init__(self, metadata):
+        """Index hosts of the metadata."""
+        self.metadata = metadata
+        self._hosts = {}
+        self._missing = set()  # looked up names which are not in metadata
+        self._shape = None
+        self._build()
+
+    def _current_shape(self):
+        """Get cheap fingerprint of metadata domains and their hosts."""
+        return tuple(
+            (id(domain), len(domain.get("hosts", [])))
+            for domain in self.metadata.get("domains", [])
+        )
+
+    def _build(self):
+        """Walk all domains and hosts of the metadata once and index them."""
+        self._hosts = {}
+        self._missing = set()
+        self._shape = self._current_shape()
+        for domain in self.metadata.get("domains", []):
+            for host in domain.get("hosts", []):
+                # the first definition wins the same as with linear search
+                self._hosts.setdefault(host["name"], (host, domain))
+
+    def get_host(self, name):
+        """
+        Get host definition and its domain by host name.
+
+        Returns:
+        (host, domain)
+        """
+        if self._shape != self._current_shape():
+            self._build()
+        elif name in self._missing:
+            return None, None
+
+        host, domain = self._hosts.get(name, (None, None))
+        if host is not None and host.get("name") != name:
+            # the host was renamed in place
+            self._build()
+            host, domain = self._hosts.get(name, (None, None))
+        if host is None:
+            self._missing.add(name)
+        return host, domain
+
+
+METADATA_INDEX_CACHE_SIZE = 4
+_metadata_indexes = {}  # id of metadata object -> MetadataIndex, in LRU order
+
+
+def get_metadata_index(metadata):
+    """
+    Get index of job metadata hosts.
+
+    The index is built only once for the metadata object, e.g. when
+    global context loads job metadata, and reused by all following lookups.
+    Indexes of a few most recently used metadata objects are kept.
+    """
+    index = _metadata_indexes.pop(id(metadata), None)
+    # index keeps the metadata object alive so its id is not reused
+    if index is None or index.metadata is not metadata:
+        if len(_metadata_indexes) >= METADATA_INDEX_CACHE_SIZE:
+            # drop the least recently used index
+            _metadata_indexes.pop(next(iter(_metadata_indexes)))
+        index = MetadataIndex(metadata)
+    _metadata_indexes[id(metadata)] = index
+    return index
+
+
 def get_host_from_metadata(metadata, name):
     """
     Get host definition from job metadata base on name.
@@ -269,13 +373,7 @@ def get_host_from_metadata(metadata, name):
     Returns:
     (host, domain)
     """
-    domains = metadata.get("domains", [])
-    for domain in domains:
-        for host in domain.get("hosts", []):
-            if host["name"] == name:
-                return host, domain
-
-    return None, None
+    return get_metadata_index(metadata).get_host(name)
 
 
 def is_windows_host(meta_host):
@@ -396,11 +494,8 @@ def ssh_to_host(
     ssh_options={},
 ):
     """SSH to the selected host."""
-    psw = host.password or password
-
     run_args = {
         "env": os.environ.copy(),
-        "shell": True,
     }
     if not interactive:
         run_args.update(
@@ -410,15 +505,50 @@ def ssh_to_host(
             }
         )
 
+    cmd = ssh_command_args(
+        host,
+        username=username,
+        password=password,
+        ssh_key=ssh_key,
+        command=command,
+        ssh_options=ssh_options,
+    )
+
+    logger.debug(f"Running: {' '.join(cmd)}")
+    with subprocess.Popen(cmd, **run_args) as process:
+        std_out, std_err = process.communicate()
+
+    if not interactive:
+        for o_line in std_out.decode().splitlines():
+            logger.debug(f"stdout: {o_line}")
+
+        for e_line in std_err.decode().splitlines():
+            logger.debug(f"stderr: {e_line}")
+
+    return process.returncode == 0
+
+
+def ssh_command_args(
+    host,
+    username=None,
+    password=None,
+    ssh_key=None,
+    command=None,
+    ssh_options=None,
+):
+    """Build SSH command as a list of arguments to be executed without shell."""
+    psw = host.password or password
+
     cmd = ["ssh"]
-    cmd.extend(ssh_options_to_cli(ssh_options))
+    for option, value in (ssh_options or {}).items():
+        cmd.extend(["-o", f"{option}={value}"])
 
     if psw:
-        cmd.extend(["-o", "'PasswordAuthentication=yes'"])
+        cmd.extend(["-o", "PasswordAuthentication=yes"])
         cmd = ["sshpass", "-p", psw] + cmd
     elif ssh_key:
-        cmd.extend(["-o", "'PasswordAuthentication=no'"])
-        cmd.extend(["-i", ssh_key])
+        cmd.extend(["-o", "PasswordAuthentication=no"])
+        cmd.extend(["-i", os.path.expanduser(ssh_key)])
 
     if username:
         cmd.extend(["-l", username])
@@ -428,22 +558,78 @@ def ssh_to_host(
     if command:
         cmd.append(command)
 
-    cmd = " ".join(cmd)
+    return cmd
 
-    logger.debug(f"Running: {cmd}")
-    with subprocess.Popen(cmd, **run_args) as process:
-        std_out, std_err = process.communicate()
 
-    if not interactive:
-        for o_line in std_out.decode().splitlines():
-            logger.debug(f"stdout: {o_line}")
+async def ssh_to_host_async(
+    host,
+    username=None,
+    password=None,
+    ssh_key=None,
+    command=None,
+    ssh_options=None,
+    timeout=None,
+):
+    """SSH to the selected host without blocking the event loop.
 
-        for e_line in std_err.decode().splitlines():
-            logger.debug(f"stderr: {e_line}")
+    Returns True if the command finished with return code 0 within `timeout`
+    seconds (no limit when `timeout` is None).
+    """
+    cmd = ssh_command_args(
+        host,
+        username=username,
+        password=password,
+        ssh_key=ssh_key,
+        command=command,
+        ssh_options=ssh_options,
+    )
+    logger.debug(f"Running: {' '.join(cmd)}")
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=os.environ.copy(),
+        )
+    except OSError as exec_err:
+        logger.debug(f"Failed to execute {cmd[0]}: {exec_err}")
+        return False
+
+    try:
+        std_out, std_err = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        logger.debug(f"SSH to host {host.ip_addr} timed out after {timeout}s")
+        process.kill()
+        await process.wait()
+        return False
+
+    for o_line in std_out.decode().splitlines():
+        logger.debug(f"stdout: {o_line}")
+
+    for e_line in std_err.decode().splitlines():
+        logger.debug(f"stderr: {e_line}")
 
     return process.returncode == 0
 
 
+async def is_port_open(ip_addr, port, timeout):
+    """Check if TCP port accepts connections within `timeout` seconds."""
+    try:
+        _reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip_addr, port), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
 async def exec_async_subprocess(program, args, raise_on_err=True):
     """Util method to execute subprocess asynchronously."""
     process = await asyncio.create_subprocess_exec(
@@ -466,6 +652,19 @@ async def exec_async_subprocess(program, args, raise_on_err=True):
     return stdout, stderr, process
 
 
+def backoff_delays(first, maximum, factor=2, jitter=0.5):
+    """Generate exponentially growing delays (seconds) with random jitter.
+
+    Delays start at `first` and grow `factor` times up to `maximum`. Every
+    delay is randomly shortened by up to `jitter` part of it so that
+    concurrent waiters do not wake up all at the same time.
+    """
+    delay = first
+    while True:
+        yield delay * (1 - random.uniform(0, jitter))
+        delay = min(delay * factor, maximum)
+
+
 def async_run(func):
     """Decorate click actions to run as async."""
 
@@ -0,0 +1,167 @@
+"""
+Benchmark of Beaker job XML generation.
+
+Compares current BeakerProvider job generation (memoized ElementTree
+translation of hostRequires, no copy of requirements) with the previous
+implementation (deep copy of every requirement and hostRequires translated
+node by node in new minidom documents).
+
+Run as: PYTHONPATH=src python tests/benchmarks/bench_beaker_xml.py [count]
+"""
+
+import gc
+import sys
+import time
+from copy import deepcopy
+from xml.dom.minidom import Document as xml_doc
+
+from bkr.client import BeakerJob, BeakerRecipeSet
+
+from mrack.providers.beaker import BeakerProvider
+
+DEFAULT_COUNT = 500
+
+HOST_REQUIRES = {
+    "_force": "",
+    "and": [
+        {"system_type": {"_value": "Machine"}},
+        {"memory": {"_op": ">=", "_value": "8192"}},
+        {"key_value": {"_key": "PROCESSOR_CORES", "_op": ">=", "_value": "4"}},
+        {
+            "or": [
+                {"hypervisor": {"_op": "=", "_value": ""}},
+                {"hypervisor": {"_op": "=", "_value": "KVM"}},
+            ]
+        },
+        {
+            "not": [
+                {"key_value": {"_key": "BOOTDISK", "_op": "==", "_value": "dum"}},
+                {"hostname": {"_op": "like", "_value": "%.broken.test"}},
+            ]
+        },
+        {
+            "or": [
+                {"arch": {"_op": "=", "_value": "x86_64"}},
+                {
+                    "and": [
+                        {"arch": {"_op": "=", "_value": "aarch64"}},
+                        {"disk": {"size": {"_op": ">=", "_value": "100000"}}},
+                    ]
+                },
+            ]
+        },
+    ],
+}
+
+
+def add_dict_to_node(node, input_dict):
+    """Convert dict object to minidom XML elements (removed from mrack.utils)."""
+    if isinstance(input_dict, dict):
+        for key, value in input_dict.items():
+            if isinstance(value, list):
+                child_node = node.appendChild(xml_doc().createElement(key))
+                for child_value in value:
+                    for k, v in child_value.items():
+                        child_node.appendChild(
+                            add_dict_to_node(xml_doc().createElement(k), v)
+                        )
+            else:
+                if key.startswith("_"):
+                    node.setAttribute(key[1:], str(value))
+                else:
+                    node.appendChild(
+                        add_dict_to_node(xml_doc().createElement(key), value)
+                    )
+
+    return node
+
+
+class LegacyBeakerProvider(BeakerProvider):
+    """Job generation before ElementTree translation and memoization."""
+
+    def _translate_constraint(self, host_requires, host_recipe):
+        for operand, operand_value in host_requires.items():
+            if operand.startswith("_"):
+                host_recipe.setAttribute(operand[1:], operand_value)
+                continue
+            if operand not in ["and", "or"]:
+                req_node = xml_doc().createElement(operand)
+                req_node = add_dict_to_node(req_node, operand_value)
+                host_recipe.appendChild(req_node)
+                continue
+            req_node = xml_doc().createElement(operand)
+            for dct in operand_value:
+                if dct.get("or") or dct.get("and"):
+                    self._translate_constraint(dct, req_node)
+                else:
+                    req_node = add_dict_to_node(req_node, dct)
+            host_recipe.appendChild(req_node)
+
+    def _req_to_bkr_job(self, req):
+        specs = deepcopy(req)
+        recipe = self._req_to_bkr_recipe(specs)
+        recipe_set = BeakerRecipeSet(**specs)
+        recipe_set.addRecipe(recipe)
+        job = BeakerJob(**specs)
+        job.addRecipeSet(recipe_set)
+        return job
+
+
+def host_req(index):
+    return {
+        "name": f"host{index}.mrack.test",
+        "distro": "Fedora-39%",
+        "os": "fedora-39",
+        "group": "client",
+        "arch": "x86_64",
+        "variant": "Server",
+        "ks_meta": "harness='restraint-rhts beakerlib'",
+        "retention_tag": "audit",
+        "product": "[internal]",
+        "whiteboard": "This job has been created using mrack.",
+        "priority": "Normal",
+        "tasks": [
+            {
+                "name": "/distribution/dummy",
+                "role": "STANDALONE",
+                "params": ["RSTRNT_DISABLED=10_avc_check"],
+            }
+        ],
+        "ks_append": ["%post\necho 'ssh-rsa AAAA' >> /root/.ssh/authorized_keys\n%end"],
+        "hostRequires": deepcopy(HOST_REQUIRES),
+        "distro_tags": ["RC-1.0"],
+        "watchdog": {"panic": "ignore"},
+    }
+
+
+def measure(label, func):
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    duration = time.perf_counter() - start
+    print(f"{label:<30} {duration * 1000:9.1f} ms")
+    return result
+
+
+def run(cls, count):
+    print(f"{cls.__name__} ({count} hosts)")
+    provider = cls()
+    provider.reserve_duration = 86400
+    reqs = [host_req(index) for index in range(count)]
+    measure("  job per host", lambda: [provider._req_to_bkr_job(r) for r in reqs])
+    jobs = measure(
+        "  job per host + toxml",
+        lambda: [provider._req_to_bkr_job(r).toxml() for r in reqs],
+    )
+    return jobs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    legacy = run(LegacyBeakerProvider, count)
+    current = run(BeakerProvider, count)
+    assert legacy == current, "generated job XML differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark of Host object creation, serialization and loading.
+
+Compares current mrack.host.Host (slotted, cached serialization, raw data
+kept as JSON string till accessed) with the previous plain object
+implementation (dict based instance, serialized on every save). Save and load
+include JSON encoding and decoding as done by database drivers, "save after
+load" is the usual run which loads database, changes it and saves it again.
+
+Run as: PYTHONPATH=src python tests/benchmarks/bench_host.py [count]
+"""
+
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from mrack.host import Host, host_from_json
+from mrack.providers import providers
+from mrack.providers.static import PROVISIONER_KEY, StaticProvider
+from mrack.utils import json_convertor
+
+DEFAULT_COUNT = 10000
+
+
+class LegacyHost:
+    """Host implementation before slots and cached serialization."""
+
+    def __init__(
+        self,
+        provider,
+        host_id,
+        name,
+        operating_system,
+        group,
+        ip_addrs,
+        status,
+        rawdata,
+        username=None,
+        password=None,
+        error_obj=None,
+        meta_extra=None,
+    ):
+        self._provider = provider
+        self._host_id = host_id
+        self._name = name
+        self._operating_system = operating_system
+        self._group = group
+        self._ip_addrs = ip_addrs
+        self._status = status
+        self._username = username
+        self._password = password
+        self._rawdata = rawdata
+        self._error = error_obj
+        self._meta_extra = meta_extra
+
+    def to_json(self):
+        return {
+            "provider": self._provider.name,
+            "host_id": self._host_id,
+            "name": self._name,
+            "operating_system": self._operating_system,
+            "group": self._group,
+            "ip_addrs": self._ip_addrs,
+            "status": self._status,
+            "username": self._username,
+            "password": self._password,
+            "rawdata": self._rawdata,
+            "error": self._error,
+            "meta_extra": self._meta_extra,
+        }
+
+
+def legacy_from_json(host_data):
+    return LegacyHost(
+        providers.get(host_data["provider"]),
+        host_data["host_id"],
+        host_data["name"],
+        host_data["operating_system"],
+        host_data["group"],
+        host_data["ip_addrs"],
+        host_data["status"],
+        host_data["rawdata"],
+        host_data["username"],
+        host_data["password"],
+        host_data["error"],
+        host_data.get("meta_extra"),
+    )
+
+
+def host_args(index):
+    rawdata = {
+        "id": f"id-{index}",
+        "addresses": {"net": [{"addr": f"10.0.{index // 250}.{index % 250}"}]},
+        "metadata": {"owner": "mrack", "lifetime": "1"},
+    }
+    return (
+        providers.get(PROVISIONER_KEY),
+        f"id-{index}",
+        f"host{index}.mrack.test",
+        "fedora-39",
+        "client",
+        [f"10.0.{index // 250}.{index % 250}"],
+        "active",
+        rawdata,
+    )
+
+
+def measure(label, func):
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    duration = time.perf_counter() - start
+    print(f"{label:<30} {duration * 1000:9.1f} ms")
+    return result
+
+
+def measure_memory(label, func):
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<30} {current / 1024 / 1024:9.1f} MiB")
+    return result
+
+
+def save(hosts):
+    # the same encoding as used by FileDBDriver
+    return json.dumps(
+        {"hosts": [host.to_json() for host in hosts]},
+        default=json_convertor,
+        indent=2,
+        sort_keys=True,
+    )
+
+
+def load(from_json, content):
+    return [from_json(item) for item in json.loads(content)["hosts"]]
+
+
+def run(cls, from_json, count):
+    print(f"{cls.__name__} ({count} hosts)")
+    args = [host_args(index) for index in range(count)]
+    hosts = measure("  create", lambda: [cls(*arg) for arg in args])
+    measure("  first save", lambda: save(hosts))
+    content = measure("  next save", lambda: save(hosts))
+    loaded = measure("  load", lambda: load(from_json, content))
+    measure("  save after load", lambda: save(loaded))
+    measure_memory("  loaded hosts memory", lambda: load(from_json, content))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    providers.register(PROVISIONER_KEY, StaticProvider)
+    run(LegacyHost, legacy_from_json, count)
+    run(Host, host_from_json, count)
+
+
+if __name__ == "__main__":
+    main()
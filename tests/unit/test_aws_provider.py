@@ -1,11 +1,19 @@
 """Tests for AWS Provider - SSM parameter image resolution."""
 
+import asyncio
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
 
-from mrack.errors import ValidationError
+from mrack.errors import ProviderError, ProvisioningError, ValidationError
 from mrack.providers.aws import AWSProvider
+from mrack.providers.utils.ec2 import (
+    AsyncEC2Client,
+    EC2InstancePoller,
+    EC2LaunchBatcher,
+)
 
 
 class MockAMI:
@@ -30,6 +38,12 @@ def provider():
         p._ssm_client = MagicMock()
         p.ssm_resolved = {}
         p.ec2 = MagicMock()
+        p.client = MagicMock()
+        p.aec2 = AsyncEC2Client(p.client)
+        p.poller = EC2InstancePoller(p.aec2, interval=0)
+        p.launcher = EC2LaunchBatcher(p.aec2, delay=0)
+        p.instance_tags = {}
+        p.ssh_key = "mrack-keypair"
         return p
 
 
@@ -196,3 +210,214 @@ class TestLoadImageSSM:
             Filters=[{"Name": "image-id", "Values": ["ami-direct"]}]
         )
         assert result is mock_ami
+
+
+class TestAsyncEC2Facade:
+    """Test that provider calls boto3 through the thread pool facade."""
+
+    @pytest.mark.asyncio
+    async def test_create_server(self, provider):
+        provider.amis = [MockAMI("ami-direct")]
+        provider.client.run_instances.return_value = {
+            "Instances": [{"InstanceId": "i-123"}]
+        }
+        req = {"name": "host.test", "image": "ami-direct", "flavor": "t2.micro"}
+
+        aws_id, ret_req = await provider.create_server(req)
+
+        assert aws_id == "i-123"
+        assert ret_req is req
+        request = provider.client.run_instances.call_args.kwargs
+        assert request["ImageId"] == "ami-direct"
+        assert request["MinCount"] == request["MaxCount"] == 1
+        tags = request["TagSpecifications"][0]["Tags"]
+        assert {"Key": "Name", "Value": "host.test"} in tags
+        provider.client.create_tags.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_create_servers_in_bulk(self, provider):
+        provider.amis = [MockAMI("ami-direct"), MockAMI("ami-other")]
+        provider.instance_tags = {"team": "idm"}
+        provider.client.run_instances.side_effect = [
+            {"Instances": [{"InstanceId": "i-1"}, {"InstanceId": "i-2"}]},
+            {"Instances": [{"InstanceId": "i-3"}]},
+        ]
+        reqs = [
+            {"name": "host1.test", "image": "ami-direct", "flavor": "t2.micro"},
+            {"name": "host2.test", "image": "ami-direct", "flavor": "t2.micro"},
+            {"name": "host3.test", "image": "ami-other", "flavor": "t2.micro"},
+        ]
+
+        results = await asyncio.gather(*[provider.create_server(r) for r in reqs])
+
+        assert [aws_id for aws_id, _req in results] == ["i-1", "i-2", "i-3"]
+        calls = provider.client.run_instances.call_args_list
+        assert len(calls) == 2
+        assert calls[0].kwargs["MaxCount"] == 2
+        assert calls[0].kwargs["TagSpecifications"][0]["Tags"] == [
+            {"Key": "team", "Value": "idm"}
+        ]
+        assert calls[1].kwargs["MaxCount"] == 1
+        tagged = {
+            c.kwargs["Resources"][0]: c.kwargs["Tags"][0]["Value"]
+            for c in provider.client.create_tags.call_args_list
+        }
+        assert tagged == {"i-1": "host1.test", "i-2": "host2.test"}
+
+    @pytest.mark.asyncio
+    async def test_create_servers_partial_launch(self, provider):
+        provider.amis = [MockAMI("ami-direct")]
+        provider.client.run_instances.return_value = {
+            "Instances": [{"InstanceId": "i-1"}]
+        }
+        reqs = [
+            {"name": "host1.test", "image": "ami-direct", "flavor": "t2.micro"},
+            {"name": "host2.test", "image": "ami-direct", "flavor": "t2.micro"},
+        ]
+
+        results = await asyncio.gather(
+            *[provider.create_server(r) for r in reqs], return_exceptions=True
+        )
+
+        assert results[0] == ("i-1", reqs[0])
+        assert isinstance(results[1], ProvisioningError)
+        assert results[1].args[1] is reqs[1]
+
+    @pytest.mark.asyncio
+    async def test_create_servers_launch_error(self, provider):
+        provider.amis = [MockAMI("ami-direct")]
+        provider.client.run_instances.side_effect = EndpointConnectionError(
+            endpoint_url="https://ec2.test"
+        )
+        reqs = [
+            {"name": "host1.test", "image": "ami-direct", "flavor": "t2.micro"},
+            {"name": "host2.test", "image": "ami-direct", "flavor": "t2.micro"},
+        ]
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                *[provider.create_server(r) for r in reqs], return_exceptions=True
+            ),
+            1,
+        )
+
+        # every request of the failed batch gets the error
+        assert all(isinstance(res, ProvisioningError) for res in results)
+        assert not provider.launcher._tasks
+
+    @pytest.mark.asyncio
+    async def test_delete_host(self, provider):
+        assert await provider.delete_host("i-123", "host.test")
+        provider.client.terminate_instances.assert_called_once_with(
+            InstanceIds=["i-123"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_call_timeout(self):
+        client = MagicMock()
+        client.terminate_instances.side_effect = lambda **_kw: time.sleep(0.5)
+        aec2 = AsyncEC2Client(client, call_timeout=0.01)
+        with pytest.raises(ProviderError, match="terminate_instances"):
+            await aec2.terminate_instances(["i-123"])
+
+
+def describe_pages(*states):
+    """Create describe_instances pages with instances in given states."""
+    return [
+        {
+            "Reservations": [
+                {
+                    "Instances": [
+                        {"InstanceId": instance_id, "State": {"Name": state}}
+                        for instance_id, state in states
+                    ]
+                }
+            ]
+        }
+    ]
+
+
+class TestEC2InstancePoller:
+    """Test shared polling of instance states."""
+
+    @pytest.mark.asyncio
+    async def test_wait_till_provisioned(self, provider):
+        paginator = provider.client.get_paginator.return_value
+        paginator.paginate.side_effect = [
+            describe_pages(("i-1", "pending"), ("i-2", "pending")),
+            describe_pages(("i-1", "running"), ("i-2", "pending")),
+            describe_pages(("i-2", "terminated")),
+        ]
+        req1 = {"name": "host1.test"}
+        req2 = {"name": "host2.test"}
+
+        results = await asyncio.gather(
+            provider.wait_till_provisioned(("i-1", req1)),
+            provider.wait_till_provisioned(("i-2", req2)),
+        )
+
+        (res1, ret_req1), (res2, _ret_req2) = results
+        assert res1["State"]["Name"] == "running"
+        assert res1["mrack_req"] is req1
+        assert ret_req1 is req1
+        assert res2["State"]["Name"] == "terminated"
+        # one request per tick for all pending instances
+        assert [c.kwargs for c in paginator.paginate.call_args_list] == [
+            {"InstanceIds": ["i-1", "i-2"]},
+            {"InstanceIds": ["i-1", "i-2"]},
+            {"InstanceIds": ["i-2"]},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_timeout_returns_last_seen(self, provider):
+        paginator = provider.client.get_paginator.return_value
+        paginator.paginate.return_value = describe_pages(("i-1", "pending"))
+        provider.poller.interval = 0.01
+        provider.timeout = 0.001  # minutes
+
+        result, _req = await provider.wait_till_provisioned(
+            ("i-1", {"name": "host1.test"})
+        )
+
+        assert result["State"]["Name"] == "pending"
+        assert not provider.poller._pending
+
+    @pytest.mark.asyncio
+    async def test_instance_not_found_skipped(self, provider):
+        not_found = ClientError(
+            {
+                "Error": {
+                    "Code": "InvalidInstanceID.NotFound",
+                    "Message": "The instance ID 'i-2' does not exist",
+                }
+            },
+            "DescribeInstances",
+        )
+        paginator = provider.client.get_paginator.return_value
+        paginator.paginate.side_effect = (
+            [not_found] + [describe_pages(("i-1", "running"))] + [not_found] * 4
+        )
+
+        results = await asyncio.gather(
+            provider.wait_till_provisioned(("i-1", {"name": "host1.test"})),
+            provider.wait_till_provisioned(("i-2", {"name": "host2.test"})),
+            return_exceptions=True,
+        )
+
+        # unknown instance does not block polling of the other one
+        assert results[0][0]["State"]["Name"] == "running"
+        assert isinstance(results[1], ProvisioningError)
+        assert "i-2 not found" in str(results[1])
+
+    @pytest.mark.asyncio
+    async def test_poll_errors_fail_waiters(self, provider):
+        paginator = provider.client.get_paginator.return_value
+        paginator.paginate.side_effect = EndpointConnectionError(
+            endpoint_url="https://ec2.test"
+        )
+
+        with pytest.raises(ProvisioningError, match="Failed to poll"):
+            await asyncio.wait_for(
+                provider.wait_till_provisioned(("i-1", {"name": "host1.test"})), 1
+            )
+        assert paginator.paginate.call_count == 5
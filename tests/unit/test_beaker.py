@@ -14,6 +14,8 @@
 
 """Tests for mrack.providers.beaker"""
 
+import asyncio
+import threading
 from unittest import mock
 from unittest.mock import Mock, patch
 from xml.dom.minidom import Document as xml_doc
@@ -22,6 +24,7 @@ import pytest
 
 from mrack.providers import providers
 from mrack.providers.beaker import BeakerProvider
+from mrack.providers.utils.beaker import _translated_host_requires
 
 from .mock_data import MockedBeakerTransformer, provisioning_config
 from .utils import get_content, get_file_path
@@ -52,20 +55,132 @@ class TestBeakerProvider:
         mock.patch.stopall()
 
     @pytest.mark.asyncio
-    async def test_get_repo_info(self, mock_beaker_conf):
+    async def test_get_recipes(self, mock_beaker_conf):
         provider = BeakerProvider()
         await provider.init(self.distros, self.timeout, self.reserve_duration)
-        bkr_res = provider._get_recipe_info(self.beaker_id, self.log_msg_start)
+        bkr_res = provider._get_recipes(self.beaker_id)[0]
         assert bkr_res["system"] == "test.example.com"
         assert bkr_res["status"] == "Completed"
         assert bkr_res["result"] == "Pass"
         assert bkr_res["rid"] == "15482633"
+        assert bkr_res["rsid"] == "13149276"
         assert bkr_res["id"] == "8874545"
         assert bkr_res["logs"] == {
             "console.log": "https://test.example.com/logs/console.log",
             "anaconda.log": "https://test.example.com/logs/anaconda.log",
         }
 
+    @pytest.mark.asyncio
+    async def test_wait_till_provisioned(self, mock_beaker_conf):
+        statuses = ["Queued", "Queued", "Installing", "Reserved"]
+        xmls = [
+            self.result_xml.replace('status="Completed"  ', f'status="{status}" ')
+            for status in statuses
+        ]
+        self.mock_hub.taskactions.to_xml = Mock(side_effect=xmls)
+
+        provider = BeakerProvider()
+        provider.poll_sleep = 0
+        await provider.init(self.distros, self.timeout, self.reserve_duration)
+        resource = ("J:8874545", {"name": "host.example.test"})
+        bkr_res, _req = await provider.wait_till_provisioned(resource)
+
+        assert bkr_res["status"] == "Reserved"
+        assert bkr_res["JobID"] == "J:8874545"
+        assert self.mock_hub.taskactions.to_xml.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_hub_calls_off_event_loop(self, mock_beaker_conf):
+        threads = []
+
+        def upload(_job_xml):
+            threads.append(threading.current_thread())
+            return "J:8874545"
+
+        self.mock_hub.jobs.upload = Mock(side_effect=upload)
+        self.mock_hub._hub_url = "https://beaker.example.test"
+        provider = BeakerProvider()
+        await provider.init(
+            self.distros, self.timeout, self.reserve_duration, hub_pool_size=2
+        )
+        provider._req_to_bkr_job = Mock()
+
+        results = await asyncio.gather(
+            *[provider.create_server({"name": f"host{x}"}) for x in range(4)]
+        )
+        await provider.delete_host("8874545", "host0")
+
+        assert [job_id for job_id, _req in results] == ["J:8874545"] * 4
+        assert threading.current_thread() not in threads
+        # one logged in proxy per pool thread at most
+        assert self.mock_hub_class.call_count <= 2
+        self.mock_hub.taskactions.stop.assert_called_once_with(
+            "J:8874545", "cancel", "Job has been stopped by mrack."
+        )
+
+    @pytest.mark.asyncio
+    async def test_multi_recipe_job(self, mock_beaker_conf):
+        self.mock_hub.jobs.upload = Mock(return_value="J:8874545")
+        recipe_sets = "".join(
+            f'<recipeSet id="{100 + x}"><recipe id="{200 + x}" job_id="8874545" '
+            'result="New" status="Queued"/></recipeSet>'
+            for x in range(3)
+        )
+        self.mock_hub.taskactions.to_xml = Mock(
+            return_value=f'<job id="8874545">{recipe_sets}</job>'
+        )
+        self.mock_hub._hub_url = "https://beaker.example.test"
+        providers.register("beaker", BeakerProvider)
+        provider = providers.get("beaker")
+        provider.poll_sleep = 0
+        await provider.init(
+            self.distros, self.timeout, self.reserve_duration, multi_recipe_job=True
+        )
+        bkr_transformer = MockedBeakerTransformer()
+        await bkr_transformer.init(provisioning_config(), {})
+        for x in range(3):
+            bkr_transformer.add_host(
+                {"name": f"host{x}.example.test", "group": "client", "os": "Fedora-31%"}
+            )
+        reqs = bkr_transformer.create_host_requirements()
+
+        provider.expect_servers(reqs)
+        results = await asyncio.gather(*[provider.create_server(req) for req in reqs])
+
+        assert [job_id for job_id, _req in results] == ["J:8874545"] * 3
+        self.mock_hub.jobs.upload.assert_called_once()
+        job_xml = self.mock_hub.jobs.upload.call_args.args[0]
+        assert job_xml.count("<recipeSet") == 3
+        assert provider.recipe_indexes == {
+            "host0.example.test": 0,
+            "host1.example.test": 1,
+            "host2.example.test": 2,
+        }
+
+        # recipe sets are known right after submission
+        assert provider.recipe_sets == {
+            "host0.example.test": "100",
+            "host1.example.test": "101",
+            "host2.example.test": "102",
+        }
+
+        # host is cancelled by its own recipe set, not by the whole job,
+        # even when it did not get any status from beaker
+        provider.timeout = 0
+        bkr_res, _req = await provider.wait_till_provisioned(results[1])
+        assert bkr_res["JobID"] == "RS:101"
+        await provider.delete_host(bkr_res["JobID"], "host1.example.test")
+        self.mock_hub.taskactions.stop.assert_called_once_with(
+            "RS:101", "cancel", "Job has been stopped by mrack."
+        )
+
+        # host not expected to be created together gets its own job
+        self.mock_hub.jobs.upload.reset_mock()
+        self.mock_hub.taskactions.to_xml.return_value = self.result_xml
+        await provider.create_server(reqs[1])
+        job_xml = self.mock_hub.jobs.upload.call_args.args[0]
+        assert job_xml.count("<recipeSet") == 1
+
     @pytest.mark.asyncio
     async def test_beaker_job_creation(self, mock_beaker_conf):
         # Given initialized beaker provider and transformer with real beaker
@@ -298,3 +413,30 @@ class TestBeakerProvider:
         # Verify the memory constraint is still added as a child element
         xml_output = host_recipe.toxml()
         assert '<memory op="&gt;=" value="4096"/>' in xml_output
+
+    def test_translate_constraint_memoized(self, mock_beaker_conf):
+        """Test that equal host requires are translated only once."""
+        provider = BeakerProvider()
+        host_requires = {
+            "_force": "host.example.test",
+            "and": [
+                {"memory": {"_op": ">=", "_value": "4096"}},
+                {"or": [{"arch": {"_op": "=", "_value": "x86_64"}}]},
+            ],
+        }
+        _translated_host_requires.cache_clear()
+
+        outputs = []
+        for _ in range(3):
+            host_recipe = xml_doc().createElement("hostRequires")
+            provider._translate_constraint(dict(host_requires), host_recipe)
+            outputs.append(host_recipe.toxml())
+
+        assert outputs[0] == (
+            '<hostRequires force="host.example.test"><and>'
+            '<memory op="&gt;=" value="4096"/>'
+            '<or><arch op="=" value="x86_64"/></or>'
+            "</and></hostRequires>"
+        )
+        assert outputs.count(outputs[0]) == 3
+        assert _translated_host_requires.cache_info().misses == 1
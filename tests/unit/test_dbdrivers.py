@@ -0,0 +1,239 @@
+import json
+import os
+import sqlite3
+from unittest.mock import Mock
+
+from mrack.context import GlobalContext
+from mrack.dbdrivers.file import FileDBDriver
+from mrack.dbdrivers.sqlite import SQLiteDBDriver
+from mrack.host import STATUS_ACTIVE, STATUS_DELETED, Host
+from mrack.providers import providers
+from mrack.providers.static import PROVISIONER_KEY, StaticProvider
+
+from .mock_data import create_db_host
+
+
+def stored_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM hosts ORDER BY name")]
+
+
+class TestSQLiteDBDriver:
+    def setup_method(self):
+        providers.register(PROVISIONER_KEY, StaticProvider)
+
+    def test_add_load_delete(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.sqlite")
+        db = SQLiteDBDriver(db_path)
+        assert not db.hosts
+        assert not os.path.exists(db_path)
+
+        hosts = [
+            create_db_host(f"host{x}.test", index=x, provider=PROVISIONER_KEY)
+            for x in range(3)
+        ]
+        db.add_hosts(hosts)
+        assert stored_names(db_path) == ["host0.test", "host1.test", "host2.test"]
+
+        db.delete_host(hosts[1])
+        assert stored_names(db_path) == ["host0.test", "host2.test"]
+
+        loaded = SQLiteDBDriver(db_path).hosts
+        assert list(loaded) == ["host0.test", "host2.test"]
+        assert loaded["host2.test"].ip_addr == hosts[2].ip_addr
+        assert loaded["host2.test"].provider.name == PROVISIONER_KEY
+
+    def test_update_only_changed(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.sqlite")
+        db = SQLiteDBDriver(db_path)
+        host1 = create_db_host("host1.test", provider=PROVISIONER_KEY)
+        host2 = create_db_host("host2.test", index=1, provider=PROVISIONER_KEY)
+        db.add_hosts([host1, host2])
+
+        # host2 changes only in memory of other driver instance
+        other = SQLiteDBDriver(db_path)
+        other.hosts["host2.test"].status = STATUS_DELETED
+        host1.status = STATUS_DELETED
+        db.update_hosts([host1])
+
+        loaded = SQLiteDBDriver(db_path).hosts
+        assert loaded["host1.test"].status == STATUS_DELETED
+        assert loaded["host2.test"].status == host2.status
+
+    def test_save_keeps_other_hosts(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.sqlite")
+        db = SQLiteDBDriver(db_path)
+        db.add_hosts([create_db_host("host1.test", provider=PROVISIONER_KEY)])
+        # host added by other process after this one loaded the database
+        SQLiteDBDriver(db_path).add_hosts(
+            [create_db_host("host3.test", provider=PROVISIONER_KEY)]
+        )
+
+        db.save_on_change = False
+        db.delete_host(db.hosts["host1.test"])
+        db.add_hosts([create_db_host("host2.test", provider=PROVISIONER_KEY)])
+        assert stored_names(db_path) == ["host1.test", "host3.test"]
+
+        db.save()
+        assert stored_names(db_path) == ["host2.test", "host3.test"]
+
+    def test_format_detected_by_content(self, tmp_path):
+        json_db = str(tmp_path / "mrackdb.db")
+        FileDBDriver(json_db).add_hosts(
+            [create_db_host("host1.test", provider=PROVISIONER_KEY)]
+        )
+        sqlite_db = str(tmp_path / "mrackdb.json")
+        SQLiteDBDriver(sqlite_db).add_hosts(
+            [create_db_host("host2.test", provider=PROVISIONER_KEY)]
+        )
+
+        context = GlobalContext()
+        context.mrack_conf = Mock(shared_db=Mock(return_value=False))
+        context._init_db(json_db)
+        assert isinstance(context.DB, FileDBDriver)
+        assert list(context.DB.hosts) == ["host1.test"]
+        context._init_db(sqlite_db)
+        assert isinstance(context.DB, SQLiteDBDriver)
+        assert list(context.DB.hosts) == ["host2.test"]
+        # new database uses the suffix
+        context._init_db(str(tmp_path / "new.db"))
+        assert isinstance(context.DB, SQLiteDBDriver)
+
+
+class TestSharedFileDBDriver:
+    def setup_method(self):
+        providers.register(PROVISIONER_KEY, StaticProvider)
+
+    def test_parallel_runs_merge(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.json")
+        host1 = create_db_host("host1.test", provider=PROVISIONER_KEY)
+        host2 = create_db_host("host2.test", index=1, provider=PROVISIONER_KEY)
+        host3 = create_db_host("host3.test", index=2, provider=PROVISIONER_KEY)
+        FileDBDriver(db_path, shared=True).add_hosts([host1])
+
+        # two runs loaded the database at the same time
+        run1 = FileDBDriver(db_path, shared=True)
+        run2 = FileDBDriver(db_path, shared=True)
+        run1.add_hosts([host2])
+        run2.add_hosts([host3])
+        assert sorted(FileDBDriver(db_path).hosts) == [
+            "host1.test",
+            "host2.test",
+            "host3.test",
+        ]
+        # run2 sees host added by run1 after its save
+        assert sorted(run2.hosts) == ["host1.test", "host2.test", "host3.test"]
+
+        run1.delete_host(run1.hosts["host1.test"])
+        run1.save()
+        host3.status = STATUS_DELETED
+        run2.update_hosts([host3])
+
+        loaded = FileDBDriver(db_path).hosts
+        assert sorted(loaded) == ["host2.test", "host3.test"]
+        assert loaded["host3.test"].status == STATUS_DELETED
+        assert sorted(run2.hosts) == ["host2.test", "host3.test"]
+
+    def test_not_shared_overwrites(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.json")
+        run1 = FileDBDriver(db_path)
+        run2 = FileDBDriver(db_path)
+        run1.add_hosts([create_db_host("host1.test", provider=PROVISIONER_KEY)])
+        run2.add_hosts([create_db_host("host2.test", provider=PROVISIONER_KEY)])
+        assert list(FileDBDriver(db_path).hosts) == ["host2.test"]
+
+
+class TestLazyRawdata:
+    def setup_method(self):
+        providers.register(PROVISIONER_KEY, StaticProvider)
+
+    def test_rawdata_stored_compatible(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.json")
+        rawdata = {"server": {"id": "abc", "addresses": {"net": ["10.0.0.1"]}}}
+        host = Host(
+            providers.get(PROVISIONER_KEY),
+            "abc",
+            "host1.test",
+            "fedora",
+            "client",
+            ["10.0.0.1"],
+            STATUS_ACTIVE,
+            rawdata,
+        )
+        FileDBDriver(db_path).add_hosts([host])
+
+        # raw data are stored as string, older mrack versions read rawdata key
+        with open(db_path, encoding="utf-8") as db_file:
+            stored = json.load(db_file)["hosts"][0]
+        assert json.loads(stored["rawdata_json"]) == rawdata
+        assert "rawdata" in stored
+
+        loaded = FileDBDriver(db_path).hosts["host1.test"]
+        assert loaded._rawdata is None  # pylint: disable=protected-access
+        assert loaded.rawdata == rawdata
+
+    def test_rawdata_json_loaded_lazily(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.json")
+        json_host = {
+            "provider": PROVISIONER_KEY,
+            "host_id": "abc",
+            "name": "host1.test",
+            "operating_system": "fedora",
+            "group": "client",
+            "ip_addrs": ["10.0.0.1"],
+            "status": STATUS_ACTIVE,
+            "username": None,
+            "password": None,
+            "rawdata_json": json.dumps({"id": "abc"}),
+            "error": None,
+        }
+        with open(db_path, "w", encoding="utf-8") as db_file:
+            json.dump({"hosts": [json_host]}, db_file)
+
+        loaded = FileDBDriver(db_path).hosts["host1.test"]
+        assert loaded._rawdata is None  # pylint: disable=protected-access
+        # not accessed raw data are saved again without serialization
+        assert loaded.to_json()["rawdata_json"] == json_host["rawdata_json"]
+        assert loaded.rawdata == {"id": "abc"}
+
+    def test_old_rawdata_format(self, tmp_path):
+        db_path = str(tmp_path / "mrackdb.json")
+        old_host = {
+            "provider": PROVISIONER_KEY,
+            "host_id": "abc",
+            "name": "host1.test",
+            "operating_system": "fedora",
+            "group": "client",
+            "ip_addrs": ["10.0.0.1"],
+            "status": STATUS_ACTIVE,
+            "username": None,
+            "password": None,
+            "rawdata": {"id": "abc"},
+            "error": None,
+        }
+        with open(db_path, "w", encoding="utf-8") as db_file:
+            json.dump({"hosts": [old_host]}, db_file)
+
+        loaded = FileDBDriver(db_path).hosts["host1.test"]
+        assert loaded.rawdata == {"id": "abc"}
+        assert json.loads(loaded.to_json()["rawdata_json"]) == {"id": "abc"}
+
+    def test_json_cache_invalidated(self):
+        host = Host(
+            providers.get(PROVISIONER_KEY),
+            "abc",
+            "host1.test",
+            "fedora",
+            "client",
+            ["10.0.0.1"],
+            STATUS_ACTIVE,
+            {"id": "abc"},
+        )
+        first = host.to_json()
+        assert host.to_json() is first
+        assert not hasattr(host, "__dict__")
+
+        host.status = STATUS_DELETED
+        assert host.to_json()["status"] == STATUS_DELETED
+        host.error = {"msg": "failed"}
+        assert host.to_json()["error"] == {"msg": "failed"}
@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import os
 from copy import deepcopy
 from unittest import mock
@@ -24,9 +25,11 @@ from mrack.errors import (
     MrackError,
     ProviderNotExists,
     ProvisioningError,
+    ServerNotFoundError,
     ValidationError,
 )
 from mrack.providers.openstack import OpenStackProvider
+from mrack.providers.utils.cache import ObjectCache
 
 from .mock_networks import (
     mock_network_ip_availabilities,
@@ -261,6 +264,112 @@ class TestOpenStackProvider:
             net = provider._get_ips(ref=uuid)  # pylint: disable=protected-access
             assert net["network_name"] == name
 
+    @patch("mrack.providers.openstack.global_context")
+    def test_cache_path_per_region(self, _context):
+        provider = OpenStackProvider()
+        provider.session = Mock(
+            os_auth_url="https://cloud.test:5000/v3",
+            os_project_name="mrack",
+            os_region_name="region-1",
+        )
+        region1_path = provider._cache_path()  # pylint: disable=protected-access
+        provider.session.os_region_name = "region-2"
+        assert provider._cache_path() != region1_path  # pylint: disable=W0212
+
+    def test_cache_entries_expire_separately(self, tmp_path):
+        cache = ObjectCache(str(tmp_path / "openstack.json"), {"images": 100})
+        with patch("mrack.providers.utils.cache.time.time", return_value=1000):
+            cache.set_entries("images", {"old": {"id": "old"}})
+        with patch("mrack.providers.utils.cache.time.time", return_value=1050):
+            cache.set_entries("images", {"new": {"id": "new"}})
+        cache.save()
+
+        cache = ObjectCache(str(tmp_path / "openstack.json"), {"images": 100})
+        with patch("mrack.providers.utils.cache.time.time", return_value=1120):
+            # storing of the new image did not renew the old one
+            assert cache.get_entries("images") == {"new": {"id": "new"}}
+
+    @pytest.mark.asyncio
+    async def test_init_provider_cached(self, tmp_path):
+        cache_ttl = {"flavors": 3600, "images": 3600, "networks": 3600}
+        cache_file = str(tmp_path / "openstack.json")
+        image_names = [image["name"] for image in self.images["images"]]
+
+        with patch.object(OpenStackProvider, "_cache_path", return_value=cache_file):
+            provider = OpenStackProvider()
+            await provider.init(image_names=image_names, cache_ttl=cache_ttl)
+            assert os.path.exists(cache_file)
+
+            provider = OpenStackProvider()
+            await provider.init(image_names=image_names, cache_ttl=cache_ttl)
+
+        # Second init used cached flavors, images and networks
+        assert self.mock_nova.flavors.list.mock.call_count == 1
+        assert self.mock_glance.images.list.mock.call_count == 1
+        assert self.mock_neutron.network.list.mock.call_count == 1
+        # Limits and IP availabilities are always loaded
+        assert self.mock_nova.limits.show.mock.call_count == 2
+        assert self.mock_neutron.ip.list.mock.call_count == 2
+
+        for image in self.images["images"]:
+            im = provider._get_image(image["name"])  # pylint: disable=protected-access
+            assert im["id"] == image["id"]
+        for flavor in self.flavors["flavors"]:
+            fla = provider._get_flavor(ref=flavor["id"])  # pylint: disable=W0212
+            assert fla["name"] == flavor["name"]
+
+    @pytest.mark.asyncio
+    async def test_init_teardown(self):
+        provider = OpenStackProvider()
+        await provider.init_teardown(cloud_profile="openstack")
+
+        assert provider.nova is self.mock_nova
+        assert self.mock_nova.init_api.mock.call_count == 1
+        # Nothing else than login to Nova is needed for deletion of hosts
+        self.mock_glance_class.assert_not_called()
+        self.mock_neutron_class.assert_not_called()
+        assert self.mock_nova.flavors.list.mock.call_count == 0
+        assert self.mock_nova.limits.show.mock.call_count == 0
+        assert self.mock_nova.keypairs.show.mock.call_count == 0
+
+    @pytest.mark.asyncio
+    async def test_load_images(self):
+        images = [{"id": f"id-{x}", "name": f"image-{x}"} for x in range(4)]
+        next_link = "/v2/images?limit=2&marker=id-1"
+
+        def list_images(**params):
+            if "name" in params:
+                found = [im for im in images if im["name"] == params["name"]]
+                return {"images": found}
+            if params.get("marker") == "id-1":
+                return {"images": images[2:]}
+            return {"images": images[:2], "next": next_link}
+
+        self.mock_glance.images.list = AsyncMock(side_effect=list_images)
+        provider = OpenStackProvider()
+        await provider.init(image_names=[])
+
+        # Complete listing follows next links
+        assert provider.images == {im["name"]: im for im in images}
+        calls = self.mock_glance.images.list.mock.call_args_list
+        assert calls == [
+            mock.call(limit=1000),
+            mock.call(limit="2", marker="id-1"),
+        ]
+
+        # Named images are queried separately, each of them only once
+        self.mock_glance.images.list.mock.reset_mock()
+        loaded = await provider._load_images(  # pylint: disable=protected-access
+            ["image-1", "image-3", "image-1", "missing"]
+        )
+        assert sorted(im["id"] for im in loaded) == ["id-1", "id-3"]
+        calls = self.mock_glance.images.list.mock.call_args_list
+        assert sorted(call.kwargs["name"] for call in calls) == [
+            "image-1",
+            "image-3",
+            "missing",
+        ]
+
     @pytest.mark.asyncio
     async def test_provision(self):
         provider = OpenStackProvider()
@@ -733,6 +842,91 @@ class TestOpenStackProvider:
         assert server == succ_server_response["server"]
         assert server_req == req
 
+    @pytest.mark.asyncio
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    async def test_wait_till_provisioned(self, mocked_sleep):
+        provider = OpenStackProvider()
+        await provider.init()
+
+        def server(uuid, status):
+            return {"id": uuid, "status": status}
+
+        self.mock_nova.servers.list = AsyncMock(
+            side_effect=[
+                {"servers": [server("id-1", "BUILD"), server("id-2", "BUILD")]},
+                {
+                    "servers": [server("id-1", "ACTIVE")],
+                    "servers_links": [
+                        {"rel": "next", "href": "https://nova/servers?marker=id-1"}
+                    ],
+                },
+                {"servers": [server("id-2", "ERROR"), server("id-3", "BUILD")]},
+            ]
+        )
+        req1 = host1()
+        req2 = host2()
+
+        results = await asyncio.gather(
+            provider.wait_till_provisioned(({"id": "id-1"}, req1)),
+            provider.wait_till_provisioned(({"id": "id-2"}, req2)),
+        )
+
+        (srv1, srv_req1), (srv2, srv_req2) = results
+        assert srv1["status"] == "ACTIVE"
+        assert srv1["mrack_req"] == req1
+        assert srv_req1 == req1
+        assert srv2["status"] == "ERROR"
+        assert srv_req2 == req2
+
+        # one listing (+ its next page) per tick regardless of number of servers
+        calls = self.mock_nova.servers.list.mock.call_args_list
+        assert len(calls) == 3
+        assert "marker" not in calls[1].kwargs
+        assert calls[2].kwargs["marker"] == "id-1"
+        assert all("changes-since" in c.kwargs for c in calls)
+
+    @pytest.mark.asyncio
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    async def test_wait_till_provisioned_missing_in_listing(self, mocked_sleep):
+        provider = OpenStackProvider()
+        await provider.init()
+
+        # local clock is ahead of Nova so the listing misses the servers
+        self.mock_nova.servers.list = AsyncMock(return_value={"servers": []})
+        self.mock_nova.servers.get = AsyncMock(
+            side_effect=[
+                {
+                    "server": {
+                        "id": "id-1",
+                        "status": "ACTIVE",
+                        "created": "2020-01-01T10:00:00Z",
+                    }
+                },
+                NotFoundError("Not found", 404),
+            ]
+        )
+
+        srv, _req = await provider.wait_till_provisioned(({"id": "id-1"}, host1()))
+        assert srv["status"] == "ACTIVE"
+        # listing continues from creation time of the server
+        poller = provider.server_poller
+        assert poller.since.strftime("%Y-%m-%dT%H:%M:%SZ") == "2020-01-01T09:59:00Z"
+
+        with pytest.raises(ServerNotFoundError):
+            await provider.wait_till_provisioned(({"id": "id-2"}, host2()))
+
+    @pytest.mark.asyncio
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    async def test_wait_till_provisioned_poll_error(self, mocked_sleep):
+        provider = OpenStackProvider()
+        await provider.init()
+
+        self.mock_nova.servers.list = AsyncMock(side_effect=KeyError("servers"))
+
+        with pytest.raises(ProvisioningError, match="Failed to get server state"):
+            await provider.wait_till_provisioned(({"id": "id-1"}, host1()))
+        assert self.mock_nova.servers.list.mock.call_count == 6
+
     @pytest.mark.asyncio
     async def test_load_limits(self):
         provider = OpenStackProvider()
@@ -817,6 +1011,29 @@ class TestOpenStackProvider:
 
         assert can_provision == expected_can_provision
 
+    @pytest.mark.asyncio
+    async def test_fitting_requirements(self):
+        provider = OpenStackProvider()
+        large = {"name": "large", "vcpus": 40, "ram": 8192}
+        medium = {"name": "medium", "vcpus": 8, "ram": 4096}
+        small = {"name": "small", "vcpus": 2, "ram": 2048}
+        host_reqs = [large, medium, small, dict(small, name="small2")]
+
+        with patch.object(
+            OpenStackProvider,
+            "get_host_requirements",
+            side_effect=lambda req: req,
+        ), patch.object(
+            OpenStackProvider,
+            "_load_limits",
+            new_callable=AsyncMock,
+            return_value=(50, 4096, 64, 16384),
+        ):
+            fitting = await provider.fitting_requirements(host_reqs)
+
+        # as many hosts as possible fit, in the original order
+        assert [req["name"] for req in fitting] == ["medium", "small", "small2"]
+
     @patch(
         "aiofiles.open",
         return_value=AsyncContextManagerMock(AsyncFileReadMock("mock_public_key")),
@@ -14,11 +14,12 @@
 
 """Tests for mrack.outputs.utils"""
 
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 
-from mrack.outputs.utils import get_external_id, merge_dict
+from mrack.actions.output import Output
+from mrack.outputs.utils import HostnameResolver, get_external_id, merge_dict
 
 
 @patch("mrack.outputs.utils.resolve_hostname")
@@ -55,6 +56,55 @@ def test_get_external_id(mock_resolve, provisioning_config, host1_aws, metahost1
     assert ext_id == host1_aws.ip_addr
 
 
+@pytest.mark.asyncio
+@patch("mrack.outputs.utils.resolve_hostname")
+async def test_generate_outputs_resolves_only_enabled(
+    mock_resolve, provisioning_config, host1_aws, host1_osp, metahost1
+):
+    """
+    Test that outputs prefetch hostnames only of hosts which are resolved.
+    """
+    provisioning_config["aws"]["resolve_host"] = False
+    db_driver = Mock(hosts={"aws": host1_aws, "openstack": host1_osp})
+    metadata = {
+        "config": {"outputs": []},
+        "domains": [{"name": "example.test", "hosts": [metahost1]}],
+    }
+
+    output = Output(provisioning_config, metadata, db_driver)
+    assert await output.generate_outputs()
+
+    mock_resolve.assert_called_once_with(host1_osp.ip_addr)
+
+
+@pytest.mark.asyncio
+@patch("mrack.outputs.utils.resolve_hostname")
+async def test_hostname_resolver(
+    mock_resolve, provisioning_config, host1_aws, metahost1
+):
+    """
+    Test that each IP address is resolved only once, even if it failed.
+    """
+    dns = "my.dns.name"
+    ip_addr = host1_aws.ip_addr
+    mock_resolve.side_effect = lambda ip: dns if ip == ip_addr else None
+    resolver = HostnameResolver()
+
+    await resolver.resolve_all([ip_addr, "10.0.0.2", ip_addr, ""])
+    resolved = sorted(call.args[0] for call in mock_resolve.call_args_list)
+    assert resolved == sorted([ip_addr, "10.0.0.2"])
+
+    assert resolver.resolve(ip_addr) == dns
+    assert resolver.resolve("10.0.0.2") is None
+    await resolver.resolve_all([ip_addr, "10.0.0.2"])
+    assert mock_resolve.call_count == 2
+
+    # Outputs use remembered results
+    ext_id = get_external_id(host1_aws, metahost1, provisioning_config, resolver)
+    assert ext_id == dns
+    assert mock_resolve.call_count == 2
+
+
 @pytest.mark.parametrize(
     "a,b,expected",
     [
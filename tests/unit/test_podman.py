@@ -0,0 +1,225 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from mrack.errors import ProvisioningError
+from mrack.providers.podman import SSHD_CHECK, PodmanProvider
+from mrack.providers.provider import Provider
+from mrack.providers.utils.podman import (
+    API_VERSION,
+    EVENT_HEALTHY,
+    EVENT_START,
+    PodmanAPI,
+    PodmanEventWatcher,
+    parse_event,
+)
+
+PREFIX = f"/{API_VERSION}/libpod"
+CONTAINER_ID = "7f3c0a1e"
+
+
+def fake_podman_service():
+    """Create aiohttp application with subset of libpod API."""
+    execs = {}
+
+    async def inspect(request):
+        if request.match_info["name"] != CONTAINER_ID:
+            return web.json_response({"cause": "no such container"}, status=404)
+        return web.json_response({"Id": CONTAINER_ID, "State": {"Running": True}})
+
+    async def exists(request):
+        found = request.match_info["name"] in ("mrack-net", "fedora:latest")
+        return web.Response(status=204 if found else 404)
+
+    async def exec_create(request):
+        body = await request.json()
+        exec_id = f"exec{len(execs)}"
+        execs[exec_id] = 0 if body["Cmd"][-1] == "true" else 1
+        return web.json_response({"Id": exec_id}, status=201)
+
+    async def exec_start(request):
+        return web.Response(body=b"\x01\x00\x00\x00\x00\x00\x00\x00")
+
+    async def exec_inspect(request):
+        return web.json_response({"ExitCode": execs[request.match_info["id"]]})
+
+    async def events(request):
+        filters = json.loads(request.query["filters"])
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        for container in filters["container"]:
+            event = {"ID": container, "Status": "start", "Type": "container"}
+            await resp.write(json.dumps(event).encode() + b"\n")
+            await resp.write(b'{"ID": "malformed\n')
+        return resp
+
+    app = web.Application()
+    app.router.add_get(PREFIX + "/containers/{name}/json", inspect)
+    app.router.add_get(PREFIX + "/networks/{name}/exists", exists)
+    app.router.add_get(PREFIX + "/images/{name:.*}/exists", exists)
+    app.router.add_post(PREFIX + "/containers/{name}/exec", exec_create)
+    app.router.add_post(PREFIX + "/exec/{id}/start", exec_start)
+    app.router.add_get(PREFIX + "/exec/{id}/json", exec_inspect)
+    app.router.add_get(PREFIX + "/events", events)
+    return app
+
+
+@pytest_asyncio.fixture
+async def podman_api(tmp_path):
+    socket_path = str(tmp_path / "podman.sock")
+    runner = web.AppRunner(fake_podman_service())
+    await runner.setup()
+    await web.UnixSite(runner, socket_path).start()
+    podman = PodmanAPI(socket_path)
+    yield podman
+    await podman.close()
+    await runner.cleanup()
+
+
+class TestPodmanAPI:
+    def test_aiohttp_missing(self, tmp_path):
+        # aiohttp is only needed when podman service API is used
+        with patch.dict("sys.modules", {"aiohttp": None}):
+            with pytest.raises(ImportError):
+                PodmanAPI(str(tmp_path / "podman.sock"))
+
+    @pytest.mark.asyncio
+    async def test_inspect(self, podman_api):
+        inspected = await podman_api.inspect(CONTAINER_ID)
+        assert inspected[0]["State"]["Running"]
+        assert await podman_api.inspect("missing") == []
+
+    @pytest.mark.asyncio
+    async def test_exists(self, podman_api):
+        assert await podman_api.network_exists("mrack-net")
+        assert not await podman_api.network_exists("other-net")
+        assert await podman_api.image_exists("fedora:latest")
+        assert not await podman_api.image_exists("quay.io/fedora/fedora:39")
+
+    @pytest.mark.asyncio
+    async def test_exec_command(self, podman_api):
+        assert await podman_api.exec_command(CONTAINER_ID, "true")
+        assert not await podman_api.exec_command(CONTAINER_ID, "false")
+
+    @pytest.mark.asyncio
+    async def test_events(self, podman_api):
+        events = [
+            event async for event in podman_api.events({"container": ["abc", "def"]})
+        ]
+        assert [event["ID"] for event in events] == ["abc", "def"]
+
+
+class FakeEventsPodman:
+    dsp_name = "Podman"
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.filters = None
+
+    async def events(self, filters=None, since=None):
+        self.filters = filters
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+class TestPodmanEventWatcher:
+    def test_parse_event(self):
+        cli_event = {"ID": "abc", "Status": "health_status", "HealthStatus": "healthy"}
+        api_event = {"Action": "start", "Actor": {"ID": "abc", "Attributes": {}}}
+        assert parse_event(cli_event) == ("abc", EVENT_HEALTHY)
+        assert parse_event(api_event) == ("abc", EVENT_START)
+
+    @pytest.mark.asyncio
+    async def test_wait(self):
+        podman = FakeEventsPodman()
+        watcher = PodmanEventWatcher(podman, filters={"label": ["mrack.run=1"]})
+        watcher.start()
+
+        # event which happened before waiting is remembered
+        await podman.queue.put({"ID": "abc", "Status": "start"})
+        await asyncio.sleep(0.01)
+        assert await watcher.wait("abc", [EVENT_START], timeout=1) == EVENT_START
+        assert podman.filters == {"label": ["mrack.run=1"]}
+
+        waiting = asyncio.create_task(watcher.wait("def", [EVENT_HEALTHY], timeout=1))
+        await podman.queue.put({"ID": "def", "Status": "start"})
+        await podman.queue.put(
+            {"ID": "def", "Status": "health_status", "HealthStatus": "healthy"}
+        )
+        assert await waiting == EVENT_HEALTHY
+
+        with pytest.raises(asyncio.TimeoutError):
+            await watcher.wait("def", ["died"], timeout=0.01)
+
+        # waiters fail when the stream can not be read
+        waiting = asyncio.create_task(watcher.wait("ghi", [EVENT_START], timeout=1))
+        await asyncio.sleep(0)
+        await podman.queue.put(ValueError("malformed event"))
+        with pytest.raises(ProvisioningError):
+            await waiting
+        await watcher.stop()
+        watcher.start()
+
+        # waiters fail when the watcher is stopped, next wait starts it again
+        waiting = asyncio.create_task(watcher.wait("jkl", [EVENT_START], timeout=1))
+        await asyncio.sleep(0)
+        await watcher.stop()
+        with pytest.raises(ProvisioningError):
+            await waiting
+        waiting = asyncio.create_task(watcher.wait("jkl", [EVENT_START], timeout=1))
+        await asyncio.sleep(0)
+        await podman.queue.put({"ID": "jkl", "Status": "start"})
+        assert await waiting == EVENT_START
+
+        # waiters fail when the stream ends
+        waiting = asyncio.create_task(watcher.wait("ghi", [EVENT_START], timeout=1))
+        await asyncio.sleep(0)
+        await podman.queue.put(None)
+        with pytest.raises(ProvisioningError):
+            await waiting
+        await watcher.stop()
+
+
+class TestPodmanProvider:
+    def test_event_options(self):
+        provider = PodmanProvider()
+        provider.podman_options = {"--label": "team=qe"}
+        options = provider._event_options()
+        assert options["--label"] == ["team=qe", f"mrack.run={provider.run_id}"]
+        assert options["--health-cmd"] == SSHD_CHECK
+
+        # health check of user is kept
+        provider.podman_options = {"--health-cmd": "true"}
+        options = provider._event_options()
+        assert options["--health-cmd"] == "true"
+        assert "--health-interval" not in options
+        assert provider._user_health_check()
+
+    @pytest.mark.asyncio
+    async def test_delete_hosts_while_provisioning(self):
+        provider = PodmanProvider()
+        provider.event_watcher = Mock(stop=AsyncMock())
+        provider.delete_host = AsyncMock(return_value=True)
+        host = Mock(host_id="abc")
+
+        async def provision_hosts(_provider, _reqs):
+            # retried host is deleted while other hosts are provisioned
+            await provider.delete_hosts([host])
+            provider.event_watcher.stop.assert_not_called()
+            return []
+
+        with patch.object(Provider, "provision_hosts", provision_hosts):
+            await provider.provision_hosts([])
+        provider.event_watcher.stop.assert_called_once()
+
+        await provider.delete_hosts([host])
+        assert provider.event_watcher.stop.call_count == 2
@@ -12,15 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
 from unittest import mock
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, PropertyMock, patch
 
 import pytest
 
 from mrack.context import global_context
-from mrack.errors import ProviderNotExists
+from mrack.errors import ProviderError, ProviderNotExists, ProvisioningError
+from mrack.host import STATUS_ACTIVE
 from mrack.providers.provider import Provider
+from mrack.providers.utils.admission import AdmissionLock
 
 
 def init_global_context(mrack_conf="mrack.conf"):
@@ -55,21 +58,48 @@ class TestProvider:
 
     @pytest.mark.asyncio
     @patch.object(Provider, "_get_max_utilization", return_value=60)
-    async def test_strategy_retry(self, get_max_utilization_mock):
+    @patch("mrack.providers.provider.AdmissionLock")
+    async def test_strategy_retry(self, admission_lock, get_max_utilization_mock):
+        admission_lock.return_value.acquire = AsyncMock(return_value=True)
         # Mock hosts with different results
         host1 = Mock(name="host1", error={})
         host2 = Mock(name="host2", error={})
         host3 = Mock(name="host3", error={})
+        host2_err = Mock(name="host2_err", error={"code": 400})
+        host3_err = Mock(name="host3_err", error={"code": 400})
         hostA_500 = Mock(name="hostA_500", error={"code": 500})
         hostB_500 = Mock(name="hostB_500", error={"code": 500})
         host1.name = "host1"
         host2.name = "host2"
         host3.name = "host3"
+        host2_err.name = "host2"
+        host3_err.name = "host3"
         hostA_500.name = "hostA_500"
         hostB_500.name = "hostB_500"
 
         provider = Provider()
         provider.max_retry = 3
+        provider.validate_hosts = AsyncMock()
+        provider.can_provision = AsyncMock(return_value=True)
+
+        def provision_host_mock(results, calls):
+            """Return results of create, wait and ssh check per host name.
+
+            Result can be a coroutine function to control when the host is done.
+            """
+
+            async def provision_host(req, _ssh_check_config, issued=None):
+                if issued:
+                    issued.set_result(None)
+                calls.append(req["name"])
+                host = results[req["name"]].pop(0)
+                if asyncio.iscoroutinefunction(host):
+                    host = await host()
+                if host.error:
+                    return None, host
+                return host, None
+
+            return provision_host
 
         async def subtest_500_error():
             """Test reprovisioning and output when provisioning results in 500 error."""
@@ -78,19 +108,18 @@ class TestProvider:
                 {"name": "hostA_500", "vcpus": 2, "memory": 4096},
                 {"name": "hostB_500", "vcpus": 2, "memory": 4096},
             ]
-            missing_dummy_reqs = [
-                {"name": "hostA_500", "vcpus": 2, "memory": 4096},
-                {"name": "hostB_500", "vcpus": 2, "memory": 4096},
-            ]
+            calls = []
 
             with patch.object(
                 provider,
-                "_provision_base",
-                new_callable=AsyncMock,
-                side_effect=lambda *args, **kwargs: (
-                    [host1],
-                    [hostA_500, hostB_500],
-                    missing_dummy_reqs,
+                "_provision_host",
+                side_effect=provision_host_mock(
+                    {
+                        "host1": [host1],
+                        "hostA_500": [hostA_500] * 4,
+                        "hostB_500": [hostB_500] * 4,
+                    },
+                    calls,
                 ),
             ), patch.object(
                 provider, "utilization", new_callable=AsyncMock, return_value=20
@@ -105,39 +134,39 @@ class TestProvider:
                     missing_reqs,
                 ) = await provider.strategy_retry(dummy_reqs)
 
-                assert len(success_hosts) == 1
+                assert success_hosts == [host1]
                 assert len(error_hosts) == 2
-                assert len(missing_reqs) == 2
-                assert mock_sleep.mock.call_count == 3
-                assert mock_delete_hosts.mock.call_count == 3
-                # Assert that delete_hosts is called to delete all the hosts
+                assert missing_reqs == dummy_reqs[1:]
+                # every failed host is retried max_retry times on its own
+                assert len(calls) == 9
+                assert calls.count("host1") == 1
+                assert mock_sleep.mock.call_count == 6
+                assert mock_delete_hosts.mock.call_count == 6
+                # successful host is never deleted
                 for call in mock_delete_hosts.mock.call_args_list:
-                    called_error_hosts = call[0][0]
-                    # error_hosts argument contains all hosts
-                    assert len(called_error_hosts) == 3
+                    assert call[0][0] in ([hostA_500], [hostB_500])
 
         async def subtest_high_utilization():
-            """Test reprovisioning and output when provisioning fails due to high
-            provider utilization.
+            """Test reprovisioning and output when provisioning fails and provider
+            utilization is high.
             """
             dummy_reqs = [
                 {"name": "host1", "vcpus": 2, "memory": 4096},
                 {"name": "host2", "vcpus": 2, "memory": 4096},
                 {"name": "host3", "vcpus": 2, "memory": 4096},
             ]
-            missing_dummy_reqs = [
-                {"name": "host2", "vcpus": 2, "memory": 4096},
-                {"name": "host3", "vcpus": 2, "memory": 4096},
-            ]
+            calls = []
 
             with patch.object(
                 provider,
-                "_provision_base",
-                new_callable=AsyncMock,
-                side_effect=lambda *args, **kwargs: (
-                    [host1],
-                    [hostA_500, hostB_500],
-                    missing_dummy_reqs,
+                "_provision_host",
+                side_effect=provision_host_mock(
+                    {
+                        "host1": [host1],
+                        "host2": [host2_err, host2],
+                        "host3": [host3_err, host3],
+                    },
+                    calls,
                 ),
             ), patch.object(
                 provider, "utilization", new_callable=AsyncMock, return_value=100
@@ -152,16 +181,15 @@ class TestProvider:
                     missing_reqs,
                 ) = await provider.strategy_retry(dummy_reqs)
 
-                assert len(success_hosts) == 1
-                assert len(error_hosts) == 2
-                assert len(missing_reqs) == 2
-                assert mock_sleep.mock.call_count == 3
-                assert mock_delete_hosts.mock.call_count == 3
-                # Assert that delete_hosts is called to delete all the hosts
-                for call in mock_delete_hosts.mock.call_args_list:
-                    called_error_hosts = call[0][0]
-                    # error_hosts argument contains all hosts
-                    assert len(called_error_hosts) == 3
+                assert success_hosts == [host1, host2, host3]
+                assert not error_hosts
+                assert not missing_reqs
+                assert mock_sleep.mock.call_count == 2
+                # only failed hosts are deleted despite high utilization
+                assert [c[0][0] for c in mock_delete_hosts.mock.call_args_list] == [
+                    [host2_err],
+                    [host3_err],
+                ]
 
         async def subtest_success():
             """Test successful provisioning output (no retry)"""
@@ -170,12 +198,14 @@ class TestProvider:
                 {"name": "host2", "vcpus": 2, "memory": 4096},
                 {"name": "host3", "vcpus": 2, "memory": 4096},
             ]
+            calls = []
 
             with patch.object(
                 provider,
-                "_provision_base",
-                new_callable=AsyncMock,
-                return_value=([host1, host2, host3], [], []),
+                "_provision_host",
+                side_effect=provision_host_mock(
+                    {"host1": [host1], "host2": [host2], "host3": [host3]}, calls
+                ),
             ), patch.object(
                 provider, "utilization", new_callable=AsyncMock, return_value=20
             ), patch.object(
@@ -192,6 +222,7 @@ class TestProvider:
                 assert len(success_hosts) == 3
                 assert not error_hosts
                 assert not missing_reqs
+                assert len(calls) == 3
                 assert mock_sleep.mock.call_count == 0
                 assert mock_delete_hosts.mock.call_count == 0
 
@@ -202,29 +233,29 @@ class TestProvider:
                 {"name": "host2", "vcpus": 2, "memory": 4096},
                 {"name": "host3", "vcpus": 2, "memory": 4096},
             ]
-            missing_dummy_reqs = [
-                {"name": "host3", "vcpus": 2, "memory": 4096},
-            ]
-
-            call_counts = [0]  # Initialize a list to store the call counts
+            calls = []
+            host2_done = asyncio.Event()
 
-            def provision_side_effect(*args, **kwargs):
-                call_counts[0] += 1  # Increment the call count
-                side_effects = {
-                    1: ([host1], [host2, host3], dummy_reqs),
-                    2: ([host1, host2], [host3], missing_dummy_reqs),
-                    3: ([host3], [], []),
-                }
+            async def host1_after_host2():
+                await asyncio.wait_for(host2_done.wait(), 1)
+                return host1
 
-                # return value based on call count simulate reprovision
-                # to pass for only one host at the time
-                return side_effects[call_counts[0]]
+            async def host2_retried():
+                host2_done.set()
+                return host2
 
             with patch.object(
                 provider,
-                "_provision_base",
-                new_callable=AsyncMock,
-                side_effect=provision_side_effect,
+                "_provision_host",
+                side_effect=provision_host_mock(
+                    {
+                        "host1": [host1_after_host2],
+                        # host3 fails once more, host2 does not wait for it
+                        "host2": [host2_err, host2_retried],
+                        "host3": [host3_err, host3_err, host3],
+                    },
+                    calls,
+                ),
             ), patch.object(
                 provider, "utilization", new_callable=AsyncMock, return_value=50
             ), patch.object(
@@ -238,18 +269,210 @@ class TestProvider:
                     missing_reqs,
                 ) = await provider.strategy_retry(dummy_reqs)
 
-                assert len(success_hosts) == 3
+                # failed host is retried while the first round is still running
+                assert host2_done.is_set()
+                assert sorted(h.name for h in success_hosts) == [
+                    "host1",
+                    "host2",
+                    "host3",
+                ]
                 assert len(error_hosts) == 0
                 assert len(missing_reqs) == 0
-                assert mock_sleep.mock.call_count == 2
-                assert mock_delete_hosts.mock.call_count == 2
-                # Assert that delete_hosts is called
-                # to delete all the hosts first for 3 hosts then for one
-                assert [
-                    len(c[0][0]) for c in mock_delete_hosts.mock.call_args_list
-                ] == [3, 1]
+                assert mock_sleep.mock.call_count == 3
+                assert mock_delete_hosts.mock.call_count == 3
+                # only the failed requirement is provisioned again
+                assert sorted(calls) == ["host1", "host2", "host2"] + ["host3"] * 3
 
         await subtest_500_error()
         await subtest_high_utilization()
         await subtest_success()
         await subtest_reprovision_missing_one_by_one_error()
+
+    @pytest.mark.asyncio
+    @patch("mrack.config.MrackConfig.lock_dir", new_callable=PropertyMock)
+    async def test_provision_base_pipelined(self, lock_dir, tmp_path):
+        lock_dir.return_value = str(tmp_path)
+        provider = Provider()
+        provider.timeout = 1
+        delays = {"fast": 0.01, "slow": 0.2}
+        steps = []
+
+        async def create_server(req):
+            if req["name"] == "broken":
+                raise ProvisioningError("quota exceeded", req)
+            return req["name"], req
+
+        async def wait_till_provisioned(resource):
+            name, req = resource
+            await asyncio.sleep(delays[name])
+            steps.append(f"{name} active")
+            return {"name": name}, req
+
+        async def check_host_ssh(host, _check_config):
+            steps.append(f"{host.name} ssh")
+            return True
+
+        def to_host(srv, _req):
+            host = Mock(status=STATUS_ACTIVE, host_id=srv["name"])
+            host.name = srv["name"]
+            return host
+
+        provider.validate_hosts = AsyncMock()
+        provider.can_provision = AsyncMock(return_value=True)
+        provider.create_server = create_server
+        provider.wait_till_provisioned = wait_till_provisioned
+        provider._check_host_ssh = check_host_ssh
+        provider.to_host = to_host
+
+        reqs = [{"name": "slow"}, {"name": "fast"}, {"name": "broken"}]
+        success_hosts, error_hosts, missing_reqs = await provider._provision_base(reqs)
+
+        # fast host is checked without waiting for the slow one
+        assert steps == ["fast active", "fast ssh", "slow active", "slow ssh"]
+        assert sorted(h.name for h in success_hosts) == ["fast", "slow"]
+        assert [h.name for h in error_hosts] == ["broken"]
+        assert [req["name"] for req in missing_reqs] == ["broken"]
+
+    @pytest.mark.asyncio
+    @patch("mrack.config.MrackConfig.lock_dir", new_callable=PropertyMock)
+    async def test_provision_hosts_wait_error(self, lock_dir, tmp_path):
+        lock_dir.return_value = str(tmp_path)
+        provider = Provider()
+        provider.timeout = 1
+
+        async def create_server(req):
+            return f"id-{req['name']}", req
+
+        async def wait_till_provisioned(resource):
+            server_id, req = resource
+            if req["name"] == "broken":
+                raise ProvisioningError("server went to ERROR", req)
+            await asyncio.sleep(0.01)
+            return {"name": req["name"], "id": server_id}, req
+
+        def to_host(srv, _req):
+            host = Mock(status=STATUS_ACTIVE, host_id=srv["id"])
+            host.name = srv["name"]
+            return host
+
+        provider.prepare_provisioning = AsyncMock(return_value=True)
+        provider.validate_hosts = AsyncMock()
+        provider.can_provision = AsyncMock(return_value=True)
+        provider.create_server = create_server
+        provider.wait_till_provisioned = wait_till_provisioned
+        provider._check_host_ssh = AsyncMock(return_value=True)
+        provider.to_host = to_host
+        provider.delete_host = AsyncMock(return_value=True)
+
+        reqs = [{"name": "host1"}, {"name": "broken"}, {"name": "host2"}]
+        with pytest.raises(ProvisioningError):
+            await provider.provision_hosts(reqs)
+
+        # failure of one host while waiting does not leak the other hosts
+        deleted = sorted(c.args for c in provider.delete_host.mock.call_args_list)
+        assert deleted == [
+            ("id-broken", "broken"),
+            ("id-host1", "host1"),
+            ("id-host2", "host2"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_admission_lock(self, tmp_path):
+        lock_path = str(tmp_path / "locks" / "openstack.lock")
+        first = AdmissionLock(lock_path, poll_interval=0.01)
+        second = AdmissionLock(lock_path, poll_interval=0.01)
+
+        # uncontended run is admitted at once
+        assert await first.acquire()
+        waiting = asyncio.create_task(second.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        first.release()
+        assert await asyncio.wait_for(waiting, 1)
+        assert second.locked
+
+        # stuck holder does not block other runs forever
+        third = AdmissionLock(lock_path, poll_interval=0.01, max_wait=0.05)
+        assert not await third.acquire()
+        assert not third.locked
+        second.release()
+
+    @pytest.mark.asyncio
+    @patch("mrack.providers.provider.RESOURCE_USAGE_POLL", 0.01)
+    @patch("mrack.providers.provider.RESOURCE_RECHECK_FIRST", 100)
+    async def test_wait_for_resources_usage_change(self, tmp_path):
+        provider = Provider()
+        provider.can_provision = AsyncMock(side_effect=[False, True])
+        # usage is read once before waiting and then polled
+        provider.resource_usage = AsyncMock(side_effect=[(8, 16), (8, 16), (4, 16)])
+        admission = AdmissionLock(str(tmp_path / "dummy.lock"))
+
+        result = await asyncio.wait_for(
+            provider._wait_for_resources([{"name": "host1"}], 1, admission), 1
+        )
+
+        # resources are checked again on usage change, before backoff delay
+        assert result == [{"name": "host1"}]
+        assert admission.locked
+        assert provider.can_provision.mock.call_count == 2
+        assert provider.resource_usage.mock.call_count == 3
+        admission.release()
+
+    @pytest.mark.asyncio
+    @patch("mrack.providers.provider.RESOURCE_USAGE_POLL", 0.01)
+    @patch("mrack.providers.provider.RESOURCE_RECHECK_FIRST", 100)
+    async def test_wait_for_resources_usage_error(self, tmp_path):
+        provider = Provider()
+        provider.can_provision = AsyncMock(side_effect=[False, True])
+        provider.resource_usage = AsyncMock(
+            side_effect=[(8, 16), ProviderError("API unavailable")]
+        )
+        admission = AdmissionLock(str(tmp_path / "dummy.lock"))
+
+        result = await asyncio.wait_for(
+            provider._wait_for_resources([{"name": "host1"}], 1, admission), 1
+        )
+
+        # failed poll does not abort provisioning, resources are checked again
+        assert result == [{"name": "host1"}]
+        assert provider.can_provision.mock.call_count == 2
+        assert provider.resource_usage.mock.call_count == 2
+        admission.release()
+
+    @pytest.mark.asyncio
+    @patch("mrack.providers.provider.RESOURCE_RECHECK_FIRST", 0.01)
+    @patch("mrack.config.MrackConfig.lock_dir", new_callable=PropertyMock)
+    async def test_provision_base_partial(self, lock_dir, tmp_path):
+        lock_dir.return_value = str(tmp_path)
+        provider = Provider()
+        provider.partial_provisioning = True
+        reqs = [{"name": "host1"}, {"name": "host2"}, {"name": "host3"}]
+        created = []
+
+        async def create_server(req):
+            created.append(req["name"])
+            return req
+
+        def to_host(srv, _req):
+            host = Mock(status=STATUS_ACTIVE, host_id=srv["name"], error=None)
+            host.name = srv["name"]
+            return host
+
+        provider.validate_hosts = AsyncMock()
+        # quota for one host is freed after the first two hosts started
+        provider.fitting_requirements = AsyncMock(side_effect=[reqs[:2], [], reqs[2:]])
+        provider.create_server = create_server
+        provider.wait_till_provisioned = AsyncMock(side_effect=lambda req: (req, req))
+        provider._check_host_ssh = AsyncMock(return_value=True)
+        provider.to_host = to_host
+
+        success_hosts, error_hosts, missing_reqs = await provider._provision_base(reqs)
+
+        assert created == ["host1", "host2", "host3"]
+        assert sorted(h.name for h in success_hosts) == ["host1", "host2", "host3"]
+        assert not error_hosts
+        assert not missing_reqs
+        # only requirements still waiting for resources were checked again
+        calls = provider.fitting_requirements.mock.call_args_list
+        assert [len(call.args[0]) for call in calls] == [3, 1, 1]
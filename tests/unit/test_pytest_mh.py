@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 import yaml
 
@@ -114,3 +116,13 @@ class TestPytestMhOutput:
         print(mhcfg)
 
         assert mhcfg == expected
+
+    @patch("mrack.outputs.utils.resolve_hostname", return_value=None)
+    def test_output_resolves_once(self, mock_resolve, mock_metadata):
+        config = provisioning_config()
+        db = get_db_from_metadata(mock_metadata)
+
+        PytestMhOutput(config, db, mock_metadata).create_mh_config()
+
+        # all hosts share one IP address which is looked up only once
+        mock_resolve.assert_called_once_with("192.168.0.1")
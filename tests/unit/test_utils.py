@@ -1,15 +1,25 @@
+import asyncio
+import xml.etree.ElementTree as eTree
+from unittest.mock import MagicMock, patch
 from xml.dom.minidom import Document as xml_doc
 
 import pytest
 
 from mrack.utils import (
+    add_dict_to_element,
     add_dict_to_node,
+    backoff_delays,
     get_fqdn,
+    get_host_from_metadata,
+    get_metadata_index,
     get_os_type,
     get_shortname,
     get_ssh_options,
     get_username,
+    is_port_open,
+    ssh_command_args,
     ssh_options_to_cli,
+    ssh_to_host,
     value_to_bool,
 )
 
@@ -207,3 +217,161 @@ class TestPytestMrackUtils:
     )
     def test_add_dict_to_node(self, req_node, dct, expected):
         assert add_dict_to_node(req_node, dct).toxml() == expected
+
+    def test_add_dict_to_element(self):
+        dct = {
+            "not": [
+                {"key_value": {"_key": "BOOTDISK", "_op": "==", "_value": "dum"}},
+            ],
+            "memory": {"_op": ">=", "_value": 4096},
+        }
+        element = add_dict_to_element(eTree.Element("and"), dct)
+        assert eTree.tostring(element, encoding="unicode") == (
+            '<and><not><key_value key="BOOTDISK" op="==" value="dum" /></not>'
+            '<memory op="&gt;=" value="4096" /></and>'
+        )
+
+    @pytest.mark.parametrize(
+        "password,ssh_key,expected",
+        [
+            (
+                None,
+                "/tmp/key",
+                [
+                    "ssh",
+                    "-o",
+                    "Foo=Bar",
+                    "-o",
+                    "PasswordAuthentication=no",
+                    "-i",
+                    "/tmp/key",
+                    "-l",
+                    "root",
+                    "192.168.0.1",
+                    "echo mrack",
+                ],
+            ),
+            (
+                "Secret123",
+                None,
+                [
+                    "sshpass",
+                    "-p",
+                    "Secret123",
+                    "ssh",
+                    "-o",
+                    "Foo=Bar",
+                    "-o",
+                    "PasswordAuthentication=yes",
+                    "-l",
+                    "root",
+                    "192.168.0.1",
+                    "echo mrack",
+                ],
+            ),
+        ],
+    )
+    def test_ssh_command_args(self, password, ssh_key, expected):
+        """Test that SSH command is built as unquoted list of arguments."""
+        host = MagicMock(password=None, ip_addr="192.168.0.1")
+        cmd = ssh_command_args(
+            host,
+            username="root",
+            password=password,
+            ssh_key=ssh_key,
+            command="echo mrack",
+            ssh_options={"Foo": "Bar"},
+        )
+        assert cmd == expected
+
+    @patch("mrack.utils.subprocess.Popen")
+    def test_ssh_to_host(self, popen):
+        """Test that SSH to host runs the same command as the async variant."""
+        host = MagicMock(password=None, ip_addr="192.168.0.1")
+        process = popen.return_value.__enter__.return_value
+        process.communicate.return_value = (b"mrack\n", b"")
+        process.returncode = 0
+
+        assert ssh_to_host(
+            host,
+            username="root",
+            ssh_key="/tmp/key",
+            command="echo mrack",
+            ssh_options={"Foo": "Bar"},
+        )
+        assert popen.call_args[0][0] == ssh_command_args(
+            host,
+            username="root",
+            ssh_key="/tmp/key",
+            command="echo mrack",
+            ssh_options={"Foo": "Bar"},
+        )
+
+    @pytest.mark.asyncio
+    async def test_is_port_open(self):
+        """Test asynchronous TCP port probe."""
+        server = await asyncio.start_server(
+            lambda _r, w: w.close(), host="127.0.0.1", port=0
+        )
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            assert await is_port_open("127.0.0.1", port, timeout=5)
+        assert not await is_port_open("127.0.0.1", port, timeout=5)
+
+    def test_get_host_from_metadata(self):
+        """Test indexed lookup of host and domain in job metadata."""
+        dom1 = {"name": "a.test", "hosts": [{"name": "h1"}, {"name": "h2"}]}
+        dom2 = {"name": "b.test", "hosts": [{"name": "h1"}, {"name": "h3"}]}
+        metadata = {"domains": [dom1, dom2]}
+
+        assert get_host_from_metadata(metadata, "h2") == (dom1["hosts"][1], dom1)
+        assert get_host_from_metadata(metadata, "h3") == (dom2["hosts"][1], dom2)
+        # the first definition wins
+        assert get_host_from_metadata(metadata, "h1") == (dom1["hosts"][0], dom1)
+        assert get_host_from_metadata(metadata, "missing") == (None, None)
+        assert get_host_from_metadata({}, "h1") == (None, None)
+
+    def test_get_metadata_index_reused(self):
+        """Test that index is built only once for the same metadata."""
+        metadata = {"domains": [{"name": "a.test", "hosts": [{"name": "h1"}]}]}
+        index = get_metadata_index(metadata)
+        assert get_metadata_index(metadata) is index
+        other = dict(metadata)
+        assert get_metadata_index(other) is not index
+        # alternating metadata objects do not rebuild their indexes
+        assert get_metadata_index(metadata) is index
+        # the least recently used index is dropped
+        others = [dict(metadata) for _ in range(3)]
+        for other_metadata in others:
+            get_metadata_index(other_metadata)
+        assert get_metadata_index(metadata) is index
+        assert get_metadata_index(other) is not index
+
+    def test_metadata_index_missing(self):
+        """Test that missing names do not rebuild the index."""
+        metadata = {"domains": [{"name": "a.test", "hosts": [{"name": "h1"}]}]}
+        index = get_metadata_index(metadata)
+        with patch.object(index, "_build") as build:
+            for num in range(10):
+                assert index.get_host(f"missing{num}") == (None, None)
+                assert index.get_host(f"missing{num}") == (None, None)
+        build.assert_not_called()
+
+    def test_metadata_index_changed(self):
+        """Test that index follows in place changes of metadata."""
+        dom1 = {"name": "a.test", "hosts": [{"name": "h1"}]}
+        metadata = {"domains": [dom1]}
+        assert get_host_from_metadata(metadata, "h1") == (dom1["hosts"][0], dom1)
+
+        dom1["hosts"].append({"name": "h2"})
+        assert get_host_from_metadata(metadata, "h2") == (dom1["hosts"][1], dom1)
+        dom1["hosts"][0]["name"] = "h3"
+        assert get_host_from_metadata(metadata, "h1") == (None, None)
+        dom1["hosts"].pop()
+        assert get_host_from_metadata(metadata, "h2") == (None, None)
+
+    def test_backoff_delays(self):
+        delays = backoff_delays(10, 60, jitter=0.5)
+        values = [next(delays) for _ in range(6)]
+        for value, base in zip(values, [10, 20, 40, 60, 60, 60]):
+            assert base / 2 <= value <= base